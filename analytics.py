@@ -0,0 +1,375 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# most points any one chart series is allowed to send to the browser
+POINT_BUDGET = int(os.environ.get("TRADE_JOURNAL_POINT_BUDGET", "1000"))
+AGGREGATION_LEVELS = ["day", "week", "month", "quarter", "year"]
+_PERIODS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+
+SUMMARY_COLUMNS = ["Date", "Net P&L", "Wins", "Losses", "Win Count", "Loss Count", "Trades", "Worst Trade", "Sum Sq"]
+
+def daily_summary(trades):
+    # one vectorized groupby over the raw trades; everything else is derived from this frame
+    if trades.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    pnl = trades["Net P&L"].astype(float)
+    win = pnl > 0
+    loss = pnl < 0
+    frame = pd.DataFrame({
+        "Date": pd.to_datetime(trades["Date"]).dt.normalize(),
+        "Net P&L": pnl,
+        "Wins": pnl.where(win, 0.0),
+        "Losses": pnl.where(loss, 0.0),
+        "Win Count": win.astype(int),
+        "Loss Count": loss.astype(int),
+        "Trades": 1,
+        "Worst Trade": pnl,
+        "Sum Sq": pnl * pnl,
+    })
+    agg = {col: "sum" for col in SUMMARY_COLUMNS[1:]}
+    agg["Worst Trade"] = "min"
+    summary = frame.groupby("Date", as_index=False, sort=True).agg(agg)
+    # days are keyed as YYYY-MM-DD whatever the journal's Date type is
+    summary["Date"] = summary["Date"].dt.strftime("%Y-%m-%d")
+    return summary
+
+def _ratio(num, den, fallback):
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.broadcast_to(np.asarray(fallback, dtype=float), num.shape).copy()
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+def daily_stats(summary):
+    # per-day ratios on top of the sums/counts, used by every daily chart and the calendars
+    daily = summary.copy()
+    for col in SUMMARY_COLUMNS[1:]:
+        daily[col] = pd.to_numeric(daily[col]).astype(float)
+    # same keys as storage.normalize_trades, on the (much smaller) per-day frame
+    daily["Month"] = daily["Date"].astype(str).str[:7]
+    daily["Date"] = pd.to_datetime(daily["Date"])
+    daily["Day"] = daily["Date"].dt.day
+    daily["Avg Win"] = _ratio(daily["Wins"], daily["Win Count"], 0.0)
+    daily["Avg Loss"] = _ratio(daily["Losses"], daily["Loss Count"], 0.0)
+    # a day without losses shows its gross win as the profit factor
+    daily["Profit Factor"] = _ratio(daily["Wins"], -daily["Losses"], daily["Wins"])
+    daily["Win %"] = _ratio(daily["Win Count"] * 100, daily["Trades"], 0.0)
+    return daily
+
+def kpis(daily):
+    if daily.empty:
+        return {
+            "Total Trades": 0,
+            "Total P&L": 0.0,
+            "Win Rate": 0.0,
+            "Avg Win": 0.0,
+            "Avg Loss": 0.0,
+            "Profit Factor": 0.0,
+            "Avg Trade": 0.0,
+            "Worst Trade": 0.0,
+            "Std Dev": 0.0,
+            "Win Count": 0,
+            "Loss Count": 0,
+        }
+    total_trades = int(daily["Trades"].sum())
+    total_pnl = float(daily["Net P&L"].sum())
+    wins = float(daily["Wins"].sum())
+    losses = float(daily["Losses"].sum())
+    win_count = int(daily["Win Count"].sum())
+    loss_count = int(daily["Loss Count"].sum())
+    mean = total_pnl / total_trades if total_trades else 0.0
+    variance = float(daily["Sum Sq"].sum()) / total_trades - mean * mean if total_trades else 0.0
+    return {
+        "Total Trades": total_trades,
+        "Total P&L": total_pnl,
+        "Win Rate": win_count / total_trades * 100 if total_trades else 0.0,
+        "Avg Win": wins / win_count if win_count else 0.0,
+        "Avg Loss": losses / loss_count if loss_count else 0.0,
+        "Profit Factor": wins / abs(losses) if loss_count else 0.0,
+        "Avg Trade": mean,
+        "Worst Trade": float(daily["Worst Trade"].min()),
+        "Std Dev": max(variance, 0.0) ** 0.5,
+        "Win Count": win_count,
+        "Loss Count": loss_count,
+    }
+
+TRADING_DAYS = 252
+
+def equity_curve(trades, capital=0.0):
+    # account equity after every trade, in date order (journal order within a day), with the running
+    # peak and the drawdown below it; cumsum/cummax only, so millions of trades stay well under a second
+    dates = trades["Date"].to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(dates, kind="stable")
+    pnl = trades["Net P&L"].to_numpy(dtype=float)[order]
+    equity = capital + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, capital))
+    drawdown = peak - equity
+    return pd.DataFrame({
+        "Date": dates[order],
+        "Net P&L": pnl,
+        "Equity": equity,
+        "Peak": peak,
+        "Drawdown": drawdown,
+        "Drawdown %": _ratio(drawdown * 100, peak, 0.0) * (peak > 0),
+    })
+
+def _days(delta):
+    return float(delta / np.timedelta64(1, "D"))
+
+def drawdown_stats(curve, capital=0.0):
+    if curve.empty:
+        return {
+            "Max Drawdown": 0.0,
+            "Max Drawdown %": 0.0,
+            "Max Drawdown Duration": 0.0,
+            "Current Drawdown": 0.0,
+            "Drawdown Start": None,
+            "Drawdown Trough": None,
+            "Recovery Date": None,
+            "Time to Recovery": None,
+            "Recovery Factor": 0.0,
+        }
+    dates = curve["Date"].to_numpy()
+    equity = curve["Equity"].to_numpy()
+    peak = curve["Peak"].to_numpy()
+    drawdown = curve["Drawdown"].to_numpy()
+    at_peak = drawdown <= 0
+    # index of the last point at its peak, i.e. where the drawdown each point sits in began
+    start = np.maximum.accumulate(np.where(at_peak, np.arange(len(curve)), 0))
+    # a drawdown lasts from its peak until equity is back there (or until the last trade if it still runs)
+    duration = dates - dates[start]
+    recoveries = np.flatnonzero(at_peak[1:] & ~at_peak[:-1]) + 1
+    duration[recoveries] = dates[recoveries] - dates[start[recoveries - 1]]
+    trough = int(np.argmax(drawdown))
+    depth = float(drawdown[trough])
+    recovered = np.flatnonzero(equity[trough:] >= peak[trough]) if depth > 0 else []
+    recovery = trough + int(recovered[0]) if len(recovered) else None
+    return {
+        "Max Drawdown": depth,
+        "Max Drawdown %": float(curve["Drawdown %"].max()),
+        "Max Drawdown Duration": _days(duration.max()),
+        "Current Drawdown": float(drawdown[-1]),
+        "Drawdown Start": pd.Timestamp(dates[start[trough]]) if depth > 0 else None,
+        "Drawdown Trough": pd.Timestamp(dates[trough]) if depth > 0 else None,
+        "Recovery Date": pd.Timestamp(dates[recovery]) if recovery is not None else None,
+        "Time to Recovery": _days(dates[recovery] - dates[trough]) if recovery is not None else None,
+        "Recovery Factor": (float(equity[-1]) - capital) / depth if depth > 0 else 0.0,
+    }
+
+def daily_equity(curve):
+    # end-of-day equity and the deepest drawdown within each day, for charts
+    days = curve["Date"].to_numpy().astype("datetime64[D]")
+    if not len(days):
+        return pd.DataFrame(columns=["Date", "Equity", "Peak", "Drawdown"])
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)] - 1
+    return pd.DataFrame({
+        "Date": days[starts].astype("datetime64[ns]"),
+        "Equity": curve["Equity"].to_numpy()[ends],
+        "Peak": curve["Peak"].to_numpy()[ends],
+        "Drawdown": np.maximum.reduceat(curve["Drawdown"].to_numpy(), starts),
+    })
+
+def daily_returns(daily, capital=0.0):
+    # each day's P&L over the equity it started from; with no positive capital base the
+    # ratios below fall back to raw P&L, which keeps Sharpe/Sortino scale-free either way
+    pnl = daily["Net P&L"].to_numpy(dtype=float)
+    if capital <= 0:
+        return pnl
+    prior = capital + np.concatenate([[0.0], np.cumsum(pnl)[:-1]])
+    return _ratio(pnl, np.where(prior > 0, prior, 0.0), 0.0)
+
+def risk_ratios(returns, window=None):
+    # annualized Sharpe and Sortino (zero risk-free rate), over the whole history or a rolling window
+    r = pd.Series(returns, dtype=float)
+    losses = r.clip(upper=0.0) ** 2
+    if window is None:
+        roll, roll_losses = r.expanding(min_periods=2), losses.expanding(min_periods=2)
+    else:
+        roll, roll_losses = r.rolling(window, min_periods=2), losses.rolling(window, min_periods=2)
+    mean = roll.mean()
+    std = roll.std()
+    downside = np.sqrt(roll_losses.mean())
+    scale = np.sqrt(TRADING_DAYS)
+    return pd.DataFrame({
+        "Sharpe": _ratio(mean * scale, std, np.nan),
+        "Sortino": _ratio(mean * scale, downside, np.nan),
+    })
+
+def in_window(frame, start=None, end=None):
+    # rows of a Date-keyed frame inside [start, end], both days inclusive
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= (frame["Date"] >= start).to_numpy()
+    if end is not None:
+        mask &= (frame["Date"] < end + pd.Timedelta(days=1)).to_numpy()
+    return frame[mask]
+
+def aggregate(daily, level="auto", budget=POINT_BUDGET):
+    # re-bucket the per-day frame into weeks/months/...: sums and counts add up, the ratios are
+    # recomputed per bucket. "auto", like any level that would exceed the point budget, moves on
+    # to the finest level that fits. Returns the frame and the level used.
+    levels = AGGREGATION_LEVELS if level == "auto" else AGGREGATION_LEVELS[AGGREGATION_LEVELS.index(level):]
+    for level in levels:
+        buckets = daily["Date"] if level == "day" else daily["Date"].dt.to_period(_PERIODS[level]).dt.start_time
+        if buckets.nunique() <= budget:
+            break
+    if level == "day":
+        return daily, level
+    agg = {col: "sum" for col in SUMMARY_COLUMNS[1:]}
+    agg["Worst Trade"] = "min"
+    summary = daily.groupby(buckets.rename("Date"), sort=True).agg(agg).reset_index()
+    return daily_stats(summary), level
+
+def lttb(x, y, budget=POINT_BUDGET):
+    # Largest-Triangle-Three-Buckets: indices of at most `budget` points that keep the visual shape
+    # of the line y(x); first and last points are always kept
+    n = len(y)
+    if n <= budget or budget < 3:
+        return np.arange(n)
+    x = np.asarray(x).astype("int64").astype(float) if np.asarray(x).dtype.kind == "M" else np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    keep = np.empty(budget, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def downsample(frame, columns, budget=POINT_BUDGET):
+    # rows kept for a chart drawing several lines over frame["Date"]: the union of each line's LTTB
+    # picks, with the budget split between the lines
+    if len(frame) <= budget:
+        return frame
+    share = max(3, budget // len(columns))
+    keep = np.unique(np.concatenate([lttb(frame["Date"].to_numpy(), frame[col].to_numpy(), share) for col in columns]))
+    return frame.iloc[keep]
+
+# --- breakdowns by symbol, side, weekday and time of day ---
+
+BREAKDOWNS = ["Symbol", "Side", "Weekday", "Hour", "Session"]
+CUBE_KEYS = ["Symbol", "Side", "Date", "Hour"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# trading sessions by hour of the trade's timestamp (journal time zone)
+SESSIONS = pd.cut(np.arange(24), [0, 7, 13, 16, 22, 24], right=False,
+                  labels=["Asia", "London", "London/New York", "New York", "Late"])
+
+def trade_cube(trades):
+    # the one multi-key groupby behind every breakdown: sums per (Symbol, Side, day, hour) over the
+    # categorical keys; each breakdown is a roll-up of this frame, never another scan of the trades
+    columns = [*SUMMARY_COLUMNS[1:], "Pips", "Lots"]
+    if trades.empty:
+        return pd.DataFrame(columns=[*CUBE_KEYS, *columns])
+    pnl = trades["Net P&L"].to_numpy(dtype=float)
+    dates = pd.to_datetime(trades["Date"])
+    win = pnl > 0
+    loss = pnl < 0
+    frame = pd.DataFrame({
+        "Symbol": trades["Symbol"].astype("category"),
+        "Side": trades["Side"].astype("category"),
+        "Date": dates.dt.normalize(),
+        "Hour": dates.dt.hour.astype("int8"),
+        "Net P&L": pnl,
+        "Wins": np.where(win, pnl, 0.0),
+        "Losses": np.where(loss, pnl, 0.0),
+        "Win Count": win.astype(int),
+        "Loss Count": loss.astype(int),
+        "Trades": 1,
+        "Worst Trade": pnl,
+        "Sum Sq": pnl * pnl,
+        "Pips": trades["Pips"].to_numpy(dtype=float) if "Pips" in trades else 0.0,
+        "Lots": trades["Quantity"].to_numpy(dtype=float) if "Quantity" in trades else 0.0,
+    })
+    agg = {col: "sum" for col in columns}
+    agg["Worst Trade"] = "min"
+    return frame.groupby(CUBE_KEYS, observed=True, sort=True).agg(agg).reset_index()
+
+def breakdown(cube, by):
+    # roll the cube up to one row per symbol / side / weekday / hour / session with its trading ratios
+    if by == "Weekday":
+        keys = pd.Categorical.from_codes(cube["Date"].dt.weekday, WEEKDAYS)
+    elif by == "Session":
+        keys = SESSIONS[cube["Hour"].to_numpy(dtype=int)]
+    else:
+        keys = cube[by]
+    sums = cube.groupby(pd.Series(keys, index=cube.index, name=by), observed=True, sort=True)[
+        ["Net P&L", "Wins", "Losses", "Win Count", "Loss Count", "Trades", "Pips", "Lots"]].sum()
+    return pd.DataFrame({
+        by: sums.index.astype(str),
+        "Trades": sums["Trades"].astype(int).to_numpy(),
+        "Net P&L": sums["Net P&L"].to_numpy(),
+        "Win Rate": _ratio(sums["Win Count"] * 100, sums["Trades"], 0.0),
+        # a group without losses shows its gross win as the profit factor, as the daily chart does
+        "Profit Factor": _ratio(sums["Wins"], -sums["Losses"], sums["Wins"]),
+        "Avg Win": _ratio(sums["Wins"], sums["Win Count"], 0.0),
+        "Avg Loss": _ratio(sums["Losses"], sums["Loss Count"], 0.0),
+        "Expectancy": _ratio(sums["Net P&L"], sums["Trades"], 0.0),
+        "Pips per Lot": _ratio(sums["Pips"], sums["Lots"], 0.0),
+    })
+
+def group_positions(keys):
+    # label -> row positions, computed once per data version; narrowing to a set of labels is then
+    # a concatenation of these arrays instead of a comparison over every row
+    return keys.groupby(keys, observed=True).indices
+
+def take_groups(positions, labels):
+    parts = [positions[label] for label in labels if label in positions]
+    return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+
+# --- maximum adverse / favorable excursion from OHLC bars ---
+
+EXCURSION_COLUMNS = ["MAE", "MFE", "MAE %", "MFE %", "Bars"]
+
+def _range_reduce(ufunc, values, first, last):
+    # ufunc.reduce over values[first[i]:last[i] + 1] for every i in one reduceat call: the start and
+    # end positions are interleaved and only the results at the starts are kept
+    bounds = np.empty(2 * len(first), dtype=np.intp)
+    bounds[0::2] = first
+    bounds[1::2] = last + 1
+    return ufunc.reduceat(np.append(values, values[-1:]), bounds)[0::2]
+
+def excursions(trades, bars):
+    # how far every trade went against (MAE) and for (MFE) its entry Price, in price units and % of
+    # the entry, over the bars of its window: from its Date (with the time of day, if recorded)
+    # to the end of that day. Two merge_asof passes map all windows to bar positions at once and
+    # the lows/highs in between come from one reduceat each; trades without bars get NaN
+    values = np.full((len(trades), len(EXCURSION_COLUMNS)), np.nan)
+    dates = pd.to_datetime(trades["Date"])
+    valid = dates.notna().to_numpy()
+    if not valid.any() or bars.empty:
+        return pd.DataFrame(values, index=trades.index, columns=EXCURSION_COLUMNS)
+    bars = bars.sort_values(["Symbol", "Time"], ignore_index=True)
+    by_time = pd.DataFrame({"Time": bars["Time"].astype("datetime64[ns]"), "Symbol": bars["Symbol"].astype(str),
+                            "Position": np.arange(len(bars))}).sort_values("Time", kind="stable")
+    rows = pd.DataFrame({
+        "Row": np.flatnonzero(valid),
+        "Symbol": trades["Symbol"].astype(str).to_numpy()[valid],
+        "Start": dates[valid].astype("datetime64[ns]").to_numpy(),
+    })
+    rows["End"] = rows["Start"].dt.normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+    first = pd.merge_asof(rows.sort_values("Start"), by_time, left_on="Start", right_on="Time",
+                          by="Symbol", direction="forward").set_index("Row")["Position"]
+    last = pd.merge_asof(rows.sort_values("End"), by_time, left_on="End", right_on="Time",
+                         by="Symbol", direction="backward").set_index("Row")["Position"]
+    first, last = first.reindex(rows["Row"]).to_numpy(), last.reindex(rows["Row"]).to_numpy()
+    found = ~np.isnan(first) & ~np.isnan(last)
+    found[found] = first[found] <= last[found]
+    first, last = first[found].astype(np.intp), last[found].astype(np.intp)
+    low = _range_reduce(np.minimum, bars["Low"].to_numpy(dtype=float), first, last)
+    high = _range_reduce(np.maximum, bars["High"].to_numpy(dtype=float), first, last)
+    at = rows["Row"].to_numpy()[found]
+    price = trades["Price"].to_numpy(dtype=float)[at]
+    sell = trades["Side"].astype(str).str.lower().to_numpy()[at] == "sell"
+    adverse = np.maximum(np.where(sell, high - price, price - low), 0.0)
+    favorable = np.maximum(np.where(sell, price - low, high - price), 0.0)
+    values[at] = np.column_stack([adverse, favorable, _ratio(adverse * 100, price, np.nan),
+                                  _ratio(favorable * 100, price, np.nan), last - first + 1])
+    return pd.DataFrame(values, index=trades.index, columns=EXCURSION_COLUMNS)
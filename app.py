@@ -1,46 +1,37 @@
+import io
 import os
-import shutil
+import zipfile
+import tempfile
 import pandas as pd
 import streamlit as st
 from datetime import datetime
-import plotly.graph_objects as go
 import calendar
 
-CSV_FILE = "trades.csv"
-INVEST_CSV = "investment.csv"
+import analytics
+import importer
+import prices
+import profiling
+import report
+import simulation
+from core import (
+    DailyCalendar, add_investment, balance_as_of, calculate_statistics, calculate_zella_score, daily_stats,
+    data_version, delete_investment, delete_trade, get_investment, journal_pnl, load_investments, load_trades, pattern_model,
+    pattern_report, prune_snapshots, restore_snapshot,
+    risk_report, save_trade, scope, simulate_risk, snapshot_diff, snapshot_versions, symbol_index, take_snapshot, trade_cube,
+    trade_excursions, update_investment, update_trade,
+)
+from charts import (
+    avg_win_loss_figure, breakdown_figure, calendar_cell, calibration_figure, daily_pnl_figure, equity_curve_figure,
+    excursion_figure, pie_figure, pnl_heatmap_figure, profit_factor_daywin_figure, rolling_ratio_figure,
+    simulation_histogram, weights_figure, year_days, zella_figure,
+)
+from storage import INVEST_COLUMNS, TRADE_COLUMNS, ConflictError, SnapshotBusyError, cache_info, get_store, row_etag
 
 def init_csv():
-    cols = ["Date", "Symbol", "Side", "Quantity", "Price", "Net P&L", "Pips"]
-    if not os.path.exists(CSV_FILE) or os.stat(CSV_FILE).st_size == 0:
-        pd.DataFrame(columns=cols).to_csv(CSV_FILE, index=False)
+    get_store().init()
 
 def init_investment():
-    if not os.path.exists(INVEST_CSV) or os.stat(INVEST_CSV).st_size == 0:
-        pd.DataFrame(columns=["Date", "Amount"]).to_csv(INVEST_CSV, index=False)
-
-def _safe_read(path, columns):
-    if not os.path.exists(path) or os.stat(path).st_size == 0:
-        return pd.DataFrame(columns=columns)
-    try:
-        return pd.read_csv(path)
-    except pd.errors.EmptyDataError:
-        return pd.DataFrame(columns=columns)
-
-def get_investment():
-    df = _safe_read(INVEST_CSV, ["Date", "Amount"])
-    if df.empty:
-        return 0.0
-    # If you track cumulative investment as sum of Amount entries:
-    try:
-        return float(df["Amount"].astype(float).sum())
-    except Exception:
-        return 0.0
-
-def add_investment(amount):
-    df = _safe_read(INVEST_CSV, ["Date", "Amount"])
-    row = {"Date": datetime.today().strftime("%Y-%m-%d"), "Amount": float(amount)}
-    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    df.to_csv(INVEST_CSV, index=False)
+    get_store().init()
 
 def add_trade_form():
     # minimal, non-destructive form logic — returns dict or None
@@ -68,52 +59,170 @@ def add_trade_form():
                 st.error("Please enter valid numbers for Quantity, Price, P&L and Pips.")
     return None
 
-def backup_file(file_path):
-    if os.path.exists(file_path) and os.stat(file_path).st_size > 0:
-        backup_path = file_path + ".bak"
-        shutil.copy2(file_path, backup_path)
-
-def save_trade(trade_data):
-    backup_file(CSV_FILE)
-    df = _safe_read(CSV_FILE, ["Date", "Symbol", "Side", "Quantity", "Price", "Net P&L", "Pips"])
-    df = pd.concat([df, pd.DataFrame([trade_data])], ignore_index=True)
-    df.to_csv(CSV_FILE, index=False)
-    # update investment by adding P&L (wins increase, losses decrease)
-    try:
-        pnl = float(trade_data.get("Net P&L", 0))
-        if pnl != 0:
-            add_investment(pnl)
-    except Exception:
-        pass
-
-def load_trades():
-    return _safe_read(CSV_FILE, ["Date", "Symbol", "Side", "Quantity", "Price", "Net P&L", "Pips"])
+def import_statement_form():
+    # bulk path next to the one-trade form: returns the import counts once "Import" is clicked
+    uploaded = st.file_uploader("Broker statement (CSV)", type=["csv"], key="statement_file")
+    if uploaded is None:
+        return None
+    header = importer.read_header(uploaded)
+    formats = ["mt4", "mt5", "generic"]
+    fmt = st.selectbox("Format", formats, index=formats.index(importer.detect_format(header)),
+                       format_func=lambda f: {"mt4": "MT4 history", "mt5": "MT5 positions", "generic": "Generic CSV"}[f])
+    mapping = None
+    if fmt == "generic":
+        st.caption("Map the file's columns to journal columns")
+        guess = {col: src for src, col in importer.generic_mapping(header).items()}
+        options = ["—"] + header
+        mapping = {}
+        for col in TRADE_COLUMNS:
+            choice = st.selectbox(col, options, index=options.index(guess[col]) if col in guess else 0,
+                                  key=f"statement_map_{col}")
+            if choice != "—":
+                mapping[choice] = col
+    if st.button("Import", key="statement_import"):
+        try:
+            return importer.import_statement(uploaded, get_store(), fmt, mapping)
+        except ValueError as e:
+            st.error(str(e))
+    return None
 
-def load_investments():
-    return _safe_read(INVEST_CSV, ["Date", "Amount"])
+def export_reports_form(symbols):
+    # one static report per month or week of the selected symbols, rendered in a process pool and
+    # offered as one zip
+    period = st.radio("Period", list(report.PERIODS), horizontal=True, key="report_period", format_func=str.title)
+    window = st.date_input("Between", value=(), key="report_window")
+    fmt = st.selectbox("Format", report.FORMATS, key="report_format", format_func=str.upper)
+    if st.button("Export", key="report_export"):
+        start = window[0] if len(window) > 0 else None
+        end = window[1] if len(window) > 1 else None
+        bar = st.progress(0.0, text="Rendering reports...")
+        buffer = io.BytesIO()
+        with tempfile.TemporaryDirectory() as out:
+            try:
+                paths = report.export_reports(period, start, end, out, fmt, symbols, progress=lambda done, total: bar.progress(
+                    done / total, text=f"Rendered {done} of {total} reports"))
+            except RuntimeError as e:
+                bar.empty()
+                st.error(str(e))
+                return
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                for root, _, files in os.walk(out):
+                    for name in files:
+                        archive.write(os.path.join(root, name), os.path.relpath(os.path.join(root, name), out))
+        bar.empty()
+        st.session_state["report_zip"] = (f"reports-{period}.zip", buffer.getvalue(), len(paths))
+    if "report_zip" in st.session_state:
+        name, data, count = st.session_state["report_zip"]
+        st.download_button(f"Download {count} reports", data, file_name=name, mime="application/zip")
+
+def snapshots_panel():
+    # the journal's versions (one per write): what changed since one of them, and putting it back
+    versions = snapshot_versions()
+    if versions.empty:
+        st.caption("No snapshots yet.")
+        return
+    st.dataframe(versions[["Version", "Created", "Reason", "Bytes Stored"]], hide_index=True, use_container_width=True,
+                 height=180, column_config={"Bytes Stored": st.column_config.NumberColumn(format="%d")})
+    labels = {row.Version: f"#{row.Version} · {row.Created.replace('T', ' ')} · {row.Reason}" for row in versions.itertuples()}
+    chosen = st.selectbox("Version", list(labels), key="snapshot_version", format_func=labels.get)
+    c1, c2 = st.columns(2)
+    if c1.button("Diff with now", key="snapshot_diff"):
+        try:
+            files, rows = snapshot_diff(chosen)
+            st.session_state["snapshot_diff_result"] = (chosen, files, rows)
+        except (KeyError, SnapshotBusyError) as e:
+            # pruned by another session since the list was drawn, or a SQLite reader holds the WAL
+            st.error(e.args[0])
+    if c2.button("Snapshot now", key="snapshot_take"):
+        try:
+            entry = take_snapshot()
+        except SnapshotBusyError as e:
+            st.error(e.args[0])
+        else:
+            st.session_state["snapshot_message"] = f"Saved version #{entry['id']}." if entry else "Nothing changed since the latest version."
+            st.rerun()
+    if "snapshot_message" in st.session_state:
+        st.success(st.session_state.pop("snapshot_message"))
+    result = st.session_state.get("snapshot_diff_result")
+    if result and result[0] == chosen:
+        _, files, rows = result
+        changed = files[files["Status"] != "unchanged"]
+        if changed.empty:
+            st.caption("The journal matches this version.")
+        else:
+            st.dataframe(changed[["File", "Status", "Chunks Changed"]], hide_index=True, use_container_width=True)
+            st.caption(f"{(rows['Change'] == 'Added').sum():,} rows added, {(rows['Change'] == 'Removed').sum():,} removed since then")
+            if len(rows):
+                st.dataframe(rows.head(500), hide_index=True, use_container_width=True)
+    confirm = st.checkbox(f"Replace the journal with version #{chosen}", key="snapshot_confirm",
+                          help="The journal as it is now is snapshotted first, so the restore can be undone")
+    if st.button("Restore", key="snapshot_restore", disabled=not confirm, type="primary"):
+        try:
+            restore_snapshot(chosen)
+        except (KeyError, SnapshotBusyError) as e:
+            st.error(e.args[0])
+        else:
+            st.session_state.pop("snapshot_diff_result", None)
+            st.session_state["snapshot_message"] = f"Restored version #{chosen}."
+            del st.session_state["snapshot_confirm"]
+            st.rerun()
+    if st.button("Prune", key="snapshot_prune", help="Keep the latest 50 versions plus the last one of each of 30 days and 12 weeks"):
+        removed, freed = prune_snapshots()
+        st.session_state["snapshot_message"] = f"Removed {removed} versions, freed {freed / 1e6:,.1f} MB."
+        st.rerun()
 
-def save_investments(df):
-    investments_df.iloc[st.session_state['edit_invest_row']] = updated
-    for col in investments_df.columns:
-        investments_df.at[st.session_state['edit_invest_row'], col] = updated[col]
-    backup_file(INVEST_CSV)
-    df.to_csv(INVEST_CSV, index=False)
+def apply_write(action, key, *args):
+    # edits/deletes carry the etag of the row as it was selected, so a row changed or moved by
+    # another session is reported instead of being overwritten
+    try:
+        action(key, *args)
+        return True
+    except ConflictError as e:
+        st.session_state['write_conflict'] = f"{e}; nothing was changed. Please review and try again."
+        return False
+
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
+
+def paginate(df, key, sort_columns):
+    # server-side sort + slice: only the visible page is sent to the browser
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort_by = c1.selectbox("Sort by", sort_columns, key=f"{key}_sort")
+    descending = c2.toggle("Descending", value=True, key=f"{key}_desc")
+    page_size = c3.selectbox("Rows per page", TABLE_PAGE_SIZES, key=f"{key}_page_size")
+    if not df.empty:
+        df = df.sort_values(sort_by, ascending=not descending, kind="stable")
+    pages = max(1, -(-len(df) // page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    st.caption(f"Showing {min(start + 1, len(df))}–{min(start + page_size, len(df))} of {len(df)}")
+    return df.iloc[start:start + page_size]
+
+def row_actions(page, key, state_prefix, columns, display=None):
+    # one dataframe component per page; the selected row gets the Edit / Delete actions
+    event = st.dataframe(page if display is None else display, key=f"{key}_table", on_select="rerun",
+                         selection_mode="single-row", hide_index=True, use_container_width=True,
+                         column_config={"Date": st.column_config.DateColumn(format="YYYY-MM-DD")})
+    rows = event.selection.rows
+    selected = page.index[rows[0]] if rows else None
+    c1, c2, _ = st.columns([1, 1, 6])
+    if c1.button("✏️ Edit", key=f"{key}_edit", disabled=selected is None, help="Edit the selected row"):
+        st.session_state[f'edit_{state_prefix}_row'] = selected
+        st.session_state[f'edit_{state_prefix}_etag'] = row_etag(page.loc[selected], columns)
+        st.rerun()  # a full rerun, also from inside a fragment, so main() picks the action up
+    if c2.button("🗑️ Delete", key=f"{key}_delete", disabled=selected is None, help="Delete the selected row"):
+        st.session_state[f'delete_{state_prefix}_row'] = selected
+        st.session_state[f'delete_{state_prefix}_etag'] = row_etag(page.loc[selected], columns)
+        st.rerun()
 
+@profiling.timed("render: investments table", rows=lambda df: len(df))
 def display_investments_table(df):
-    for idx, row in df.iterrows():
-        cols = st.columns([2, 2, 1, 1])
-        cols[0].markdown(f"<div style='padding:4px;text-align:center'>{row['Date']}</div>", unsafe_allow_html=True)
-        cols[1].markdown(f"<div style='padding:4px;text-align:center'>{row['Amount']}</div>", unsafe_allow_html=True)
-        edit_btn = cols[2].button("Edit", key=f"edit_invest_{idx}")
-        delete_btn = cols[3].button("Delete", key=f"delete_invest_{idx}")
-        if edit_btn:
-            st.session_state['edit_invest_row'] = idx
-        if delete_btn:
-            st.session_state['delete_invest_row'] = idx
+    st.caption("Deposits and withdrawals. Trade P&L is added to the balance directly, not copied into this table.")
+    page = paginate(df, "investments", ["Date", "Amount"])
+    row_actions(page, "investments", "invest", INVEST_COLUMNS)
 
 def investment_edit_form(row):
     with st.form("edit_investment_form"):
-        date = st.text_input("Date", value=row["Date"])
+        date = st.text_input("Date", value=str(row["Date"])[:10])
         amount = st.text_input("Amount", value=str(row["Amount"]))
         submitted = st.form_submit_button("Update")
         if submitted:
@@ -124,31 +233,26 @@ def investment_edit_form(row):
                 st.error("Please enter a valid number for the amount.")
     return None
 
-def calculate_statistics():
-    # Use the safe loader to avoid EmptyDataError on empty/missing CSV
-    trades = load_trades()
-    if trades.empty:
-        return {
-            "Total Trades": 0,
-            "Total P&L": 0.0,
-            "Win Rate": 0.0,
-            "Avg Win": 0.0,
-            "Avg Loss": 0.0,
-        }
-
-    total_trades = len(trades)
-    total_pnl = trades["Net P&L"].sum()
-    win_rate = (trades["Net P&L"] > 0).mean() * 100 if total_trades > 0 else 0
-    avg_win = trades[trades["Net P&L"] > 0]["Net P&L"].mean() if (trades["Net P&L"] > 0).any() else 0
-    avg_loss = trades[trades["Net P&L"] < 0]["Net P&L"].mean() if (trades["Net P&L"] < 0).any() else 0
-
-    return {
-        "Total Trades": total_trades,
-        "Total P&L": total_pnl,
-        "Win Rate": win_rate,
-        "Avg Win": avg_win,
-        "Avg Loss": avg_loss,
-    }
+@st.cache_resource
+def _section_cache():
+    # figures and derived frames shared across reruns and sessions, each kept with the data
+    # version it was built from and only rebuilt once the journal changes
+    return {}
+
+def versioned(name, version, build):
+    cache = _section_cache()
+    entry = cache.get(name)
+    if entry is None or entry[0] != version:
+        entry = (version, build())
+        cache[name] = entry
+    return entry[1]
+
+def plot(name, version, build):
+    with profiling.section(f"chart: {name}") as entry:
+        fig = versioned(("figure", name), version, build)
+        if fig is not None:
+            entry["rows"] = profiling.count_rows(fig)
+            st.plotly_chart(fig, use_container_width=True)
 
 def display_statistics(stats):
     st.metric("Total Trades", stats["Total Trades"])
@@ -156,85 +260,12 @@ def display_statistics(stats):
     st.metric("Win Rate", f"{stats['Win Rate']:.2f}%")
     st.metric("Avg Win", f"${stats['Avg Win']:.2f}")
     st.metric("Avg Loss", f"${stats['Avg Loss']:.2f}")
+    st.metric("Max Drawdown", f"${stats['Max Drawdown']:.2f}")
 
-def pie_chart(trades):
-    win = (trades["Net P&L"] > 0).sum()
-    loss = (trades["Net P&L"] < 0).sum()
-    fig = go.Figure(data=[go.Pie(labels=['Win', 'Loss'], values=[win, loss], marker_colors=['#3498db', '#9b59b6'])])
-    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0), height=250)
-    st.plotly_chart(fig, use_container_width=True)
-
-def daily_pnl_chart(trades):
-    daily_win = trades[trades["Net P&L"] > 0].groupby("Date")["Net P&L"].sum().reset_index()
-    daily_loss = trades[trades["Net P&L"] < 0].groupby("Date")["Net P&L"].sum().reset_index()
-
-    all_dates = sorted(set(trades["Date"]))
-    win_map = dict(zip(daily_win["Date"], daily_win["Net P&L"]))
-    loss_map = dict(zip(daily_loss["Date"], daily_loss["Net P&L"]))
-
-    win_values = [win_map.get(date, 0) for date in all_dates]
-    loss_values = [loss_map.get(date, 0) for date in all_dates]
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=all_dates, y=win_values,
-        name="Winning P&L",
-        marker_color="#3498db"  # Blue
-    ))
-    fig.add_trace(go.Bar(
-        x=all_dates, y=loss_values,
-        name="Losing P&L",
-        marker_color="#9b59b6"  # Purple
-    ))
-    fig.update_layout(
-        barmode='group',
-        margin=dict(l=0, r=0, t=0, b=0),
-        height=180,
-        xaxis_title="Date",
-        yaxis_title="Net P&L"
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-def calculate_zella_score(trades):
-    win_rate = (trades["Net P&L"] > 0).mean() * 100 if len(trades) > 0 else 0
-    profit_factor = trades[trades["Net P&L"] > 0]["Net P&L"].sum() / abs(trades[trades["Net P&L"] < 0]["Net P&L"].sum()) if (trades["Net P&L"] < 0).any() else 0
-    avg_winloss = trades["Net P&L"].mean() if len(trades) > 0 else 0
-    max_drawdown = trades["Net P&L"].min() if len(trades) > 0 else 0
-    recovery_factor = trades["Net P&L"].sum() / abs(max_drawdown) if max_drawdown < 0 else 0
-    consistency = win_rate  # For demo, use win_rate as consistency
-
-    radar_metrics = [
-        min(win_rate, 100),
-        min(profit_factor * 20, 100),
-        min(avg_winloss * 5, 100),
-        min(abs(max_drawdown) * 0.5, 100),
-        min(recovery_factor * 20, 100),
-        min(consistency, 100)
-    ]
-    zella_score = sum(radar_metrics) / len(radar_metrics)
-    return radar_metrics, zella_score
-
-def zella_score_section(trades):
-    radar_metrics, zella_score = calculate_zella_score(trades)
-    categories = ["Win %", "Profit factor", "Avg win/loss", "Max drawdown", "Recovery factor", "Consistency"]
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatterpolar(
-        r=radar_metrics,
-        theta=categories,
-        fill='toself',
-        line_color='purple',
-        fillcolor='rgba(155,89,182,0.5)'
-    ))
-    fig.update_layout(
-        polar=dict(bgcolor="#181818"),
-        showlegend=False,
-        margin=dict(l=0, r=0, t=0, b=0),
-        height=300
-    )
-
+def zella_score_section(stats, version):
+    radar_metrics, zella_score = calculate_zella_score(stats)
     st.markdown("#### Zella Score")
-    st.plotly_chart(fig, use_container_width=True)
+    plot("zella", version, lambda: zella_figure(radar_metrics))
 
     st.markdown(
         f"""
@@ -251,52 +282,47 @@ def zella_score_section(trades):
         unsafe_allow_html=True
     )
 
-def display_trades(trades):
-    # --- Table Header ---
-    header_cols = st.columns([2,2,2,2,2,2,2,1,1])
-    headers = ["Date", "Symbol", "Side", "Quantity", "Price", "Pips", "Net P&L", "Edit", "Delete"]
-    for i, col in enumerate(headers):
-        header_cols[i].markdown(f"<b style='color:#FFD700'>{col}</b>", unsafe_allow_html=True)
-
-    # --- Table Rows ---
-    for idx, row in trades.iterrows():
-        cols = st.columns([2,2,2,2,2,2,2,1,1])
-        for i, col_name in enumerate(["Date", "Symbol", "Side", "Quantity", "Price", "Pips", "Net P&L"]):
-            if col_name == "Net P&L":
-                if row[col_name] > 0:
-                    color = "#27ae60"   # Green
-                    text_color = "white"
-                elif row[col_name] < 0:
-                    color = "#c0392b"   # Red
-                    text_color = "white"
-                else:
-                    color = "white"
-                    text_color = "black"
-                cols[i].markdown(
-                    f"<div style='background-color:{color};color:{text_color};padding:4px;border-radius:4px;text-align:center'>{row[col_name]}</div>",
-                    unsafe_allow_html=True)
-            else:
-                cols[i].markdown(f"<div style='padding:4px;text-align:center'>{row[col_name]}</div>", unsafe_allow_html=True)
-        # Add Edit and Delete buttons
-        edit_btn = cols[7].button("✏️", key=f"edit_trade_{idx}", help="Edit this trade")
-        delete_btn = cols[8].button("🗑️", key=f"delete_trade_{idx}", help="Delete this trade")
-        if edit_btn:
-            st.session_state['edit_trade_row'] = idx
-        if delete_btn:
-            st.session_state['delete_trade_row'] = idx
+def _pnl_style(value):
+    if value > 0:
+        return "background-color:#27ae60;color:white"   # Green
+    if value < 0:
+        return "background-color:#c0392b;color:white"   # Red
+    return ""
+
+def filter_trades(trades, key):
+    if trades.empty:
+        return trades
+    c1, c2, c3 = st.columns([2, 2, 1])
+    dates = trades["Date"]
+    date_range = c1.date_input("Date range", value=(dates.min().date(), dates.max().date()), key=f"{key}_dates")
+    symbols = c2.multiselect("Symbol", sorted(trades["Symbol"].dropna().astype(str).unique()), key=f"{key}_symbols")
+    side = c3.selectbox("Side", ["All", "Buy", "Sell"], key=f"{key}_side")
+    mask = pd.Series(True, index=trades.index)
+    if len(date_range) == 2:
+        mask &= (dates >= pd.Timestamp(date_range[0])) & (dates <= pd.Timestamp(date_range[1]))
+    if symbols:
+        mask &= trades["Symbol"].astype(str).isin(symbols)
+    if side != "All":
+        mask &= trades["Side"] == side
+    return trades[mask]
+
+@st.fragment
+@profiling.timed("render: trades table", rows=lambda trades, daily: len(trades))
+def display_trades(trades, daily):
+    columns = ["Date", "Symbol", "Side", "Quantity", "Price", "Pips", "Net P&L"]
+    filtered = filter_trades(trades, "trades")
+    page = paginate(filtered[columns], "trades", columns)
+    row_actions(page, "trades", "trade", TRADE_COLUMNS, page.style.map(_pnl_style, subset=["Net P&L"]))
 
     # --- Daily Total P&L ---
-    if not trades.empty:
-        trades["Date"] = pd.to_datetime(trades["Date"])
-        daily_pnl = trades.groupby(trades["Date"].dt.date)["Net P&L"].sum()
+    if not daily.empty:
         st.markdown("<hr>", unsafe_allow_html=True)
         st.markdown("<b style='color:#FFD700'>Daily Total P&L:</b>", unsafe_allow_html=True)
-        for day, pnl in daily_pnl.items():
+        lines = []
+        for day, pnl in zip(daily["Date"].dt.date, daily["Net P&L"]):
             color = "#3498db" if pnl > 0 else "#9b59b6" if pnl < 0 else "#444"
-            st.markdown(
-                f"<span style='color:{color};font-weight:bold'>{day}: {pnl:.2f}</span>",
-                unsafe_allow_html=True
-            )
+            lines.append(f"<span style='color:{color};font-weight:bold'>{day}: {pnl:.2f}</span>")
+        st.markdown("<br>".join(lines), unsafe_allow_html=True)
 
 def trade_edit_form(row):
     with st.form("edit_trade_form"):
@@ -327,94 +353,275 @@ def trade_edit_form(row):
                 st.error("Please enter valid numbers for Quantity, Price, Net P&L, and Pips.")
     return None
 
-def kpi_cards(trades):
-    total_trades = len(trades)
-    total_pnl = trades["Net P&L"].sum() if not trades.empty else 0
-    win_trades = trades[trades["Net P&L"] > 0]
-    loss_trades = trades[trades["Net P&L"] < 0]
-    win_rate = (len(win_trades) / total_trades * 100) if total_trades else 0
-    avg_win = win_trades["Net P&L"].mean() if not win_trades.empty else 0
-    avg_loss = loss_trades["Net P&L"].mean() if not loss_trades.empty else 0
-    profit_factor = win_trades["Net P&L"].sum() / abs(loss_trades["Net P&L"].sum()) if not loss_trades.empty else 0
+def drawdown_metrics(stats):
+    c1, c2, c3, c4, c5, c6 = st.columns(6)
+    c1.metric("Max Drawdown", f"${stats['Max Drawdown']:.2f}", f"-{stats['Max Drawdown %']:.1f}%", delta_color="off")
+    c2.metric("Longest Drawdown", f"{stats['Max Drawdown Duration']:.0f} days")
+    recovery = stats["Time to Recovery"]
+    c3.metric("Time to Recovery", "—" if recovery is None else f"{recovery:.0f} days",
+              help="From the deepest point of the max drawdown back to the previous peak")
+    c4.metric("Recovery Factor", f"{stats['Recovery Factor']:.2f}")
+    c5.metric("Sharpe", f"{stats['Sharpe']:.2f}", help="Annualized, on daily returns")
+    c6.metric("Sortino", f"{stats['Sortino']:.2f}", help="Annualized, on daily returns")
+
+@profiling.timed("render: KPI cards")
+def kpi_cards(stats):
     current_investment = get_investment()
 
     c1, c2, c3, c4, c5, c6 = st.columns(6)
-    c1.metric("Total Trades", total_trades)
-    c2.metric("Total P&L", f"${total_pnl:.2f}")
-    c3.metric("Win Rate", f"{win_rate:.2f}%")
-    c4.metric("Avg Win", f"${avg_win:.2f}")
-    c5.metric("Avg Loss", f"${avg_loss:.2f}")
+    c1.metric("Total Trades", stats["Total Trades"])
+    c2.metric("Total P&L", f"${stats['Total P&L']:.2f}")
+    c3.metric("Win Rate", f"{stats['Win Rate']:.2f}%")
+    c4.metric("Avg Win", f"${stats['Avg Win']:.2f}")
+    c5.metric("Avg Loss", f"${stats['Avg Loss']:.2f}")
     c6.metric("Current Investment", f"${current_investment:.2f}")
 
-def profit_factor_daywin_chart(trades):
-    if trades.empty:
+# sections are fragments: their own widgets (month pickers, table paging) rerun only that section
+
+@st.fragment
+@profiling.timed("render: overview tab")
+def overview_section(view, stats, version):
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("<h5 style='text-align:center;'>Profit Factor & Day Win %</h5>", unsafe_allow_html=True)
+        plot("profit_factor_daywin", version, lambda: profit_factor_daywin_figure(view))
+    with col2:
+        st.markdown("<h5 style='text-align:center;'>Avg Win/Loss</h5>", unsafe_allow_html=True)
+        plot("avg_win_loss", version, lambda: avg_win_loss_figure(view))
+    with col3:
+        st.markdown("<h5 style='text-align:center;'>Zella Score</h5>", unsafe_allow_html=True)
+        zella_score_section(stats, version)
+
+@st.fragment
+@profiling.timed("render: equity tab")
+def equity_section(curve, daily, rolling, stats, version, window):
+    drawdown_metrics(stats)
+    col_eq, col_ratio = st.columns([2, 1])
+    with col_eq:
+        st.markdown("<h5 style='text-align:center;'>Equity Curve & Drawdown</h5>", unsafe_allow_html=True)
+        plot("equity_curve", version, lambda: equity_curve_figure(curve, window))
+    with col_ratio:
+        st.markdown("<h5 style='text-align:center;'>Rolling Sharpe / Sortino (20 days)</h5>", unsafe_allow_html=True)
+        plot("rolling_ratios", version, lambda: rolling_ratio_figure(daily, rolling, window))
+
+@st.fragment
+@profiling.timed("render: daily P&L tab")
+def daily_section(view, version, source):
+    col4, col5 = st.columns(2)
+    with col4:
+        st.markdown("<h5 style='text-align:center;'>Month Status</h5>", unsafe_allow_html=True)
+        month_status_calendar(source)
+    with col5:
+        st.markdown("<h5 style='text-align:center;'>Daily P&L</h5>", unsafe_allow_html=True)
+        plot("daily_pnl", version, lambda: daily_pnl_figure(view))
+
+@st.fragment
+@profiling.timed("render: breakdown tab")
+def breakdown_section(cube, version):
+    by = st.radio("Break down by", analytics.BREAKDOWNS, horizontal=True, key="breakdown_by")
+    if by in ("Hour", "Session") and cube["Hour"].nunique() <= 1:
+        st.caption("Trades are recorded with their date only, so they all fall into the same hour.")
+    table = versioned(("breakdown", by), version, lambda: analytics.breakdown(cube, by))
+    if table.empty:
+        st.info("No trades to break down.")
         return
-    trades_by_day = trades.groupby("Date")
-    days = []
-    profit_factors = []
-    win_percents = []
-    for day, group in trades_by_day:
-        win = group[group["Net P&L"] > 0]["Net P&L"].sum()
-        loss = abs(group[group["Net P&L"] < 0]["Net P&L"].sum())
-        pf = win / loss if loss > 0 else win
-        win_pct = (group["Net P&L"] > 0).mean() * 100
-        days.append(day)
-        profit_factors.append(pf)
-        win_percents.append(win_pct)
-    fig = go.Figure()
-    fig.add_trace(go.Bar(x=days, y=profit_factors, name="Profit Factor", marker_color="#3498db"))
-    fig.add_trace(go.Scatter(x=days, y=win_percents, name="Day Win %", yaxis="y2", marker_color="#9b59b6"))
-    fig.update_layout(
-        yaxis=dict(title="Profit Factor"),
-        yaxis2=dict(title="Day Win %", overlaying="y", side="right"),
-        barmode='group',
-        height=180,
-        margin=dict(l=0, r=0, t=0, b=0)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-def avg_win_loss_chart(trades):
+    plot(f"breakdown_{by}", version, lambda: breakdown_figure(table, by))
+    st.dataframe(table, hide_index=True, use_container_width=True, column_config={
+        "Net P&L": st.column_config.NumberColumn(format="$%.2f"),
+        "Win Rate": st.column_config.NumberColumn(format="%.1f%%"),
+        "Profit Factor": st.column_config.NumberColumn(format="%.2f"),
+        "Avg Win": st.column_config.NumberColumn(format="$%.2f"),
+        "Avg Loss": st.column_config.NumberColumn(format="$%.2f"),
+        "Expectancy": st.column_config.NumberColumn(format="$%.2f"),
+        "Pips per Lot": st.column_config.NumberColumn(format="%.1f"),
+    })
+
+@st.fragment
+@profiling.timed("render: simulation tab")
+def simulation_section(trades, version):
+    # runs only on demand: the paths are kept in this session (as histograms and percentiles) until
+    # the journal, the symbol filter or a parameter changes
+    with st.form("simulation_form"):
+        c1, c2, c3, c4, c5, c6 = st.columns(6)
+        method = c1.selectbox("Method", list(simulation.RESAMPLERS), key="sim_method")
+        paths = c2.number_input("Paths", min_value=100, max_value=1_000_000, value=10_000, step=1_000, key="sim_paths")
+        horizon = c3.number_input("Trades per path", min_value=1, max_value=1_000_000, value=max(len(trades), 1),
+                                  key="sim_horizon", help="Bootstrap methods only; a shuffle replays every trade")
+        block = c4.number_input("Block (trades)", min_value=1, max_value=500, value=5, key="sim_block",
+                                help="Consecutive trades per draw, block bootstrap only")
+        ruin = c5.slider("Ruin at a loss of", min_value=5, max_value=100, value=100, step=5, format="%d%%",
+                         key="sim_ruin", help="Share of the current balance")
+        seed = c6.number_input("Seed", min_value=0, value=None, step=1, key="sim_seed", placeholder="random")
+        run = st.form_submit_button("Run simulation", disabled=trades.empty)
     if trades.empty:
+        st.info("No trades to resample.")
         return
-    trades_by_day = trades.groupby("Date")
-    days = []
-    avg_wins = []
-    avg_losses = []
-    for day, group in trades_by_day:
-        win = group[group["Net P&L"] > 0]["Net P&L"].mean() if not group[group["Net P&L"] > 0].empty else 0
-        loss = group[group["Net P&L"] < 0]["Net P&L"].mean() if not group[group["Net P&L"] < 0].empty else 0
-        days.append(day)
-        avg_wins.append(win)
-        avg_losses.append(loss)
-    fig = go.Figure()
-    fig.add_trace(go.Bar(x=days, y=avg_wins, name="Avg Win", marker_color="#2980b9"))
-    fig.add_trace(go.Bar(x=days, y=avg_losses, name="Avg Loss", marker_color="#8e44ad"))
-    fig.update_layout(
-        barmode='group',
-        height=180,
-        margin=dict(l=0, r=0, t=0, b=0),
-        yaxis_title="Average"
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    key = (version, method, paths, horizon, block, ruin, seed)
+    if run:
+        balance = get_investment()
+        pnl = versioned("journal_pnl", version, lambda: journal_pnl(trades))
+        bar = st.progress(0.0, text="Simulating...")
+        result, (headline, table) = simulate_risk(
+            pnl, balance, method, paths, horizon, block, ruin / 100, seed,
+            progress=lambda done, total: bar.progress(done / total, text=f"Simulated {done:,} of {total:,} paths")
+        )
+        bar.empty()
+        figures = [
+            simulation_histogram(result["Final Equity"], "Final equity", balance),
+            simulation_histogram(result["Max Drawdown %"], "Max drawdown %"),
+            simulation_histogram(result["Longest Losing Streak"], "Longest losing streak (trades)",
+                                 bins=max(1, min(60, int(result["Longest Losing Streak"].max())))),
+        ]
+        st.session_state["simulation"] = (key, headline, table, figures)
+    stored = st.session_state.get("simulation")
+    if stored is None or stored[0] != key:
+        st.caption(f"Resamples the {len(trades):,} trades' Net P&L from the current balance. "
+                   "Set the parameters and run the simulation.")
+        return
+    _, headline, table, figures = stored
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Risk of Ruin", f"{headline['Risk of Ruin %']:.2f}%")
+    c2.metric("Probability of Loss", f"{headline['Probability of Loss %']:.2f}%")
+    c3.metric("Median Final Equity", f"${table['Final Equity']['P50']:,.2f}",
+              f"{table['Final Equity']['P50'] - headline['Start Balance']:,.2f}")
+    c4.metric("Median Max Drawdown", f"{table['Max Drawdown %']['P50']:.2f}%")
+    for col, fig in zip(st.columns(3), figures):
+        with col:
+            st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(pd.DataFrame(table).T, use_container_width=True,
+                 column_config={stat: st.column_config.NumberColumn(format="%.2f") for stat in ["P5", "P50", "P95", "Mean"]})
+    st.caption(f"{headline['Paths']:,} paths of {headline['Trades per Path']:,} trades from ${headline['Start Balance']:,.2f}"
+               + (" (a shuffle always replays the whole journal)." if method == "Shuffle" else "."))
+
+@st.fragment
+@profiling.timed("render: excursions tab")
+def excursion_section(trades, version):
+    interval = st.radio("Bars", list(prices.INTERVALS), horizontal=True, key="excursion_interval",
+                        help="Intraday bars are only available from the provider for recent dates")
+    try:
+        table, failed = versioned(("excursions", interval), version, lambda: trade_excursions(trades, interval))
+    except RuntimeError as e:  # the configured price provider is not installed
+        st.error(str(e))
+        return
+    if failed:
+        st.warning(f"No {interval} price history for: {', '.join(sorted(failed))}")
+    table = table.dropna(subset=["MAE %"])
+    if table.empty:
+        st.info("No trades with price history to measure.")
+        return
+    c1, c2, c3, c4 = st.columns(4)
+    wins, losses = table[table["Net P&L"] > 0], table[table["Net P&L"] <= 0]
+    c1.metric("Median MAE (wins)", f"{wins['MAE %'].median():.2f}%" if len(wins) else "-")
+    c2.metric("Median MAE (losses)", f"{losses['MAE %'].median():.2f}%" if len(losses) else "-")
+    c3.metric("Median MFE (wins)", f"{wins['MFE %'].median():.2f}%" if len(wins) else "-")
+    c4.metric("Median MFE (losses)", f"{losses['MFE %'].median():.2f}%" if len(losses) else "-")
+    col1, col2 = st.columns(2)
+    with col1:
+        plot(f"mae_{interval}", version, lambda: excursion_figure(table, "MAE %"))
+    with col2:
+        plot(f"mfe_{interval}", version, lambda: excursion_figure(table, "MFE %"))
+    st.caption(f"{len(table):,} of {len(trades):,} trades measured over {interval} bars from the trade's entry "
+               "to the end of its day (the journal records no exit time).")
+
+@st.fragment(run_every=2)
+def pattern_poll(journal):
+    # while the model is fitted in the background: check every 2 s, rerun the app once it is ready
+    _, status = pattern_model(journal)
+    if status != "training":
+        st.rerun()
 
-def month_status_calendar(trades):
-    if trades.empty:
+@st.fragment
+@profiling.timed("render: patterns tab")
+def pattern_section(symbols):
+    # the model covers the whole journal; the symbol filter only narrows what is shown
+    journal, version = load_trades(), data_version()
+    if journal.empty:
+        st.info("No trades to analyse.")
+        return
+    model, status = pattern_model(journal)
+    if model is None:
+        if status == "training":
+            st.info(f"Fitting clusters and the win-probability model on {len(journal):,} trades in the background...")
+            pattern_poll(journal)
+        else:
+            st.error(status)
+        return
+    key = (version, tuple(sorted(symbols)))
+    table, clusters, reliability, weights = versioned("patterns", key, lambda: pattern_report(journal, model, symbols))
+    if table.empty:
+        st.info("No trades of the selected symbols.")
+        return
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Trades", f"{len(table):,}")
+    c2.metric("Win Rate", f"{(table['Net P&L'] > 0).mean() * 100:.1f}%")
+    c3.metric("Mean Win Probability", f"{table['Win Probability'].mean():.1f}%")
+    c4.metric("Holdout AUC", f"{model['holdout_auc']:.3f}" if model["holdout_auc"] is not None else "-",
+              help="Model fitted on the earlier trades, scored on the latest 20%; 0.5 is a coin flip")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        plot(f"pattern_clusters_{key[1]}", version, lambda: breakdown_figure(clusters, "Cluster"))
+    with col2:
+        plot(f"pattern_calibration_{key[1]}", version, lambda: calibration_figure(reliability))
+    with col3:
+        plot("pattern_weights", version, lambda: weights_figure(weights))
+    st.dataframe(clusters, hide_index=True, use_container_width=True, column_config={
+        "Net P&L": st.column_config.NumberColumn(format="$%.2f"),
+        "Win Rate": st.column_config.NumberColumn(format="%.1f%%"),
+        "Avg Win Probability": st.column_config.NumberColumn(format="%.1f%%"),
+        "Avg P&L": st.column_config.NumberColumn(format="$%.2f"),
+        "Avg Size": st.column_config.NumberColumn(format="%.3f"),
+        "Avg Pips": st.column_config.NumberColumn(format="%.1f"),
+        "Buy %": st.column_config.NumberColumn(format="%.0f%%"),
+        "Avg Prior Streak": st.column_config.NumberColumn(format="%.2f"),
+    })
+    page = paginate(table, "patterns", ["Date", "Win Probability", "Cluster", "Net P&L"])
+    st.dataframe(page, hide_index=True, use_container_width=True, column_config={
+        "Win Probability": st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
+        "Net P&L": st.column_config.NumberColumn(format="$%.2f"),
+    })
+    st.caption(f"Clusters and win probability from side, weekday, size, pips, symbol and the previous trade's "
+               f"outcome and streak; fitted on {model['rows']:,} trades.")
+
+def symbol_filter(symbols):
+    # scopes every KPI, chart, calendar and the trades table; empty means the whole book
+    return st.multiselect("Symbols", symbols, key="symbol_filter", placeholder="All symbols")
+
+@profiling.timed("chart window", rows=lambda daily, version: len(daily))
+def chart_controls(daily, version):
+    # one date window and aggregation level for every chart, applied server-side before any figure
+    # is built; returns the re-bucketed per-day frame, the window and the figure cache key
+    c1, c2, c3 = st.columns([3, 1, 2])
+    first = daily["Date"].min().date() if not daily.empty else datetime.today().date()
+    last = daily["Date"].max().date() if not daily.empty else first
+    picked = c1.date_input("Chart window", value=(first, last), key="chart_window")
+    level = c2.selectbox("Aggregate by", ["auto", "day", "week", "month"], key="chart_level")
+    window = (pd.Timestamp(picked[0]), pd.Timestamp(picked[1])) if len(picked) == 2 else (None, None)
+    view, used = versioned("chart_view", (version, window, level),
+                           lambda: analytics.aggregate(analytics.in_window(daily, *window), level))
+    note = f"{len(view):,} {used} buckets"
+    if level not in ("auto", used):
+        note += f" ({level} would exceed {analytics.POINT_BUDGET:,} points)"
+    c3.caption(note)
+    return view, window, (version, window, level)
+
+def month_status_calendar(store):
+    # both calendars read the store's calendar index (or a DailyCalendar of the symbol-scoped days):
+    # picking a month is a lookup of that month's days
+    months = store.calendar_months()
+    if not months:
         return
-    trades["Date"] = pd.to_datetime(trades["Date"])
     month = st.selectbox(
         "Select Month", 
-        sorted(trades["Date"].dt.strftime("%Y-%m").unique()), 
-        index=len(trades["Date"].dt.strftime("%Y-%m").unique())-1,
+        months, 
+        index=len(months)-1,
         key="month_status_calendar_month"
     )
-    month_trades = trades[trades["Date"].dt.strftime("%Y-%m") == month]
-    days = pd.date_range(start=month_trades["Date"].min(), end=month_trades["Date"].max())
-    pnl_map = month_trades.groupby(month_trades["Date"].dt.day)["Net P&L"].sum().to_dict()
+    month_days = store.calendar_month(month)
     calendar = []
-    for day in days:
-        pnl = pnl_map.get(day.day, 0)
+    for day in range(min(month_days), max(month_days) + 1):
+        pnl = month_days[day][0] if day in month_days else 0
         color = "#3498db" if pnl > 0 else "#9b59b6" if pnl < 0 else "#444"
-        calendar.append({"day": day.day, "pnl": pnl, "color": color})
+        calendar.append({"day": day, "pnl": pnl, "color": color})
     st.write("#### Month Status")
     cols = st.columns(7)
     for i, entry in enumerate(calendar):
@@ -425,14 +632,55 @@ def month_status_calendar(trades):
                 unsafe_allow_html=True
             )
 
-def trading_calendar(trades):
-    if trades.empty:
+@st.fragment
+@profiling.timed("render: calendar tab")
+def calendar_section(store, version):
+    months = store.calendar_months()
+    if not months:
         st.info("No trades to display in calendar.")
         return
-
-    trades["Date"] = pd.to_datetime(trades["Date"])
+    view = st.radio("View", ["Month", "Year", "Heatmap"], horizontal=True, key="calendar_view",
+                    label_visibility="collapsed")
+    if view == "Month":
+        trading_calendar(store, months)
+        return
+    years = sorted({month[:4] for month in months})
+    year = st.selectbox("Select Year", years, index=len(years) - 1, key="calendar_year")
+    if view == "Year":
+        year_calendar(store, int(year))
+    else:
+        plot(f"heatmap_{year}", version, lambda: pnl_heatmap_figure(store, int(year)))
+
+def year_calendar(store, year):
+    days = year_days(store, year)
+    cal = calendar.Calendar(firstweekday=0)
+    cols = st.columns(4)
+    for month in range(1, 13):
+        total = sum(values[0] for (m, _), values in days.items() if m == month)
+        trades = sum(values[1] for (m, _), values in days.items() if m == month)
+        cells = []
+        for week in cal.monthdayscalendar(year, month):
+            row = []
+            for day in week:
+                values = days.get((month, day))
+                if day == 0:
+                    row.append("<td></td>")
+                    continue
+                color = "#222" if values is None else "#27ae60" if values[0] > 0 else "#c0392b" if values[0] < 0 else "#444"
+                title = f"{year}-{month:02d}-{day:02d}" + ("" if values is None else f": ${values[0]:,.2f}, {values[1]} trades")
+                row.append(f"<td title='{title}' style='background:{color};color:#ddd;width:14%;"
+                           f"text-align:center;font-size:0.7em;border-radius:3px'>{day}</td>")
+            cells.append("<tr>" + "".join(row) + "</tr>")
+        color = "#27ae60" if total > 0 else "#c0392b" if total < 0 else "#888"
+        cols[(month - 1) % 4].markdown(
+            f"<div style='margin-bottom:12px'><b style='color:#FFD700'>{calendar.month_abbr[month]}</b> "
+            f"<span style='color:{color}'>${total:,.0f}</span> <span style='color:#888;font-size:0.8em'>{trades} trades</span>"
+            f"<table style='width:100%;border-collapse:separate;border-spacing:2px'>{''.join(cells)}</table></div>",
+            unsafe_allow_html=True
+        )
+
+def trading_calendar(store, months):
     # Select month and year
-    months = sorted(trades["Date"].dt.strftime("%Y-%m").unique())
     selected_month = st.selectbox(
         "Select Month", 
         months, 
@@ -445,9 +693,9 @@ def trading_calendar(trades):
         year, month = datetime.today().year, datetime.today().month
 
     # Prepare daily P&L
-    month_trades = trades[trades["Date"].dt.strftime("%Y-%m") == selected_month]
-    daily_pnl = month_trades.groupby(month_trades["Date"].dt.day)["Net P&L"].sum().to_dict()
-    daily_count = month_trades.groupby(month_trades["Date"].dt.day).size().to_dict()
+    month_index = store.calendar_month(selected_month)
+    daily_pnl = {day: values[0] for day, values in month_index.items()}
+    daily_count = {day: values[1] for day, values in month_index.items()}
 
     # Calendar grid
     cal = calendar.Calendar(firstweekday=0)  # 0=Monday, 6=Sunday
@@ -465,38 +713,29 @@ def trading_calendar(trades):
             if day == 0:
                 cols[i].markdown(" ")
             else:
-                pnl = daily_pnl.get(day, 0)
-                count = daily_count.get(day, 0)
-                if pnl > 0:
-                    color = "#27ae60"  # Green
-                    text_color = "white"
-                elif pnl < 0:
-                    color = "#c0392b"  # Red
-                    text_color = "white"
-                else:
-                    color = "#222"
-                    text_color = "#888"
-                if count > 0:
-                    cols[i].markdown(
-                        f"<div style='background:{color};color:{text_color};padding:4px 0 2px 0;border-radius:5px;text-align:center;font-size:0.85em;min-height:38px;line-height:1.1;'>"
-                        f"<b>{day}</b><br><span style='font-size:0.95em'>${pnl:,.0f}</span><br><span style='font-size:0.8em'>{count} trade{'s' if count>1 else ''}</span></div>",
-                        unsafe_allow_html=True
-                    )
-                else:
-                    cols[i].markdown(
-                        f"<div style='background:#222;color:#888;padding:4px 0 2px 0;border-radius:5px;text-align:center;font-size:0.85em;min-height:38px;line-height:1.1;'>{day}</div>",
-                        unsafe_allow_html=True
-                    )
-
-def safe_read_csv(path, columns):
-    if not os.path.exists(path) or os.stat(path).st_size == 0:
-        return pd.DataFrame(columns=columns)
-    try:
-        return pd.read_csv(path)
-    except pd.errors.EmptyDataError:
-        return pd.DataFrame(columns=columns)
+                cols[i].markdown(calendar_cell(day, daily_pnl.get(day, 0), daily_count.get(day, 0)), unsafe_allow_html=True)
+
+def profiling_panel():
+    # per-section timings of this rerun, only when profiling is switched on (see profiling.py)
+    run = profiling.finish_run()
+    if run is None:
+        return
+    with st.sidebar.expander("⏱️ Profiling", expanded=True):
+        st.caption(f"This rerun: {run['total_ms']:,.0f} ms" + (f", profile in {run['profile']}" if "profile" in run else ""))
+        table = pd.DataFrame(run["sections"], columns=["name", "ms", "rows", "depth"])
+        table["name"] = ["\u2003" * depth + name for name, depth in zip(table["name"], table["depth"])]
+        st.dataframe(table[["name", "ms", "rows"]], hide_index=True, use_container_width=True,
+                     column_config={"name": "Section", "ms": st.column_config.NumberColumn("ms", format="%.1f"),
+                                    "rows": st.column_config.NumberColumn("Rows", format="%d")})
 
 def main():
+    profiling.start_run()
+    try:
+        dashboard()
+    finally:
+        profiling_panel()
+
+def dashboard():
     st.set_page_config(page_title="Personal Trading Journal", layout="wide")
     st.markdown(
         "<h1 style='text-align:center; color:#FFD700; font-size: 3em; font-weight: bold;'>DD_ TRADING</h1>",
@@ -509,6 +748,9 @@ def main():
     st.markdown("## 💰 Investment Adjustment")
     current_investment = get_investment()
     st.info(f"**Current Investment:** ${current_investment:,.2f}")
+    as_of = st.date_input("Balance as of", value=None, key="balance_as_of")
+    if as_of is not None:
+        st.caption(f"Balance at the end of {as_of}: ${balance_as_of(as_of):,.2f}")
 
     # --- Investment Table Visibility Toggle ---
     if "show_investments" not in st.session_state:
@@ -519,25 +761,30 @@ def main():
 
     investments_df = load_investments()
 
+    if 'write_conflict' in st.session_state:
+        st.error(st.session_state.pop('write_conflict'))
+
     # --- Handle Delete ---
     if 'delete_invest_row' in st.session_state:
-        investments_df = investments_df.drop(st.session_state['delete_invest_row']).reset_index(drop=True)
-        save_investments(investments_df)
+        apply_write(delete_investment, st.session_state['delete_invest_row'],
+                    st.session_state.pop('delete_invest_etag', None))
         del st.session_state['delete_invest_row']
         st.rerun()
 
     # --- Handle Edit ---
     if 'edit_invest_row' in st.session_state:
-        row = investments_df.iloc[st.session_state['edit_invest_row']]
+        if st.session_state['edit_invest_row'] not in investments_df.index:
+            st.session_state['write_conflict'] = "This investment entry no longer exists."
+            del st.session_state['edit_invest_row']
+            st.rerun()
+        row = investments_df.loc[st.session_state['edit_invest_row']]
         st.info("Edit Investment Entry")
         updated = investment_edit_form(row)
         if updated:
-            investments_df.iloc[st.session_state['edit_invest_row']] = updated
-            for col in investments_df.columns:
-                investments_df.at[st.session_state['edit_invest_row'], col] = updated[col]
-            save_investments(investments_df)
+            if apply_write(update_investment, st.session_state['edit_invest_row'], updated,
+                           st.session_state.pop('edit_invest_etag', None)):
+                st.success("Investment updated!")
             del st.session_state['edit_invest_row']
-            st.success("Investment updated!")
             st.rerun()
         st.stop()  # Only show the edit form while editing
 
@@ -559,7 +806,21 @@ def main():
         st.markdown("### Investment History")
         display_investments_table(investments_df)
 
+    version = data_version()
     trades = load_trades()
+    daily = daily_stats()
+    index = versioned("symbol_index", version, lambda: symbol_index(trades))
+    source = get_store()
+
+    # --- Symbol filter: everything below works on the selected symbols only ---
+    symbols = symbol_filter(sorted(index))
+    if symbols:
+        version = (*version, tuple(sorted(symbols)))
+        trades, daily = versioned("scope", version, lambda: scope(trades, index, symbols))
+        source = versioned("scope_calendar", version, lambda: DailyCalendar(daily))
+    stats = calculate_statistics(daily)
+    curve, rolling, risk = versioned("risk", version, lambda: risk_report(trades, daily, stats))
+    stats.update(risk)
 
     # Sidebar for input and stats
     with st.sidebar:
@@ -569,74 +830,100 @@ def main():
             save_trade(trade_data)
             st.success("Trade added successfully!")
             st.rerun()
+        with st.expander("Import Broker Statement"):
+            result = import_statement_form()
+            if result:
+                st.session_state['import_result'] = (
+                    f"Imported {result['imported']:,} of {result['read']:,} rows "
+                    f"({result['duplicates']:,} already in the journal, {result['rejected']:,} skipped)."
+                )
+                st.rerun()
+            if 'import_result' in st.session_state:
+                st.success(st.session_state.pop('import_result'))
+        with st.expander("Export Reports"):
+            export_reports_form(symbols)
         st.write("### Stats")
-        stats = calculate_statistics()
         display_statistics(stats)
-        st.write("### Win/Loss Pie")
-        if not trades.empty:
-            pie_chart(trades)
+        # collapsed sections are not built at all; opening one reruns the app to render it
+        pie = st.expander("Win/Loss Pie", key="pie_expander", on_change="rerun")
+        if pie.open and not trades.empty:
+            with pie:
+                plot("pie", version, lambda: pie_figure(stats))
+        with st.expander("Snapshots"):
+            snapshots_panel()
+        with st.expander("Maintenance"):
+            if st.button("Compact journals"):
+                get_store().compact()
+                st.success("Journals compacted.")
+            info = cache_info()
+            st.caption(f"Data cache: {info['hits']} hits / {info['misses']} misses, {info['entries']} entries")
 
     # --- KPI Cards ---
-    kpi_cards(trades)
+    kpi_cards(stats)
     st.divider()
 
-    # --- First Row: 3 Small Charts ---
-    with st.container():
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown("<h5 style='text-align:center;'>Profit Factor & Day Win %</h5>", unsafe_allow_html=True)
-            profit_factor_daywin_chart(trades)
-        with col2:
-            st.markdown("<h5 style='text-align:center;'>Avg Win/Loss</h5>", unsafe_allow_html=True)
-            avg_win_loss_chart(trades)
-        with col3:
-            st.markdown("<h5 style='text-align:center;'>Zella Score</h5>", unsafe_allow_html=True)
-            zella_score_section(trades)
-    st.divider()
-
-    # --- Second Row: Month Calendar & Daily P&L ---
-    with st.container():
-        col4, col5 = st.columns(2)
-        with col4:
-            st.markdown("<h5 style='text-align:center;'>Month Status</h5>", unsafe_allow_html=True)
-            month_status_calendar(trades)
-        with col5:
-            st.markdown("<h5 style='text-align:center;'>Daily P&L</h5>", unsafe_allow_html=True)
-            daily_pnl_chart(trades)
+    # --- Dashboard sections: only the open tab computes and renders anything ---
+    view, window, view_version = chart_controls(daily, version)
+    overview, equity, daily_tab, calendar_tab, breakdown_tab, excursion_tab, pattern_tab, simulation_tab = st.tabs(
+        ["📊 Overview", "📈 Equity & Drawdown", "📅 Daily P&L", "🗓️ Trading Calendar", "🔎 Breakdown", "📐 MAE / MFE",
+         "🧠 Patterns", "🎲 Simulation"],
+        key="dashboard_tab", on_change="rerun"
+    )
+    if overview.open:
+        with overview:
+            overview_section(view, stats, view_version)
+    if equity.open:
+        with equity:
+            equity_section(curve, daily, rolling, stats, view_version, window)
+    if daily_tab.open:
+        with daily_tab:
+            daily_section(view, view_version, source)
+    if calendar_tab.open:
+        with calendar_tab:
+            calendar_section(source, version)
+    if breakdown_tab.open:
+        with breakdown_tab:
+            breakdown_section(versioned("cube", version, lambda: trade_cube(trades)), version)
+    if excursion_tab.open:
+        with excursion_tab:
+            excursion_section(trades, version)
+    if pattern_tab.open:
+        with pattern_tab:
+            pattern_section(symbols)
+    if simulation_tab.open:
+        with simulation_tab:
+            simulation_section(trades, version)
     st.divider()
 
     # --- Trades Table ---
     st.markdown("<h5 style='text-align:center;'>Trades Table</h5>", unsafe_allow_html=True)
-    display_trades(trades)
+    display_trades(trades, daily)
 
     st.divider()  # or st.markdown("<hr>", unsafe_allow_html=True)
 
     # --- Handle Trade Delete ---
     if 'delete_trade_row' in st.session_state:
-        trades = trades.drop(st.session_state['delete_trade_row']).reset_index(drop=True)
-        trades.to_csv(CSV_FILE, index=False)
+        apply_write(delete_trade, st.session_state['delete_trade_row'],
+                    st.session_state.pop('delete_trade_etag', None))
         del st.session_state['delete_trade_row']
         st.rerun()
 
     # --- Handle Trade Edit ---
     if 'edit_trade_row' in st.session_state:
-        row = trades.iloc[st.session_state['edit_trade_row']]
+        if st.session_state['edit_trade_row'] not in trades.index:
+            st.session_state['write_conflict'] = "This trade no longer exists."
+            del st.session_state['edit_trade_row']
+            st.rerun()
+        row = trades.loc[st.session_state['edit_trade_row']]
         st.info("Edit Trade Entry")
         updated = trade_edit_form(row)
         if updated:
-            trades.iloc[st.session_state['edit_trade_row']] = updated
-            for col in trades.columns:
-                trades.at[st.session_state['edit_trade_row'], col] = updated[col]
-            trades.to_csv(CSV_FILE, index=False)
+            if apply_write(update_trade, st.session_state['edit_trade_row'], updated,
+                           st.session_state.pop('edit_trade_etag', None)):
+                st.success("Trade updated!")
             del st.session_state['edit_trade_row']
-            st.success("Trade updated!")
             st.rerun()
         st.stop()  # Only show the edit form while editing
 
-    # --- Trading Calendar ---
-    st.divider()
-    st.markdown("<h5 style='text-align:center;'>Trading Calendar</h5>", unsafe_allow_html=True)
-    trading_calendar(trades)
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,65 @@
+# Load time and peak RSS of the CSV journal vs the columnar Arrow journal.
+#
+#   python benchmarks/bench_formats.py                 # 10k, 1M and 10M rows
+#   python benchmarks/bench_formats.py --rows 10000 1000000
+#
+# Every load runs in a fresh interpreter so peak RSS is not polluted by the previous case.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import storage
+from synthetic import peak_rss_mb, synthetic_trades
+
+CHART_COLUMNS = ["Date", "Net P&L"]
+
+def worker(fmt, path):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if fmt == "csv":
+        df = storage._safe_read(path, storage.TRADE_COLUMNS)
+    elif fmt == "csv-pruned":
+        df = storage._safe_read(path, storage.TRADE_COLUMNS, CHART_COLUMNS)
+    elif fmt == "arrow":
+        df = storage.read_arrow(path, storage.TRADE_COLUMNS)
+    else:
+        df = storage.read_arrow(path, storage.TRADE_COLUMNS, CHART_COLUMNS)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak, "load_rss_mb": peak - baseline,
+                      "rows": len(df), "frame_mb": df.memory_usage(deep=True).sum() / 2**20}))
+
+def run(rows_list):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in rows_list:
+            trades = synthetic_trades(rows)
+            csv_path = os.path.join(tmp, f"trades_{rows}.csv")
+            arrow_path = os.path.join(tmp, f"trades_{rows}.arrow")
+            trades.to_csv(csv_path, index=False)
+            storage.write_arrow(arrow_path, trades, storage.TRADE_COLUMNS)
+            del trades
+            for fmt, path in (("csv", csv_path), ("csv-pruned", csv_path),
+                              ("arrow", arrow_path), ("arrow-pruned", arrow_path)):
+                out = subprocess.run([sys.executable, __file__, "--worker", fmt, path],
+                                     capture_output=True, text=True, check=True)
+                result = {"format": fmt, "file_mb": os.path.getsize(path) / 2**20, **json.loads(out.stdout)}
+                results.append(result)
+                print(json.dumps(result))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--worker", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(*args.worker)
+    else:
+        run(args.rows)
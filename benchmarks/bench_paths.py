@@ -0,0 +1,282 @@
+# Wall time and peak memory of the data and analytics hot paths, no Streamlit server involved.
+#
+#   python benchmarks/bench_paths.py                                   # csv backend, 1k/100k/1M rows
+#   python benchmarks/bench_paths.py --rows 1000 10000000 --backend csv sqlite arrow --out results.json
+#   python benchmarks/bench_paths.py --cases load_trades kpis --rows 100000
+#
+# Each case runs in a fresh interpreter against a seeded synthetic journal (see synthetic.py);
+# its inputs are prepared untimed, then one call is timed. Results are JSON lines on stdout,
+# and the whole list is written to --out so runs can be diffed for regressions.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from synthetic import peak_rss_mb, write_journal, write_prices
+
+APPENDS = 100
+
+def _inputs(store):
+    import analytics
+    trades = store.load_trades()
+    daily = analytics.daily_stats(store.daily_summary())
+    return trades, daily
+
+def _risk(store):
+    import core
+    trades, daily = _inputs(store)
+    stats = core.calculate_statistics(daily)
+    curve, rolling, report = core.risk_report(trades, daily, stats)
+    stats.update(report)
+    return trades, daily, stats, curve, rolling
+
+# case -> setup(store) returning (timed callable, rows it processes); read-only cases come first,
+# the cases that change the journal run last
+def setup_safe_read(store):
+    import storage
+    return lambda: storage._safe_read(storage.CSV_FILE, storage.TRADE_COLUMNS), None
+
+def setup_load_trades(store):
+    import storage
+    def run():
+        storage.invalidate_cache()
+        return store.load_trades()
+    return run, None
+
+def setup_load_investments(store):
+    import storage
+    def run():
+        storage.invalidate_cache()
+        return store.load_investments()
+    return run, None
+
+def setup_stats_rebuild(store):
+    def run():
+        store.stats.state = None
+        if os.path.exists(store.stats.path):
+            os.remove(store.stats.path)
+        return store.daily_summary()
+    return run, None
+
+def setup_store_daily_summary(store):
+    store.daily_summary()
+    return store.daily_summary, None
+
+def setup_daily_summary(store):
+    import analytics
+    trades, _ = _inputs(store)
+    return lambda: analytics.daily_summary(trades), len(trades)
+
+def setup_daily_stats(store):
+    import analytics
+    summary = store.daily_summary()
+    return lambda: analytics.daily_stats(summary), len(summary)
+
+def setup_kpis(store):
+    import core
+    _, daily = _inputs(store)
+    return lambda: core.calculate_statistics(daily), len(daily)
+
+def setup_get_investment(store):
+    import core
+    return core.get_investment, None
+
+def setup_equity_curve(store):
+    import analytics
+    trades, _ = _inputs(store)
+    return lambda: analytics.equity_curve(trades, 10_000.0), len(trades)
+
+def setup_drawdown_stats(store):
+    import analytics
+    trades, _ = _inputs(store)
+    curve = analytics.equity_curve(trades, 10_000.0)
+    return lambda: analytics.drawdown_stats(curve, 10_000.0), len(curve)
+
+def setup_risk_ratios(store):
+    import analytics
+    _, daily = _inputs(store)
+    returns = analytics.daily_returns(daily, 10_000.0)
+    return lambda: (analytics.risk_ratios(returns), analytics.risk_ratios(returns, window=20)), len(returns)
+
+def setup_risk_report(store):
+    import core
+    trades, daily = _inputs(store)
+    stats = core.calculate_statistics(daily)
+    return lambda: core.risk_report(trades, daily, stats), len(trades)
+
+def setup_zella(store):
+    import core
+    stats = _risk(store)[2]
+    return lambda: core.calculate_zella_score(stats), None
+
+def setup_aggregate(store):
+    import analytics
+    _, daily = _inputs(store)
+    return lambda: [analytics.aggregate(daily, level) for level in ("auto", "week", "month")], len(daily)
+
+def setup_chart_figures(store):
+    import app
+    import core
+    import analytics
+    trades, daily, stats, curve, rolling = _risk(store)
+    window = (None, None)
+    view, _ = analytics.aggregate(daily, "auto")
+
+    def run():
+        radar, _ = core.calculate_zella_score(stats)
+        return [
+            app.pie_figure(stats),
+            app.profit_factor_daywin_figure(view),
+            app.avg_win_loss_figure(view),
+            app.daily_pnl_figure(view),
+            app.zella_figure(radar),
+            app.equity_curve_figure(curve, window),
+            app.rolling_ratio_figure(daily, rolling, window),
+        ]
+    return run, len(trades)
+
+def setup_calendar(store):
+    store.calendar_months()
+    return lambda: [store.calendar_month(month) for month in store.calendar_months()], None
+
+def setup_simulation(store):
+    # 10k bootstrap paths over the whole journal, in this process (the pool only starts from 100k)
+    import core
+    trades, _ = _inputs(store)
+    pnl = core.journal_pnl(trades)
+    return lambda: core.simulate_risk(pnl, 10_000.0, paths=10_000, seed=0, workers=1), len(pnl) * 10_000
+
+def setup_excursions(store):
+    # MAE/MFE from the synthetic daily bars; the first call fills the price cache, the timed one reads it
+    import core
+    trades, _ = _inputs(store)
+    core.trade_excursions(trades)
+    return lambda: core.trade_excursions(trades), len(trades)
+
+def setup_patterns(store):
+    # cold feature matrix and model fit (what the background trainer runs), then the batched predict
+    import core
+    trades, _ = _inputs(store)
+
+    def run():
+        model, _ = core.pattern_model(trades, wait=True)
+        core.pattern_report(trades, model)
+
+    return run, len(trades)
+
+def setup_cli_cold_start(store):
+    # a cron run of the headless CLI: fresh interpreter, imports, KPIs (memory is the child's, not shown)
+    store.daily_summary()
+    return lambda: subprocess.run([sys.executable, "-m", "core", "kpis"], check=True, stdout=subprocess.DEVNULL), None
+
+def setup_append(store):
+    import core
+    store.daily_summary()
+    trade = {"Date": "2030-01-02", "Symbol": "xauusd", "Side": "Buy", "Quantity": 0.01,
+             "Price": 2000.0, "Net P&L": 12.5, "Pips": 25.0}
+
+    def run():
+        for _ in range(APPENDS):
+            core.save_trade(trade)
+    return run, APPENDS
+
+def setup_edit(store):
+    store.daily_summary()
+    trades = store.load_trades()
+    key = trades.index[len(trades) // 2]
+    return lambda: store.update_trade(key, {"Net P&L": -7.25}), None
+
+def setup_delete(store):
+    store.daily_summary()
+    trades = store.load_trades()
+    key = trades.index[len(trades) // 2]
+    return lambda: store.delete_trade(key), None
+
+CASES = {
+    "safe_read": setup_safe_read,
+    "load_trades": setup_load_trades,
+    "load_investments": setup_load_investments,
+    "stats_rebuild": setup_stats_rebuild,
+    "store_daily_summary": setup_store_daily_summary,
+    "daily_summary": setup_daily_summary,
+    "daily_stats": setup_daily_stats,
+    "kpis": setup_kpis,
+    "get_investment": setup_get_investment,
+    "equity_curve": setup_equity_curve,
+    "drawdown_stats": setup_drawdown_stats,
+    "risk_ratios": setup_risk_ratios,
+    "risk_report": setup_risk_report,
+    "zella": setup_zella,
+    "aggregate": setup_aggregate,
+    "chart_figures": setup_chart_figures,
+    "calendar": setup_calendar,
+    "simulation": setup_simulation,
+    "excursions": setup_excursions,
+    "patterns": setup_patterns,
+    "cli_cold_start": setup_cli_cold_start,
+    "append": setup_append,
+    "edit": setup_edit,
+    "delete": setup_delete,
+}
+
+def worker(case):
+    import storage
+    store = storage.get_store()
+    run, rows = CASES[case](store)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": peak, "case_rss_mb": peak - baseline, "items": rows}))
+
+def run(rows_list, backends, cases, out=None, seed=0):
+    results = []
+    for rows in rows_list:
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                write_journal(tmp, rows, seed)
+                env = dict(os.environ, TRADE_JOURNAL_BACKEND=backend, PYTHONPATH=ROOT)
+                if "excursions" in cases:
+                    write_prices(tmp, pd.read_csv(os.path.join(tmp, "trades.csv")), seed)
+                    env["TRADE_JOURNAL_PRICES"] = "local"
+                if backend != "csv":  # first open imports (or splits) the CSVs; keep that out of the timings
+                    subprocess.run([sys.executable, "-c", "import storage; storage.get_store()"],
+                                   cwd=tmp, env=env, check=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                for case in cases:
+                    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", case],
+                                          cwd=tmp, env=env, capture_output=True, text=True)
+                    result = {"case": case, "backend": backend, "rows": rows}
+                    if proc.returncode == 0:
+                        result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+                    else:
+                        result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                    results.append(result)
+                    print(json.dumps(result), flush=True)
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=1)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", choices=["csv", "sqlite", "arrow", "partitioned"], nargs="+", default=["csv"])
+    parser.add_argument("--cases", choices=list(CASES), nargs="+", default=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write all results to this JSON file")
+    parser.add_argument("--worker", choices=list(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker)
+    else:
+        run(args.rows, args.backend, args.cases, args.out, args.seed)
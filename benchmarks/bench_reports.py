@@ -0,0 +1,47 @@
+# Report export scaling: a year of monthly (or weekly) HTML reports rendered with 1, 2, 4... workers.
+#
+#   python benchmarks/bench_reports.py                         # 1M trades, monthly, 1..cpu_count workers
+#   python benchmarks/bench_reports.py --rows 100000 --period week --workers 1 4 8
+#
+# The journal is written once into a temporary directory; each run exports every period into a
+# fresh folder. Results are JSON lines: seconds, reports written and the speedup over one worker.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from synthetic import write_journal
+
+def main():
+    parser = argparse.ArgumentParser(description="Time report exports against the worker count.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--period", choices=["month", "week"], default="month")
+    parser.add_argument("--months", type=int, default=12, help="export the first N months of the journal")
+    parser.add_argument("--workers", type=int, nargs="+")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[n for n in (2, 4, 8, 16) if n < cpus], cpus})
+    with tempfile.TemporaryDirectory() as tmp:
+        # a journal spanning at least the requested months
+        write_journal(tmp, args.rows, args.seed, trades_per_day=max(1, args.rows // (args.months * 21)))
+        os.chdir(tmp)
+        import pandas as pd
+        import report
+        first = pd.Timestamp("2015-01-01")
+        end = first + pd.DateOffset(months=args.months) - pd.Timedelta(days=1)
+        baseline = None
+        for n in workers:
+            start = time.perf_counter()
+            paths = report.export_reports(args.period, first, end, os.path.join(tmp, f"out-{n}"), workers=n)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(json.dumps({"rows": args.rows, "period": args.period, "workers": n, "reports": len(paths),
+                              "seconds": seconds, "speedup": baseline / seconds}), flush=True)
+
+if __name__ == "__main__":
+    main()
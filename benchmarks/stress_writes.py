@@ -0,0 +1,125 @@
+# Concurrent writers against one journal: appends, etag-checked edits and deletes from many threads.
+#
+#   python benchmarks/stress_writes.py                        # csv, sqlite, arrow and partitioned
+#   python benchmarks/stress_writes.py --backend csv --threads 16 --ops 200
+#
+# Fails (exit 1) if a row was lost or duplicated, if the running statistics drifted from a full
+# rebuild, or if restoring the journal's snapshots does not round-trip it; conflicting edits are
+# expected and only counted.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import analytics
+import storage
+from running_stats import _drawdown
+
+def make_store(backend, tmp):
+    if backend == "sqlite":
+        store = storage.SqliteStore(os.path.join(tmp, "journal.db"))
+    elif backend == "arrow":
+        store = storage.ArrowStore(os.path.join(tmp, "trades.arrow"), os.path.join(tmp, "investment.arrow"))
+    elif backend == "partitioned":
+        store = storage.PartitionedStore(os.path.join(tmp, "trades"), os.path.join(tmp, "investment.csv"))
+    else:
+        store = storage.CsvStore(os.path.join(tmp, "trades.csv"), os.path.join(tmp, "investment.csv"))
+    store.init()
+    return store
+
+def trade(rng):
+    return {
+        "Date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Symbol": rng.choice(["xauusd", "eurusd", "gbpusd"]),
+        "Side": rng.choice(["Buy", "Sell"]),
+        "Quantity": 0.01,
+        "Price": round(rng.uniform(1.0, 4000.0), 2),
+        "Net P&L": round(rng.gauss(0.0, 40.0), 2),
+        "Pips": round(rng.uniform(0.0, 300.0), 1),
+    }
+
+def writer(store, seed, ops, counts, lock):
+    rng = random.Random(seed)
+    appended = deleted = updated = conflicts = 0
+    for _ in range(ops):
+        roll = rng.random()
+        if roll < 0.6:
+            store.append_trade(trade(rng))
+            appended += 1
+            continue
+        trades = store.load_trades()
+        if trades.empty:
+            continue
+        key = rng.choice(list(trades.index))
+        etag = storage.row_etag(trades.loc[key], storage.TRADE_COLUMNS)
+        time.sleep(rng.random() / 1000)  # widen the read-to-write window so sessions overlap
+        try:
+            if roll < 0.8:
+                store.update_trade(key, {"Net P&L": round(rng.gauss(0.0, 40.0), 2)}, etag)
+                updated += 1
+            else:
+                store.delete_trade(key, etag)
+                deleted += 1
+        except storage.ConflictError:
+            conflicts += 1
+    with lock:
+        counts["appended"] += appended
+        counts["updated"] += updated
+        counts["deleted"] += deleted
+        counts["conflicts"] += conflicts
+
+def run(backend, threads, ops, seed=0):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(backend, tmp)
+        counts = {"appended": 0, "updated": 0, "deleted": 0, "conflicts": 0}
+        lock = threading.Lock()
+        start = time.perf_counter()
+        workers = [threading.Thread(target=writer, args=(store, seed + i, ops, counts, lock))
+                   for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        seconds = time.perf_counter() - start
+
+        storage.invalidate_cache()
+        trades = store.load_trades()
+        rows_ok = len(trades) == counts["appended"] - counts["deleted"]
+        incremental = store.daily_summary()
+        expected = analytics.daily_summary(trades)
+        daily_ok = (len(incremental) == len(expected)
+                    and (incremental["Date"].astype(str) == expected["Date"]).all()
+                    and ((incremental.iloc[:, 1:].astype(float) - expected.iloc[:, 1:].astype(float)).abs() < 1e-6).all().all())
+        equity = store.equity_stats()
+        equity_ok = all(abs(a - b) < 1e-6 for a, b in zip(equity.values(), _drawdown(trades["Net P&L"])))
+        # every write left a snapshot (SQLite's are taken later, so flush them): restoring the oldest
+        # kept version and then the latest one must give back the same journal and statistics
+        store.flush_snapshot()
+        versions = store.snapshots.versions()
+        store.restore_snapshot(versions[0]["id"])
+        store.restore_snapshot(versions[-1]["id"])
+        storage.invalidate_cache()
+        restored = store.load_trades()
+        snapshots_ok = (restored[storage.TRADE_COLUMNS].astype(str).equals(trades[storage.TRADE_COLUMNS].astype(str))
+                        and all(abs(a - b) < 1e-6 for a, b in zip(store.equity_stats().values(), equity.values())))
+        result = {"backend": backend, "threads": threads, "ops_per_thread": ops, "seconds": round(seconds, 3),
+                  "rows": len(trades), **counts, "rows_ok": rows_ok, "stats_ok": bool(daily_ok and equity_ok),
+                  "versions": len(versions), "snapshots_ok": bool(snapshots_ok)}
+        print(json.dumps(result))
+        return rows_ok and daily_ok and equity_ok and snapshots_ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["csv", "sqlite", "arrow", "partitioned"], nargs="+",
+                        default=["csv", "sqlite", "arrow", "partitioned"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=100, help="operations per thread")
+    args = parser.parse_args()
+    ok = [run(backend, args.threads, args.ops) for backend in args.backend]
+    sys.exit(0 if all(ok) else 1)
@@ -0,0 +1,92 @@
+# Seeded synthetic journals for the benchmarks, written in the app's own CSV layout.
+#
+#   python benchmarks/synthetic.py --rows 1000000 --out /tmp/journal
+#   python benchmarks/synthetic.py --rows 10000 --symbols xauusd eurusd --trades-per-day 20 --win-ratio 0.55
+import os
+import sys
+import resource
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import storage
+
+SYMBOLS = ["xauusd", "eurusd", "gbpusd", "usdjpy", "btcusd"]
+
+def synthetic_trades(rows, seed=0, symbols=SYMBOLS, trades_per_day=50, win_ratio=0.5, start="2015-01-01"):
+    # business days in order, about trades_per_day trades on each; wins/losses drawn with win_ratio
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start, periods=max(1, -(-rows // trades_per_day))).strftime("%Y-%m-%d").to_numpy()
+    win = rng.random(rows) < win_ratio
+    size = np.abs(rng.normal(40.0, 25.0, rows)).round(2) + 0.01
+    return pd.DataFrame({
+        "Date": np.sort(rng.choice(days, rows)),
+        "Symbol": rng.choice(symbols, rows),
+        "Side": rng.choice(["Buy", "Sell"], rows),
+        "Quantity": rng.choice([0.01, 0.02, 0.05, 0.1], rows),
+        "Price": rng.uniform(1.0, 4000.0, rows).round(2),
+        "Net P&L": np.where(win, size, -size),
+        "Pips": rng.uniform(0.0, 300.0, rows).round(1),
+    })
+
+def write_journal(directory, rows, seed=0, deposit=10_000.0, **options):
+    # trades.csv plus an investment.csv in the pre-link layout: the deposit and the per-day P&L the app
+    # used to mirror into it, which the ledger takes back out as its link offset on first open
+    os.makedirs(directory, exist_ok=True)
+    trades = synthetic_trades(rows, seed, **options)
+    trades.to_csv(os.path.join(directory, storage.CSV_FILE), index=False)
+    deltas = trades.groupby("Date", sort=True)["Net P&L"].sum().round(2)
+    investments = pd.concat([
+        pd.DataFrame({"Date": [trades["Date"].iloc[0] if rows else "2015-01-01"], "Amount": [deposit]}),
+        deltas.rename("Amount").reset_index(),
+    ], ignore_index=True)
+    investments.to_csv(os.path.join(directory, storage.INVEST_CSV), index=False)
+    return len(trades), len(investments)
+
+def write_prices(directory, trades, seed=0):
+    # daily bars for the local price provider (prices/<symbol>_1d.csv), wide enough to contain the
+    # entry price of every trade of the day, so every trade has an excursion on both sides
+    rng = np.random.default_rng(seed)
+    out = os.path.join(directory, "prices")
+    os.makedirs(out, exist_ok=True)
+    days = trades.groupby(["Symbol", "Date"])["Price"].agg(["min", "max"]).reset_index()
+    spread = days["max"] - days["min"]
+    days["Low"] = (days["min"] - rng.uniform(0.0, 0.05, len(days)) * spread).clip(lower=0.01).round(2)
+    days["High"] = (days["max"] + rng.uniform(0.0, 0.05, len(days)) * spread).round(2)
+    days["Open"] = (days["Low"] + rng.random(len(days)) * (days["High"] - days["Low"])).round(2)
+    days["Close"] = (days["Low"] + rng.random(len(days)) * (days["High"] - days["Low"])).round(2)
+    for symbol, bars in days.groupby("Symbol"):
+        bars.rename(columns={"Date": "Time"})[["Time", "Open", "High", "Low", "Close"]].to_csv(
+            os.path.join(out, f"{symbol}_1d.csv"), index=False)
+    return len(days)
+
+def peak_rss_mb():
+    # VmHWM belongs to this address space; ru_maxrss would include the parent's high-water mark
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic trades.csv / investment.csv.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    parser.add_argument("--trades-per-day", type=int, default=50)
+    parser.add_argument("--win-ratio", type=float, default=0.5)
+    parser.add_argument("--prices", action="store_true", help="also daily bars for TRADE_JOURNAL_PRICES=local")
+    args = parser.parse_args()
+    n_trades, n_invest = write_journal(args.out, args.rows, args.seed, symbols=args.symbols,
+                                       trades_per_day=args.trades_per_day, win_ratio=args.win_ratio)
+    print(f"Wrote {n_trades} trades and {n_invest} investment entries to {args.out}")
+    if args.prices:
+        trades = pd.read_csv(os.path.join(args.out, storage.CSV_FILE))
+        print(f"Wrote {write_prices(args.out, trades, args.seed)} daily bars to {os.path.join(args.out, 'prices')}")
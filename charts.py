@@ -0,0 +1,281 @@
+import calendar
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+import analytics
+import profiling
+
+# the dashboard's figure and calendar builders: plotly and HTML only, no Streamlit, so app.py renders
+# them with st.plotly_chart / st.markdown and report.py writes the same charts into exported reports
+
+@profiling.timed("figure: win/loss pie")
+def pie_figure(stats):
+    win = stats["Win Count"]
+    loss = stats["Loss Count"]
+    fig = go.Figure(data=[go.Pie(labels=['Win', 'Loss'], values=[win, loss], marker_colors=['#3498db', '#9b59b6'])])
+    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0), height=250)
+    return fig
+
+@profiling.timed("figure: daily P&L")
+def daily_pnl_figure(daily):
+    # daily is built from the store's per-Date summary (aggregated in the database for the sqlite backend)
+    all_dates = daily["Date"]
+    win_values = daily["Wins"]
+    loss_values = daily["Losses"]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=all_dates, y=win_values,
+        name="Winning P&L",
+        marker_color="#3498db"  # Blue
+    ))
+    fig.add_trace(go.Bar(
+        x=all_dates, y=loss_values,
+        name="Losing P&L",
+        marker_color="#9b59b6"  # Purple
+    ))
+    fig.update_layout(
+        barmode='group',
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=180,
+        xaxis_title="Date",
+        yaxis_title="Net P&L"
+    )
+    return fig
+
+@profiling.timed("figure: zella radar")
+def zella_figure(radar_metrics):
+    categories = ["Win %", "Profit factor", "Avg win/loss", "Max drawdown", "Recovery factor", "Consistency"]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=radar_metrics,
+        theta=categories,
+        fill='toself',
+        line_color='purple',
+        fillcolor='rgba(155,89,182,0.5)'
+    ))
+    fig.update_layout(
+        polar=dict(bgcolor="#181818"),
+        showlegend=False,
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=300
+    )
+    return fig
+
+@profiling.timed("figure: equity curve")
+def equity_curve_figure(curve, window):
+    days = analytics.in_window(analytics.daily_equity(curve), *window)
+    if days.empty:
+        return
+    days = analytics.downsample(days, ["Equity", "Drawdown"])
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=days["Date"], y=days["Equity"], name="Equity", line=dict(color="#3498db")))
+    fig.add_trace(go.Scatter(x=days["Date"], y=days["Peak"], name="Peak", line=dict(color="#9b59b6", dash="dot")))
+    fig.add_trace(go.Scatter(
+        x=days["Date"], y=-days["Drawdown"], name="Drawdown", yaxis="y2",
+        fill="tozeroy", line=dict(color="#e74c3c", width=1), fillcolor="rgba(231,76,60,0.3)"
+    ))
+    fig.update_layout(
+        yaxis=dict(title="Equity"),
+        yaxis2=dict(title="Drawdown", overlaying="y", side="right", showgrid=False),
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: rolling ratios")
+def rolling_ratio_figure(daily, ratios, window):
+    ratios = analytics.in_window(ratios.assign(Date=daily["Date"].to_numpy()), *window)
+    if ratios.empty:
+        return
+    ratios = analytics.downsample(ratios, ["Sharpe", "Sortino"])
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=ratios["Date"], y=ratios["Sharpe"], name="Sharpe", line=dict(color="#3498db")))
+    fig.add_trace(go.Scatter(x=ratios["Date"], y=ratios["Sortino"], name="Sortino", line=dict(color="#9b59b6")))
+    fig.update_layout(legend=dict(orientation="h"), height=300, margin=dict(l=0, r=0, t=0, b=0))
+    return fig
+
+@profiling.timed("figure: profit factor / day win")
+def profit_factor_daywin_figure(daily):
+    if daily.empty:
+        return
+    days = daily["Date"]
+    profit_factors = daily["Profit Factor"]
+    win_percents = daily["Win %"]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=days, y=profit_factors, name="Profit Factor", marker_color="#3498db"))
+    fig.add_trace(go.Scatter(x=days, y=win_percents, name="Day Win %", yaxis="y2", marker_color="#9b59b6"))
+    fig.update_layout(
+        yaxis=dict(title="Profit Factor"),
+        yaxis2=dict(title="Day Win %", overlaying="y", side="right"),
+        barmode='group',
+        height=180,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: avg win/loss")
+def avg_win_loss_figure(daily):
+    if daily.empty:
+        return
+    days = daily["Date"]
+    avg_wins = daily["Avg Win"]
+    avg_losses = daily["Avg Loss"]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=days, y=avg_wins, name="Avg Win", marker_color="#2980b9"))
+    fig.add_trace(go.Bar(x=days, y=avg_losses, name="Avg Loss", marker_color="#8e44ad"))
+    fig.update_layout(
+        barmode='group',
+        height=180,
+        margin=dict(l=0, r=0, t=0, b=0),
+        yaxis_title="Average"
+    )
+    return fig
+
+@profiling.timed("figure: breakdown")
+def breakdown_figure(table, by):
+    colors = ["#3498db" if pnl > 0 else "#9b59b6" for pnl in table["Net P&L"]]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=table[by], y=table["Net P&L"], name="Net P&L", marker_color=colors))
+    fig.add_trace(go.Scatter(x=table[by], y=table["Win Rate"], name="Win %", yaxis="y2", mode="markers",
+                             marker=dict(color="#FFD700", size=8)))
+    fig.update_layout(
+        yaxis=dict(title="Net P&L"),
+        yaxis2=dict(title="Win %", overlaying="y", side="right", range=[0, 100], showgrid=False),
+        xaxis=dict(type="category"),
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: simulation histogram")
+def simulation_histogram(values, title, marker=None, bins=60):
+    # binned here, so a million paths still send only `bins` bars to the browser
+    counts, edges = np.histogram(values, bins=bins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), marker_color="#3498db"))
+    if marker is not None:
+        fig.add_vline(x=marker, line_dash="dash", line_color="#FFD700")
+    fig.update_layout(
+        title=dict(text=title, font=dict(size=14)),
+        yaxis=dict(title="Paths"),
+        bargap=0,
+        height=260,
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: excursion scatter")
+def excursion_figure(table, column):
+    # WebGL scatter of a sample: a million markers would only stall the browser
+    sample = table.sample(min(len(table), 5000), random_state=0) if len(table) > 5000 else table
+    fig = go.Figure()
+    for label, mask, color in [("Wins", sample["Net P&L"] > 0, "#3498db"), ("Losses", sample["Net P&L"] <= 0, "#9b59b6")]:
+        part = sample[mask]
+        fig.add_trace(go.Scattergl(x=part[column], y=part["Net P&L"], mode="markers", name=label,
+                                   marker=dict(color=color, size=5, opacity=0.6),
+                                   customdata=part[["Date", "Symbol", "Side"]].astype(str),
+                                   hovertemplate="%{customdata[0]} %{customdata[1]} %{customdata[2]}<br>"
+                                                 f"{column}: %{{x:.2f}}%<br>Net P&L: $%{{y:,.2f}}<extra></extra>"))
+    fig.update_layout(
+        title=dict(text=f"{column} vs Net P&L", font=dict(size=14)),
+        xaxis=dict(title=column),
+        yaxis=dict(title="Net P&L"),
+        legend=dict(orientation="h"),
+        height=320,
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: pattern calibration")
+def calibration_figure(table):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=table["Predicted"], y=table["Actual"], name="Actual win %", marker_color="#3498db",
+                         customdata=table["Trades"], hovertemplate="Predicted %{x:.1f}%<br>Actual %{y:.1f}%"
+                                                                   "<br>%{customdata:,} trades<extra></extra>"))
+    low, high = float(table["Predicted"].min()), float(table["Predicted"].max())
+    fig.add_trace(go.Scatter(x=[low, high], y=[low, high], mode="lines", name="Perfect calibration",
+                             line=dict(color="#FFD700", dash="dash")))
+    fig.update_layout(
+        title=dict(text="Predicted vs actual win rate (deciles)", font=dict(size=14)),
+        xaxis=dict(title="Predicted win %"),
+        yaxis=dict(title="Actual win %"),
+        legend=dict(orientation="h"),
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
+
+@profiling.timed("figure: pattern weights")
+def weights_figure(weights):
+    weights = weights.iloc[::-1]
+    colors = ["#3498db" if weight > 0 else "#9b59b6" for weight in weights["Weight"]]
+    fig = go.Figure(go.Bar(x=weights["Weight"], y=weights["Feature"], orientation="h", marker_color=colors))
+    fig.update_layout(
+        title=dict(text="Win odds per standard deviation", font=dict(size=14)),
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
+
+def year_days(store, year):
+    # every traded day of the year from the calendar index: 12 month lookups, no table scan
+    return {
+        (month, day): values
+        for month in range(1, 13)
+        for day, values in store.calendar_month(f"{year}-{month:02d}").items()
+    }
+
+@profiling.timed("figure: P&L heatmap")
+def pnl_heatmap_figure(store, year):
+    # GitHub-style year heatmap: one column per week, one row per weekday, colored by the day's P&L
+    days = year_days(store, year)
+    start = pd.Timestamp(year=year, month=1, day=1)
+    dates = pd.date_range(start, pd.Timestamp(year=year, month=12, day=31))
+    pnl = [days[(d.month, d.day)][0] if (d.month, d.day) in days else None for d in dates]
+    text = [
+        f"{d:%Y-%m-%d}: ${days[(d.month, d.day)][0]:,.2f}, {days[(d.month, d.day)][1]} trades"
+        if (d.month, d.day) in days else f"{d:%Y-%m-%d}"
+        for d in dates
+    ]
+    week = (dates - (start - pd.Timedelta(days=start.weekday()))).days // 7
+    bound = max((abs(v) for v in pnl if v is not None), default=1) or 1
+    fig = go.Figure(go.Heatmap(
+        x=week, y=dates.weekday, z=pnl, text=text, hoverinfo="text", xgap=2, ygap=2,
+        colorscale=[[0, "#c0392b"], [0.5, "#222"], [1, "#27ae60"]], zmin=-bound, zmax=bound
+    ))
+    fig.update_layout(
+        yaxis=dict(tickvals=list(range(7)), ticktext=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"], autorange="reversed"),
+        xaxis=dict(title="Week"),
+        height=250,
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+    return fig
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def calendar_cell(day, pnl, count):
+    # one day of the month calendar: green/red with P&L and trade count, grey when nothing traded
+    if count > 0:
+        color, text_color = ("#27ae60", "white") if pnl > 0 else ("#c0392b", "white") if pnl < 0 else ("#222", "#888")
+        return (
+            f"<div style='background:{color};color:{text_color};padding:4px 0 2px 0;border-radius:5px;text-align:center;font-size:0.85em;min-height:38px;line-height:1.1;'>"
+            f"<b>{day}</b><br><span style='font-size:0.95em'>${pnl:,.0f}</span><br><span style='font-size:0.8em'>{count} trade{'s' if count>1 else ''}</span></div>"
+        )
+    return (f"<div style='background:#222;color:#888;padding:4px 0 2px 0;border-radius:5px;text-align:center;font-size:0.85em;min-height:38px;line-height:1.1;'>{day}</div>")
+
+def month_calendar_html(year, month, days):
+    # the whole month as one HTML table; days: {day: (pnl, trades, ...)} as in the calendar index
+    rows = ["<tr>" + "".join(f"<th style='color:#FFD700'>{label}</th>" for label in WEEKDAYS) + "</tr>"]
+    for week in calendar.Calendar(firstweekday=0).monthdayscalendar(year, month):
+        cells = []
+        for day in week:
+            values = days.get(day, (0, 0))
+            cells.append("<td></td>" if day == 0 else f"<td style='width:14%'>{calendar_cell(day, values[0], values[1])}</td>")
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+    return (f"<h3>{calendar.month_name[month]} {year}</h3>"
+            f"<table style='width:100%;border-collapse:separate;border-spacing:4px'>{''.join(rows)}</table>")
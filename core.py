@@ -0,0 +1,443 @@
+import sys
+import json
+from datetime import datetime
+
+import pandas as pd
+
+import analytics
+import prices
+import profiling
+import simulation
+from running_stats import STATS_SUFFIX
+from snapshots import KEEP_DAILY, KEEP_LAST, KEEP_WEEKLY
+from storage import TRADE_COLUMNS, SnapshotBusyError, get_store
+
+# the journal's data and analytics without Streamlit or Plotly: app.py renders what these return and
+# `python -m core` prints the same numbers for cron jobs and scripts
+
+@profiling.timed("investment balance")
+def get_investment():
+    # deposits less withdrawals plus every trade's P&L, from the running ledger and stats: O(1)
+    return get_store().balance()
+
+def get_capital():
+    return get_store().capital()
+
+def balance_as_of(day):
+    return get_store().balance_as_of(day)
+
+def add_investment(amount):
+    row = {"Date": datetime.today().strftime("%Y-%m-%d"), "Amount": float(amount)}
+    get_store().append_investment(row)
+
+def save_trade(trade_data):
+    # the trade's P&L reaches the balance through the ledger link; it is not copied into the ledger
+    get_store().append_trade(trade_data)
+
+@profiling.timed("load trades")
+def load_trades():
+    return get_store().load_trades()
+
+@profiling.timed("load investments")
+def load_investments():
+    return get_store().load_investments()
+
+def update_trade(key, trade_data, etag=None):
+    get_store().update_trade(key, trade_data, etag)
+
+def delete_trade(key, etag=None):
+    get_store().delete_trade(key, etag)
+
+def update_investment(key, row, etag=None):
+    get_store().update_investment(key, row, etag)
+
+def delete_investment(key, etag=None):
+    get_store().delete_investment(key, etag)
+
+def data_version():
+    store = get_store()
+    return store.name, store.version("trades"), store.version("investments")
+
+# --- journal snapshots (see snapshots.py) ---
+
+SNAPSHOT_COLUMNS = {"id": "Version", "created": "Created", "reason": "Reason", "files": "Files", "size": "Bytes",
+                    "stored": "Bytes Stored"}
+
+def snapshot_versions():
+    # every kept version of the journal, newest first
+    versions = pd.DataFrame(get_store().snapshots.versions(), columns=list(SNAPSHOT_COLUMNS))
+    return versions.rename(columns=SNAPSHOT_COLUMNS).iloc[::-1].reset_index(drop=True)
+
+def take_snapshot(reason="manual"):
+    # -> the new version's index entry, None if the journal matches the latest version
+    return get_store().snapshot(reason)
+
+def snapshot_diff(a, b=None):
+    # -> (per-file changes, rows added and removed) from version a to b, or to the journal as it is now
+    return get_store().snapshot_diff(a, b)
+
+def restore_snapshot(version_id):
+    return get_store().restore_snapshot(version_id)
+
+def prune_snapshots(keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    return get_store().prune_snapshots(keep_last, keep_daily, keep_weekly)
+
+@profiling.timed("daily stats")
+def daily_stats():
+    # the per-day frame every KPI, chart and calendar is derived from (kept up to date by the store)
+    return analytics.daily_stats(get_store().daily_summary())
+
+@profiling.timed("KPIs", rows=lambda daily: len(daily))
+def calculate_statistics(daily):
+    # global KPIs come from the shared per-day frame, not from another scan of the trades
+    return analytics.kpis(daily)
+
+@profiling.timed("risk report", rows=lambda trades, *args: len(trades))
+def risk_report(trades, daily, stats, capital=None):
+    # everything derived from the equity curve, computed once per data version; the curve starts
+    # from the capital paid in, whatever symbols the trades were narrowed to (or from `capital`,
+    # e.g. the balance a report period opened with)
+    capital = get_capital() if capital is None else capital
+    curve = analytics.equity_curve(trades, capital)
+    report = analytics.drawdown_stats(curve, capital)
+    returns = analytics.daily_returns(daily, capital)
+    rolling = analytics.risk_ratios(returns, window=20)
+    overall = analytics.risk_ratios(returns).iloc[-1] if len(returns) else {"Sharpe": 0.0, "Sortino": 0.0}
+    report["Sharpe"] = 0.0 if pd.isna(overall["Sharpe"]) else float(overall["Sharpe"])
+    report["Sortino"] = 0.0 if pd.isna(overall["Sortino"]) else float(overall["Sortino"])
+    report["Day Win Rate"] = float((daily["Net P&L"] > 0).mean() * 100) if not daily.empty else 0.0
+    return curve, rolling, report
+
+def calculate_zella_score(stats):
+    win_rate = stats["Win Rate"]
+    profit_factor = stats["Profit Factor"]
+    avg_winloss = stats["Avg Win"] / abs(stats["Avg Loss"]) if stats["Avg Loss"] else 0
+    max_drawdown_pct = stats["Max Drawdown %"]  # peak-to-trough on the equity curve, not the worst trade
+    recovery_factor = stats["Recovery Factor"]
+    consistency = stats["Day Win Rate"]
+
+    radar_metrics = [
+        min(win_rate, 100),
+        min(profit_factor * 20, 100),
+        min(avg_winloss * 40, 100),
+        max(100 - max_drawdown_pct, 0),
+        min(max(recovery_factor, 0) * 20, 100),
+        min(consistency, 100)
+    ]
+    zella_score = sum(radar_metrics) / len(radar_metrics)
+    return radar_metrics, zella_score
+
+def price_ranges(trades):
+    # per symbol, the days its trades span: the bar range to fetch (once) from the price cache
+    days = pd.DataFrame({"Symbol": trades["Symbol"].astype(str), "Day": pd.to_datetime(trades["Date"]).dt.normalize()})
+    spans = days.dropna().groupby("Symbol")["Day"].agg(["min", "max"])
+    return {symbol: (lo, hi + pd.Timedelta(days=1)) for symbol, lo, hi in spans.itertuples()}
+
+@profiling.timed("trade excursions", rows=lambda trades, *args: len(trades))
+def trade_excursions(trades, interval="1d"):
+    # MAE/MFE of every trade from cached OHLC bars; returns the trades with the excursion columns
+    # and the symbols no bars could be found for
+    bars, failed = prices.get_price_cache().history(price_ranges(trades), interval)
+    table = analytics.excursions(trades, bars)
+    return trades[["Date", "Symbol", "Side", "Price", "Net P&L"]].join(table), failed
+
+def _patterns():
+    # scikit-learn takes ~2 s to import: only the pattern analysis pays for it, not every CLI call
+    import patterns
+    return patterns
+
+def _sidecar(store, suffix):
+    # next to the journal, like its running stats (trades.csv.*, journal.db.*, trades.arrow.*)
+    return store.stats.path[:-len(STATS_SUFFIX)] + suffix
+
+@profiling.timed("pattern features", rows=lambda trades: len(trades))
+def pattern_features(trades):
+    patterns = _patterns()
+    return patterns.feature_matrix(trades, _sidecar(get_store(), patterns.FEATURES_SUFFIX))
+
+def pattern_model(trades, wait=False):
+    # the clusters and win-probability model of the journal's current version: loaded if persisted,
+    # else fitted on the background trainer, (None, "training") meanwhile unless wait
+    patterns = _patterns()
+    if patterns.joblib is None:
+        return None, "The pattern analysis needs scikit-learn: pip install scikit-learn"
+    store = get_store()
+
+    def build():
+        features, _ = pattern_features(trades)
+        return patterns.fit(features, trades.loc[features.index, "Net P&L"].astype(float) > 0)
+
+    return patterns.get_trainer().model(_sidecar(store, patterns.MODEL_SUFFIX), store.version("trades"), build, wait)
+
+@profiling.timed("pattern report", rows=lambda trades, *args: len(trades))
+def pattern_report(trades, model, symbols=None):
+    # every trade's win probability and cluster from one batched predict over the whole journal,
+    # then (for the selected symbols) the per-cluster profile, the calibration and the weights
+    patterns = _patterns()
+    features, _ = pattern_features(trades)
+    predictions = patterns.predict(model, features)
+    ordered = trades.loc[features.index]
+    if symbols:
+        mask = ordered["Symbol"].isin(symbols).to_numpy()
+        ordered, features, predictions = ordered[mask], features[mask], predictions[mask]
+    table = ordered[["Date", "Symbol", "Side", "Quantity", "Net P&L"]].join(predictions)
+    if table.empty:
+        return table, pd.DataFrame(), pd.DataFrame(), patterns.coefficients(model)
+    return (table, patterns.cluster_profile(ordered, predictions, features),
+            patterns.calibration(ordered, predictions), patterns.coefficients(model))
+
+def journal_pnl(trades):
+    # Net P&L in date order (journal order within a day), the series the simulations resample
+    order = trades["Date"].to_numpy(dtype="datetime64[ns]").argsort(kind="stable")
+    return trades["Net P&L"].to_numpy(dtype=float)[order]
+
+@profiling.timed("risk simulation", rows=lambda pnl, *args, **kwargs: len(pnl))
+def simulate_risk(pnl, balance, method="Bootstrap", paths=10_000, horizon=None, block=5, ruin=1.0,
+                  seed=None, workers=None, progress=None):
+    # Monte Carlo paths of the next `horizon` trades (default: as many as the journal holds) from the
+    # current balance; returns the per-path metrics and their summary
+    resampler = simulation.BlockBootstrap(block) if method == "Block bootstrap" else simulation.RESAMPLERS[method]()
+    horizon = resampler.horizon(len(pnl), horizon)
+    result = simulation.simulate(pnl, balance, resampler, paths, horizon, ruin, seed, workers, progress)
+    return result, simulation.summary(result, balance, horizon)
+
+@profiling.timed("breakdown cube", rows=lambda trades: len(trades))
+def trade_cube(trades):
+    return analytics.trade_cube(trades)
+
+def symbol_index(trades):
+    # per-symbol row positions, built once per data version
+    return analytics.group_positions(trades["Symbol"])
+
+@profiling.timed("symbol scope")
+def scope(trades, index, symbols):
+    # the journal narrowed to some symbols: their rows are taken from the precomputed positions
+    # (no comparison over every trade) and only those rows are summarized per day
+    trades = trades.iloc[analytics.take_groups(index, symbols)]
+    return trades, analytics.daily_stats(analytics.daily_summary(trades))
+
+class DailyCalendar:
+    # the store's calendar interface (calendar_months / calendar_month) over a per-day frame,
+    # for calendars of a symbol-scoped view
+    def __init__(self, daily):
+        self.months = {}
+        for month, day, pnl, trades, wins, losses in zip(
+                daily["Month"], daily["Day"], daily["Net P&L"], daily["Trades"], daily["Win Count"], daily["Loss Count"]):
+            self.months.setdefault(month, {})[int(day)] = (float(pnl), int(trades), int(wins), int(losses))
+
+    def calendar_months(self):
+        return sorted(self.months)
+
+    def calendar_month(self, month):
+        return self.months.get(month, {})
+
+# --- reports for the command line ---
+
+DAILY_COLUMNS = ["Date", "Net P&L", "Trades", "Win Count", "Loss Count", "Win %", "Profit Factor", "Avg Win", "Avg Loss"]
+CALENDAR_COLUMNS = ["Net P&L", "Trades", "Win Count", "Loss Count"]
+
+def kpi_report():
+    # the dashboard's KPI cards, drawdown metrics and Zella score as one flat dict
+    daily = daily_stats()
+    stats = calculate_statistics(daily)
+    # the equity curve needs only these two columns; skipping the rest halves the CSV parse
+    trades = get_store().load_trades(["Date", "Net P&L"])
+    _, _, report = risk_report(trades, daily, stats)
+    stats.update(report)
+    stats["Current Investment"] = get_investment()
+    stats["Zella Score"] = calculate_zella_score(stats)[1]
+    return stats
+
+def daily_report(level="day", start=None, end=None):
+    daily = analytics.in_window(daily_stats(), start, end)
+    if level != "day":
+        daily, _ = analytics.aggregate(daily, level)
+    return daily.reindex(columns=DAILY_COLUMNS)
+
+def calendar_report(month=None):
+    # one row per month, or one per traded day of the given "YYYY-MM", straight from the calendar index
+    store = get_store()
+    if month is None:
+        return store.monthly_summary()
+    days = store.calendar_month(month)
+    return pd.DataFrame(
+        [[f"{month}-{day:02d}", *values] for day, values in days.items()],
+        columns=["Date", *CALENDAR_COLUMNS],
+    )
+
+def trades_report(start=None, end=None, month=None, symbols=None):
+    # the trades of a date range or month; the partitioned backend reads only the months involved
+    if month is not None:
+        start = pd.Period(month, "M").start_time
+        end = pd.Period(month, "M").end_time.normalize()
+    trades = get_store().load_range(start, end, TRADE_COLUMNS)
+    if symbols:
+        trades = trades[trades["Symbol"].isin(symbols)]
+    return trades[TRADE_COLUMNS]
+
+def balance_report(day=None):
+    store = get_store()
+    capital, balance = store.capital(), store.balance()
+    report = {"Capital": capital, "Trade P&L": balance - capital, "Balance": balance}
+    if day is not None:
+        report["As Of"] = pd.Timestamp(day)
+        report["Balance As Of"] = store.balance_as_of(day)
+    return report
+
+def simulation_report(method="Bootstrap", paths=10_000, horizon=None, block=5, ruin=1.0, seed=None, workers=None):
+    # headline probabilities plus the P5/P50/P95/mean of every metric, flattened into one dict
+    pnl = journal_pnl(get_store().load_trades(["Date", "Net P&L"]))
+    _, (headline, table) = simulate_risk(pnl, get_investment(), method, paths, horizon, block, ruin, seed, workers)
+    report = {"Method": method, **headline}
+    for metric, values in table.items():
+        report.update({f"{metric} {stat}": value for stat, value in values.items()})
+    return report
+
+def breakdown_report(by="Symbol", symbols=None):
+    cube = trade_cube(load_trades())
+    if symbols:
+        cube = cube[cube["Symbol"].isin(symbols)]
+    return analytics.breakdown(cube, by)
+
+def excursion_report(interval="1d", start=None, end=None, month=None, symbols=None):
+    table, failed = trade_excursions(trades_report(start, end, month, symbols), interval)
+    if failed:
+        print(f"no {interval} price history for: {', '.join(sorted(failed))}", file=sys.stderr)
+    return table
+
+def patterns_report(by="cluster", symbols=None):
+    model, error = pattern_model(load_trades(), wait=True)
+    if model is None:
+        raise SystemExit(error)
+    table, clusters, reliability, weights = pattern_report(load_trades(), model, symbols)
+    return {"cluster": clusters, "trades": table, "calibration": reliability, "weights": weights}[by]
+
+def snapshot_report(reason="manual"):
+    entry = take_snapshot(reason)
+    if entry is None:
+        return {"Version": int(snapshot_versions()["Version"].iloc[0]), "Changed": False}
+    return {**{SNAPSHOT_COLUMNS[key]: value for key, value in entry.items()}, "Changed": True}
+
+def restore_report(version_id):
+    entry = restore_snapshot(version_id)
+    return {"Restored": int(version_id), "Version": entry["id"], **balance_report()}
+
+def prune_report(keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+    removed, freed = prune_snapshots(keep_last, keep_daily, keep_weekly)
+    return {"Versions Removed": removed, "Bytes Freed": freed, "Versions Kept": len(snapshot_versions())}
+
+def _plain(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def write(result, fmt="json", out=sys.stdout):
+    if isinstance(result, dict):
+        if fmt == "csv":
+            result = pd.DataFrame({"Metric": list(result), "Value": [_plain(v) if v is not None else "" for v in result.values()]})
+        else:
+            out.write(json.dumps(result, default=_plain, indent=1) + "\n")
+            return
+    if "Date" in result and pd.api.types.is_datetime64_any_dtype(result["Date"]):
+        result = result.assign(Date=result["Date"].dt.strftime("%Y-%m-%d"))
+    if fmt == "csv":
+        result.to_csv(out, index=False)
+    else:
+        out.write(json.dumps(result.to_dict("records"), default=_plain, indent=1) + "\n")
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m core",
+                                     description="Journal KPIs and summaries without starting the dashboard.")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("kpis", help="KPI cards, drawdown, Sharpe/Sortino and Zella score")
+    daily = commands.add_parser("daily", help="daily P&L, or re-bucketed by --level")
+    daily.add_argument("--level", choices=["day", "auto", *analytics.AGGREGATION_LEVELS[1:]], default="day")
+    daily.add_argument("--start", type=pd.Timestamp)
+    daily.add_argument("--end", type=pd.Timestamp)
+    listing = commands.add_parser("trades", help="the trades of a date range or month")
+    listing.add_argument("--start", type=pd.Timestamp)
+    listing.add_argument("--end", type=pd.Timestamp)
+    listing.add_argument("--month", help="YYYY-MM")
+    listing.add_argument("--symbols", nargs="+")
+    balance = commands.add_parser("balance", help="capital paid in, trade P&L and balance")
+    balance.add_argument("--as-of", type=pd.Timestamp, help="also the balance at the end of this day")
+    split = commands.add_parser("breakdown", help="P&L, win rate, profit factor, expectancy... per group")
+    split.add_argument("--by", choices=analytics.BREAKDOWNS, default="Symbol")
+    split.add_argument("--symbols", nargs="+")
+    sim = commands.add_parser("simulate", help="Monte Carlo final equity, drawdown, losing streak and risk of ruin")
+    sim.add_argument("--method", choices=list(simulation.RESAMPLERS), default="Bootstrap")
+    sim.add_argument("--paths", type=int, default=10_000)
+    sim.add_argument("--horizon", type=int, help="trades per path (default: as many as the journal holds)")
+    sim.add_argument("--block", type=int, default=5, help="trades per block for the block bootstrap")
+    sim.add_argument("--ruin", type=float, default=100.0, help="%% of the balance whose loss counts as ruin")
+    sim.add_argument("--seed", type=int)
+    sim.add_argument("--workers", type=int, help="processes (default: a pool from 100k paths on)")
+    mae = commands.add_parser("excursions", help="MAE/MFE of every trade from the cached price history")
+    mae.add_argument("--interval", choices=list(prices.INTERVALS), default="1d")
+    mae.add_argument("--start", type=pd.Timestamp)
+    mae.add_argument("--end", type=pd.Timestamp)
+    mae.add_argument("--month", help="YYYY-MM")
+    mae.add_argument("--symbols", nargs="+")
+    pat = commands.add_parser("patterns", help="trade clusters and win probabilities (fits the model if needed)")
+    pat.add_argument("--show", choices=["cluster", "trades", "calibration", "weights"], default="cluster")
+    pat.add_argument("--symbols", nargs="+")
+    cal = commands.add_parser("calendar", help="per-month totals, or the days of --month")
+    cal.add_argument("--month", help="YYYY-MM")
+    commands.add_parser("snapshots", help="the kept versions of the journal, newest first")
+    snap = commands.add_parser("snapshot", help="snapshot the journal now (nothing is stored if it is unchanged)")
+    snap.add_argument("--reason", default="manual")
+    diff = commands.add_parser("diff", help="rows added and removed from version A to B (default: the journal now)")
+    diff.add_argument("a", type=int)
+    diff.add_argument("b", type=int, nargs="?")
+    diff.add_argument("--files", action="store_true", help="the per-file changes instead of the rows")
+    restore = commands.add_parser("restore", help="put the journal back as of a version (the current one is kept)")
+    restore.add_argument("version", type=int)
+    prune = commands.add_parser("prune", help="drop versions outside the retention policy and their chunks")
+    prune.add_argument("--keep-last", type=int, default=KEEP_LAST)
+    prune.add_argument("--keep-daily", type=int, default=KEEP_DAILY, help="the last version of each of N days")
+    prune.add_argument("--keep-weekly", type=int, default=KEEP_WEEKLY, help="the last version of each of N weeks")
+    args = parser.parse_args(argv)
+
+    if args.command == "kpis":
+        result = kpi_report()
+    elif args.command == "daily":
+        result = daily_report(args.level, args.start, args.end)
+    elif args.command == "trades":
+        result = trades_report(args.start, args.end, args.month, args.symbols)
+    elif args.command == "balance":
+        result = balance_report(args.as_of)
+    elif args.command == "simulate":
+        result = simulation_report(args.method, args.paths, args.horizon, args.block, args.ruin / 100,
+                                   args.seed, args.workers)
+    elif args.command == "breakdown":
+        result = breakdown_report(args.by, args.symbols)
+    elif args.command == "patterns":
+        result = patterns_report(args.show, args.symbols)
+    elif args.command == "excursions":
+        result = excursion_report(args.interval, args.start, args.end, args.month, args.symbols)
+    elif args.command == "snapshots":
+        result = snapshot_versions()
+    elif args.command in ("snapshot", "diff", "restore"):
+        try:
+            if args.command == "snapshot":
+                result = snapshot_report(args.reason)
+            elif args.command == "diff":
+                files, rows = snapshot_diff(args.a, args.b)
+                result = files if args.files else rows
+            else:
+                result = restore_report(args.version)
+        except (KeyError, SnapshotBusyError) as exc:  # an unknown or pruned version, or a busy SQLite WAL
+            raise SystemExit(exc.args[0])
+    elif args.command == "prune":
+        result = prune_report(args.keep_last, args.keep_daily, args.keep_weekly)
+    else:
+        result = calendar_report(args.month)
+    write(result, args.format)
+
+if __name__ == "__main__":
+    main()
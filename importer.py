@@ -0,0 +1,147 @@
+import pandas as pd
+
+from storage import TRADE_COLUMNS, get_store, typed_frame
+
+CHUNK_ROWS = 100_000
+REQUIRED_COLUMNS = ["Date", "Symbol", "Side", "Net P&L"]
+
+# broker export columns -> journal columns; the fee columns are folded into Net P&L.
+# Both exports repeat "Price" (and MT5 "Time") for open/close, which pandas reads as "Price", "Price.1".
+BROKER_FORMATS = {
+    # MT4 account history: Ticket, Open Time, Type, Size, Item, Price, S / L, T / P, Close Time, Price,
+    # Commission, Taxes, Swap, Profit
+    "mt4": {
+        "columns": {"Close Time": "Date", "Item": "Symbol", "Type": "Side", "Size": "Quantity",
+                    "Price": "Price", "Profit": "Net P&L"},
+        "fees": ["Commission", "Taxes", "Swap"],
+    },
+    # MT5 positions: Time, Position, Symbol, Type, Volume, Price, S / L, T / P, Time, Price,
+    # Commission, Swap, Profit
+    "mt5": {
+        "columns": {"Time.1": "Date", "Symbol": "Symbol", "Type": "Side", "Volume": "Quantity",
+                    "Price": "Price", "Profit": "Net P&L"},
+        "fees": ["Commission", "Swap", "Fee"],
+    },
+}
+
+def read_header(source):
+    header = list(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return header
+
+def detect_format(header):
+    header = set(header)
+    if {"Close Time", "Item", "Profit"} <= header:
+        return "mt4"
+    if {"Position", "Volume", "Profit"} <= header:
+        return "mt5"
+    return "generic"
+
+def generic_mapping(header):
+    # columns already named like the journal's, ignoring case and surrounding spaces
+    names = {col.lower(): col for col in TRADE_COLUMNS}
+    return {col: names[col.strip().lower()] for col in header if col.strip().lower() in names}
+
+def parse_chunk(chunk, mapping, fees=()):
+    # one chunk of the export -> journal rows (Date as YYYY-MM-DD, like the add-trade form writes),
+    # plus the number of rows dropped: balance/deposit/order lines and unparseable dates or P&L
+    src = {dst: chunk[col] for col, dst in mapping.items()}
+    side = src["Side"].astype(str).str.strip().str.lower()
+    symbol = src["Symbol"].astype(str).str.strip()
+    dates = pd.to_datetime(src["Date"].astype(str).str.replace(".", "-", regex=False), errors="coerce")
+    pnl = pd.to_numeric(src["Net P&L"], errors="coerce")
+    for col in fees:
+        if col in chunk:
+            pnl = pnl + pd.to_numeric(chunk[col], errors="coerce").fillna(0.0)
+    valid = side.isin(["buy", "sell"]) & (symbol != "") & dates.notna() & pnl.notna()
+
+    def number(col):
+        if col not in src:
+            return 0.0
+        return pd.to_numeric(src[col][valid], errors="coerce").fillna(0.0)
+
+    rows = pd.DataFrame({
+        "Date": dates[valid].dt.strftime("%Y-%m-%d"),
+        "Symbol": symbol[valid],
+        "Side": side[valid].str.capitalize(),
+        "Quantity": number("Quantity"),
+        "Price": number("Price"),
+        "Net P&L": pnl[valid],
+        "Pips": number("Pips"),
+    }, columns=TRADE_COLUMNS)
+    return rows, int((~valid).sum())
+
+def _row_keys(df):
+    # content hash per trade, on the typed values so "0.02" and 0.02 (or float32 vs float64) agree
+    typed = typed_frame(df, TRADE_COLUMNS)
+    key = pd.DataFrame({"Date": typed["Date"].dt.normalize().astype("datetime64[ns]")})
+    for col in ("Symbol", "Side"):
+        key[col] = typed[col].astype(str)
+    for col in ("Quantity", "Price", "Net P&L", "Pips"):
+        key[col] = typed[col].astype("float64").round(6)
+    return pd.Series(pd.util.hash_pandas_object(key, index=False).to_numpy())
+
+def held_keys(existing):
+    # key -> how many times the journal holds that trade
+    return _row_keys(existing).value_counts() if len(existing) else pd.Series(dtype="int64")
+
+def dedupe(rows, held, seen):
+    # re-importing a statement adds nothing, while a trade that really occurs n times in the export
+    # is still kept n times: its k-th copy is new only if the journal holds fewer than k of them.
+    # seen counts the copies of held trades in the chunks before this one (updated in place); a
+    # trade the journal does not hold is always new, so only held keys are ever counted
+    keys = _row_keys(rows)
+    counts = keys.map(held).fillna(0).to_numpy()
+    occurrence = keys.groupby(keys).cumcount().to_numpy() + keys.map(seen).fillna(0).to_numpy()
+    for key, n in keys[counts > 0].value_counts().items():
+        seen[key] = seen.get(key, 0) + n
+    return rows[occurrence >= counts].reset_index(drop=True)
+
+def import_statement(source, store=None, fmt="auto", mapping=None, chunk_rows=CHUNK_ROWS):
+    # source: path or file object of a broker CSV export; returns counts for the summary message
+    store = store or get_store()
+    header = read_header(source)
+    if fmt == "auto":
+        fmt = detect_format(header)
+    if fmt in BROKER_FORMATS:
+        mapping, fees = BROKER_FORMATS[fmt]["columns"], BROKER_FORMATS[fmt]["fees"]
+    else:
+        mapping, fees = mapping or generic_mapping(header), []
+    missing = [col for col in REQUIRED_COLUMNS if col not in mapping.values()]
+    if missing:
+        raise ValueError(f"No source column mapped to {', '.join(missing)}")
+    absent = [col for col in mapping if col not in header]
+    if absent:
+        raise ValueError(f"Column(s) not in the file: {', '.join(absent)}")
+
+    # each chunk is deduped as it is parsed, so only its new trades are kept until the one batched write
+    held, seen = held_keys(store.load_trades(TRADE_COLUMNS)), {}
+    parts, read, rejected, duplicates = [], 0, 0, 0
+    for chunk in pd.read_csv(source, chunksize=chunk_rows, skipinitialspace=True):
+        rows, dropped = parse_chunk(chunk, mapping, fees)
+        new = dedupe(rows, held, seen) if len(rows) else rows
+        parts.append(new)
+        read += len(chunk)
+        rejected += dropped
+        duplicates += len(rows) - len(new)
+    new = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=TRADE_COLUMNS)
+    # the balance picks the new trades' P&L up through the ledger link, nothing to add to the ledger
+    store.append_batch(new)
+    return {"format": fmt, "read": read, "rejected": rejected, "duplicates": duplicates, "imported": len(new)}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-import a broker statement into the journal.")
+    parser.add_argument("path", help="MT4/MT5 history CSV or a generic CSV export")
+    parser.add_argument("--format", choices=["auto", "mt4", "mt5", "generic"], default="auto")
+    parser.add_argument("--map", nargs="+", default=[], metavar="SOURCE=COLUMN",
+                        help='generic CSV column mapping, e.g. "Close Time=Date" "Profit=Net P&L"')
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    mapping = dict(item.split("=", 1) for item in args.map) or None
+    result = import_statement(args.path, fmt=args.format, mapping=mapping, chunk_rows=args.chunk_rows)
+    print(f"{result['format']}: read {result['read']} rows, imported {result['imported']} trades "
+          f"({result['duplicates']} duplicates, {result['rejected']} rejected)")
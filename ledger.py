@@ -0,0 +1,210 @@
+import os
+import json
+from bisect import bisect_right
+from datetime import datetime
+
+import numpy as np
+
+from running_stats import PNL, _checksum, _day, _normal
+
+LEDGER_SUFFIX = ".ledger.json"
+LINK_SUFFIX = ".link.json"  # written once when the ledger is linked, never rewritten by a write
+LEDGER_FORMAT = 1
+CHECKPOINT_EVERY = 256  # entries between two balance checkpoints
+
+def link_path(ledger_path):
+    return ledger_path.removesuffix(LEDGER_SUFFIX) + LINK_SUFFIX
+
+def parse_link(data):
+    # -> {"linked", "linked_date"[, "dates", "cumulative"]} from a link file or a ledger sidecar (which
+    # keeps only the offset and its day), None if it holds no link
+    try:
+        state = json.loads(data)
+        link = {"linked": float(state["linked"]), "linked_date": str(state["linked_date"])}
+    except (ValueError, KeyError, TypeError):
+        return None
+    dates, cumulative = state.get("dates"), state.get("cumulative")
+    if isinstance(dates, list) and isinstance(cumulative, list) and len(dates) == len(cumulative):
+        link.update(dates=dates, cumulative=cumulative)
+    return link
+
+def read_link(ledger_path):
+    # the link of a ledger: its link file, else the offset in its sidecar, even a stale one; None if
+    # neither can be read
+    for path in (link_path(ledger_path), ledger_path):
+        try:
+            with open(path, "rb") as f:
+                link = parse_link(f.read())
+        except OSError:
+            continue
+        if link is not None:
+            return link
+    return None
+
+class Ledger:
+    # running balance of the investment ledger (deposits and withdrawals): O(1) per added, edited or
+    # deleted entry, with a checkpoint of the cumulative sum every CHECKPOINT_EVERY entries in date
+    # order so a balance as of any day is a bisect plus at most a few hundred additions.
+    #
+    # Trade P&L is not in the ledger; the balance adds the trades' total, which the running stats
+    # keep. Journals from before that mirrored every trade's P&L into the ledger as an extra row;
+    # "linked" is that mirrored amount, taken out once when the sidecar is first created. It is the
+    # one field a rebuild cannot derive, so it also goes to a link file of its own (LINK_SUFFIX) that
+    # only a new link rewrites, with the mirrored P&L by day: a balance dated before the link then
+    # follows later edits of the trades it mirrored.
+
+    def __init__(self, path):
+        self.path = path
+        self.link_path = link_path(path)
+        self.state = None
+        self._sorted = None
+        self._mirrored = None
+
+    def load(self, source):
+        source = _normal(source)
+        if self.state is not None and self.state["source"] == source:
+            return True
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("format") != LEDGER_FORMAT or state.get("checksum") != _checksum(state):
+            return False
+        if state.get("source") != source or not os.path.exists(self.link_path):
+            return False
+        self.state = state
+        self._sorted = None
+        self._mirrored = None
+        return True
+
+    def save(self, source):
+        self.state["source"] = _normal(source)
+        self.state["checksum"] = _checksum(self.state)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def link(self):
+        link = read_link(self.path)
+        if link is None and self.state is not None:
+            link = {"linked": self.state["linked"], "linked_date": self.state["linked_date"]}
+        return link
+
+    def rebuild(self, entries, source, link):
+        # entries: the ledger frame (Date, Amount); link: a full link (with its dates) from link() or new_link
+        if read_link(self.path) != link:
+            tmp = self.link_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(link, f)
+            os.replace(tmp, self.link_path)
+        self._mirrored = None
+        self.state = {
+            "format": LEDGER_FORMAT,
+            "balance": float(entries["Amount"].astype(float).sum()) if len(entries) else 0.0,
+            "linked": float(link["linked"]),
+            "linked_date": link["linked_date"],
+            "count": len(entries),
+            "last_date": None,
+            "checkpoints": None,
+        }
+        self._checkpoint(entries)
+        self.save(source)
+
+    def _checkpoint(self, entries):
+        dates, amounts = self._sorted = _sorted_entries(entries)
+        cumulative = np.cumsum(amounts)
+        marks = np.arange(CHECKPOINT_EVERY, len(dates) + 1, CHECKPOINT_EVERY)
+        self.state["checkpoints"] = {
+            "dates": [str(dates[i - 1]) for i in marks],
+            "positions": [int(i) for i in marks],
+            "balances": [float(cumulative[i - 1]) for i in marks],
+        }
+        self.state["last_date"] = str(dates[-1]) if len(dates) else None
+
+    def _dirty(self):
+        # an entry changed or landed before the end of the date order: checkpoints after it moved
+        self.state["checkpoints"] = None
+        self._sorted = None
+
+    def add(self, row):
+        amount = float(row.get("Amount", 0) or 0)
+        day = _day(row["Date"])
+        self.state["balance"] += amount
+        self.state["count"] += 1
+        last = self.state["last_date"]
+        if self.state["checkpoints"] is None or (last is not None and day < last):
+            self._dirty()
+            return
+        # appended at the end of the date order: at most one new checkpoint
+        self.state["last_date"] = day
+        self._sorted = None
+        if self.state["count"] % CHECKPOINT_EVERY == 0:
+            checkpoints = self.state["checkpoints"]
+            checkpoints["dates"].append(day)
+            checkpoints["positions"].append(self.state["count"])
+            checkpoints["balances"].append(self.state["balance"])
+
+    def extend(self, entries):
+        for row in entries.to_dict("records"):
+            self.add(row)
+
+    def remove(self, row):
+        self.state["balance"] -= float(row.get("Amount", 0) or 0)
+        self.state["count"] -= 1
+        self._dirty()
+
+    def replace(self, old, new):
+        self.state["balance"] += float(new.get("Amount", 0) or 0) - float(old.get("Amount", 0) or 0)
+        self._dirty()
+
+    def capital(self):
+        # money paid in: deposits less withdrawals, without any trade P&L
+        return self.state["balance"] - self.state["linked"]
+
+    def ledger_as_of(self, day, entries_loader):
+        # sum of the ledger entries dated up to and including day: bisect the checkpoints, then add
+        # the entries between the checkpoint and the day
+        day = _day(day)
+        if self.state["checkpoints"] is None:
+            self._checkpoint(entries_loader())
+        elif self._sorted is None:
+            self._sorted = _sorted_entries(entries_loader())
+        dates, amounts = self._sorted
+        checkpoints = self.state["checkpoints"]
+        i = bisect_right(checkpoints["dates"], day)
+        start, base = (checkpoints["positions"][i - 1], checkpoints["balances"][i - 1]) if i else (0, 0.0)
+        end = int(np.searchsorted(dates, day, side="right"))
+        return base + float(amounts[start:max(start, end)].sum())
+
+    def mirrored_as_of(self, day):
+        # the trade P&L that the entries dated up to day hold from the mirroring days, as it was linked
+        linked = self.state["linked"]
+        if not linked or day >= self.state["linked_date"]:
+            return linked
+        if self._mirrored is None:
+            link = read_link(self.path) or {}
+            self._mirrored = (np.array(link.get("dates", []), dtype=str),
+                              np.array(link.get("cumulative", []), dtype=float))
+        dates, cumulative = self._mirrored
+        end = int(np.searchsorted(dates, day, side="right"))
+        return float(cumulative[end - 1]) if end else 0.0
+
+def _sorted_entries(entries):
+    days = entries["Date"].astype(str).str[:10].to_numpy(dtype=str) if len(entries) else np.array([], dtype=str)
+    amounts = entries["Amount"].astype(float).to_numpy() if len(entries) else np.array([], dtype=float)
+    order = np.argsort(days, kind="stable")
+    return days[order], amounts[order]
+
+def mirrored_pnl(days):
+    # cumulative trade P&L by day, from the running stats' day buckets: what the mirroring app wrote
+    dates = sorted(days)
+    cumulative = np.cumsum([days[day][PNL] for day in dates]) if dates else []
+    return {"dates": dates, "cumulative": [float(value) for value in cumulative]}
+
+def new_link(days):
+    # a ledger seen for the first time: if it came from the mirroring days, it holds every trade's P&L
+    mirrored = mirrored_pnl(days)
+    linked = mirrored["cumulative"][-1] if mirrored["cumulative"] else 0.0
+    return {"linked": linked, "linked_date": datetime.today().strftime("%Y-%m-%d"), **mirrored}
@@ -0,0 +1,264 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import joblib
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import roc_auc_score
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+except ImportError:  # optional: without it the Patterns tab only says what to install
+    joblib = None
+
+# trade-pattern analysis: a numeric feature matrix of the journal in date order, trades clustered
+# on it and a win-probability model fitted to it. The matrix is persisted next to the journal with
+# a hash per row, so after new trades only the rows from the first changed one on are rebuilt; the
+# fitted model is persisted keyed on the journal's version and fitted on a background thread
+FEATURES_SUFFIX = ".features.npz"
+MODEL_SUFFIX = ".model.joblib"
+BASE_FEATURES = ["Buy", "Sell", "Weekday", "Size", "Pips", "Prior Outcome", "Streak"]
+HASHED_COLUMNS = ["Date", "Symbol", "Side", "Quantity", "Pips", "Net P&L"]
+CLUSTERS = 4
+MIN_TRADES = 30
+FIT_ROWS = 500_000  # larger journals are fitted on a seeded sample of this many trades
+HOLDOUT = 0.2  # the latest share of trades held out to score the model before the final fit
+
+def _ordered(trades):
+    # date order, journal order within a day: the order prior outcome and streak are counted in
+    order = trades["Date"].to_numpy(dtype="datetime64[ns]").argsort(kind="stable")
+    return trades.iloc[order]
+
+def row_hashes(trades):
+    return pd.util.hash_pandas_object(trades[HASHED_COLUMNS], index=False).to_numpy()
+
+def _runs(outcome, prev_outcome, prev_run):
+    # length of the run of equal outcomes ending at every trade, continuing the run the previous
+    # block ended with
+    n = len(outcome)
+    steps = np.arange(n)
+    change = np.empty(n, dtype=bool)
+    change[:1] = outcome[:1] != prev_outcome
+    change[1:] = outcome[1:] != outcome[:-1]
+    starts = np.maximum.accumulate(np.where(change, steps, 0))
+    run = steps - starts + 1
+    run[:np.argmax(change) if change.any() else n] += prev_run
+    return run
+
+def _block(trades, symbols, prev_outcome, prev_run):
+    # feature rows of consecutive trades; prior outcome and streak carry on from the trade before
+    n = len(trades)
+    matrix = np.zeros((n, len(BASE_FEATURES) + len(symbols)), dtype=np.float32)
+    side = trades["Side"].astype(str).str.lower().to_numpy()
+    matrix[:, 0] = side == "buy"
+    matrix[:, 1] = side == "sell"
+    matrix[:, 2] = pd.to_datetime(trades["Date"]).dt.weekday.fillna(-1).to_numpy()
+    matrix[:, 3] = trades["Quantity"].fillna(0).to_numpy(dtype=float)
+    matrix[:, 4] = trades["Pips"].fillna(0).to_numpy(dtype=float)
+    outcome = np.sign(trades["Net P&L"].fillna(0).to_numpy(dtype=float)).astype(np.int8)
+    run = _runs(outcome, prev_outcome, prev_run)
+    signed = run * outcome
+    matrix[:, 5] = np.concatenate([[prev_outcome], outcome[:-1]])
+    matrix[:, 6] = np.concatenate([[prev_run * prev_outcome], signed[:-1]])
+    codes = pd.Categorical(trades["Symbol"].astype(str), categories=symbols).codes
+    known = codes >= 0
+    matrix[np.flatnonzero(known), len(BASE_FEATURES) + codes[known]] = 1.0
+    return matrix, outcome, run
+
+def _read(path):
+    try:
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _write(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **state)
+    os.replace(tmp, path)
+
+_features = {}
+_features_lock = threading.Lock()
+
+def feature_matrix(trades, path=None):
+    # -> (features indexed like the trades in date order, rows rebuilt). Rows whose hash matches the
+    # persisted matrix up to the first difference are reused; one-hot columns of new symbols are
+    # appended, so an old row keeps its values
+    trades = _ordered(trades)
+    hashes = row_hashes(trades)
+    with _features_lock:
+        state = _features.get(path)
+        if state is None and path:
+            state = _read(path)
+        if state is None:
+            state = {"hashes": hashes[:0], "matrix": np.zeros((0, len(BASE_FEATURES)), dtype=np.float32),
+                     "outcome": np.zeros(0, dtype=np.int8), "run": np.zeros(0, dtype=np.int64),
+                     "symbols": np.array([], dtype=str)}
+        shared = min(len(hashes), len(state["hashes"]))
+        differ = np.flatnonzero(hashes[:shared] != state["hashes"][:shared])
+        keep = differ[0] if len(differ) else shared
+        if keep < len(hashes) or keep < len(state["hashes"]):
+            rest = trades.iloc[keep:]
+            symbols = list(state["symbols"])
+            symbols += sorted(set(rest["Symbol"].astype(str).unique()) - set(symbols))
+            prev_outcome = int(state["outcome"][keep - 1]) if keep else 0
+            prev_run = int(state["run"][keep - 1]) if keep else 0
+            block, outcome, run = _block(rest, symbols, prev_outcome, prev_run)
+            head = state["matrix"][:keep]
+            head = np.pad(head, ((0, 0), (0, block.shape[1] - head.shape[1])))
+            state = {"hashes": hashes, "matrix": np.concatenate([head, block]),
+                     "outcome": np.concatenate([state["outcome"][:keep], outcome]),
+                     "run": np.concatenate([state["run"][:keep], run]),
+                     "symbols": np.array(symbols, dtype=str)}
+            if path:
+                _write(path, state)
+        _features[path] = state
+    columns = BASE_FEATURES + [f"Symbol={symbol}" for symbol in state["symbols"]]
+    return pd.DataFrame(state["matrix"], index=trades.index, columns=columns), len(hashes) - keep
+
+def fit(features, wins, clusters=CLUSTERS, seed=0):
+    # k-means clusters and a logistic win-probability model on standardized features; the model is
+    # first scored on the latest HOLDOUT of the trades, then refitted on all of them
+    x, y = features.to_numpy(dtype=float), np.asarray(wins, dtype=bool)
+    rng = np.random.default_rng(seed)
+    model = {"columns": list(features.columns), "rows": len(x), "base_rate": float(y.mean()) if len(y) else 0.0,
+             "classifier": None, "holdout_auc": None}
+    cluster_rows = np.sort(rng.choice(len(x), FIT_ROWS, replace=False)) if len(x) > FIT_ROWS else slice(None)
+    model["clusters"] = make_pipeline(
+        StandardScaler(), MiniBatchKMeans(n_clusters=min(clusters, len(x)), random_state=seed, n_init=3, batch_size=4096)
+    ).fit(x[cluster_rows])
+    if len(x) < MIN_TRADES or y.all() or not y.any():
+        return model
+    split = int(len(x) * (1 - HOLDOUT))
+    train, test = slice(None, split), slice(split, None)
+    if y[train].any() and not y[train].all() and y[test].any() and not y[test].all():
+        scored = _classifier(seed).fit(*_sample(x[train], y[train], rng))
+        model["holdout_auc"] = float(roc_auc_score(y[test], scored.predict_proba(x[test])[:, 1]))
+    model["classifier"] = _classifier(seed).fit(*_sample(x, y, rng))
+    return model
+
+def _classifier(seed):
+    return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000, random_state=seed))
+
+def _sample(x, y, rng):
+    if len(x) <= FIT_ROWS:
+        return x, y
+    rows = np.sort(rng.choice(len(x), FIT_ROWS, replace=False))
+    return x[rows], y[rows]
+
+def predict(model, features):
+    # win probability and cluster of every trade: one batched call per estimator
+    x = features.reindex(columns=model["columns"], fill_value=0.0).to_numpy(dtype=float)
+    result = pd.DataFrame(index=features.index)
+    if model["classifier"] is not None and len(x):
+        result["Win Probability"] = model["classifier"].predict_proba(x)[:, 1] * 100
+    else:
+        result["Win Probability"] = model["base_rate"] * 100
+    result["Cluster"] = model["clusters"].predict(x) + 1 if len(x) else np.array([], dtype=int)
+    return result
+
+def coefficients(model):
+    # the change in log-odds of a win per standard deviation of each feature
+    if model["classifier"] is None:
+        return pd.DataFrame(columns=["Feature", "Weight"])
+    weights = model["classifier"][-1].coef_[0]
+    table = pd.DataFrame({"Feature": model["columns"], "Weight": weights})
+    return table.reindex(table["Weight"].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+def cluster_profile(trades, predictions, features):
+    # one row per cluster: how many trades, how they did and what they look like
+    frame = pd.DataFrame({
+        "Cluster": predictions["Cluster"],
+        "Net P&L": trades["Net P&L"].astype(float),
+        "Win": trades["Net P&L"].astype(float) > 0,
+        "Win Probability": predictions["Win Probability"],
+        "Size": features["Size"],
+        "Pips": features["Pips"],
+        "Buy": features["Buy"],
+        "Streak": features["Streak"],
+        "Symbol": trades["Symbol"].astype(str),
+    })
+    grouped = frame.groupby("Cluster")
+    table = pd.DataFrame({
+        "Trades": grouped.size(),
+        "Net P&L": grouped["Net P&L"].sum(),
+        "Win Rate": grouped["Win"].mean() * 100,
+        "Avg Win Probability": grouped["Win Probability"].mean(),
+        "Avg P&L": grouped["Net P&L"].mean(),
+        "Avg Size": grouped["Size"].mean(),
+        "Avg Pips": grouped["Pips"].mean(),
+        "Buy %": grouped["Buy"].mean() * 100,
+        "Avg Prior Streak": grouped["Streak"].mean(),
+        "Top Symbol": grouped["Symbol"].agg(lambda s: s.value_counts().index[0]),
+    })
+    return table.reset_index()
+
+def calibration(trades, predictions, bins=10):
+    # actual win rate per decile of predicted win probability
+    frame = pd.DataFrame({"Predicted": predictions["Win Probability"], "Win": trades["Net P&L"].astype(float) > 0})
+    frame["Bucket"] = pd.qcut(frame["Predicted"].rank(method="first"), min(bins, len(frame)), labels=False)
+    grouped = frame.groupby("Bucket")
+    return pd.DataFrame({"Predicted": grouped["Predicted"].mean(), "Actual": grouped["Win"].mean() * 100,
+                         "Trades": grouped.size()}).reset_index(drop=True)
+
+def load_model(path, version):
+    try:
+        saved = joblib.load(path)
+    except Exception:  # missing, partial or from another scikit-learn version: fit again
+        return None
+    return saved["model"] if saved.get("version") == version else None
+
+def save_model(path, version, model):
+    tmp = path + ".tmp"
+    joblib.dump({"version": version, "model": model}, tmp)
+    os.replace(tmp, path)
+
+class Trainer:
+    # fits run on one background thread, never on the caller's (the Streamlit script) thread;
+    # a model path has at most one fit queued, and a finished fit is persisted for later sessions
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pattern-fit")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def model(self, path, version, build, wait=False):
+        # -> (model, None) once fitted for this version, else (None, "training") or (None, error);
+        # build() returns the fitted model and runs on the worker thread
+        with self._lock:
+            job = self._jobs.get(path)
+            if job is None or job[0] != version:
+                model = load_model(path, version)
+                if model is not None:
+                    self._jobs[path] = (version, model)
+                    return model, None
+                job = (version, self._pool.submit(self._fit, path, version, build))
+                self._jobs[path] = job
+        result = job[1]
+        if not hasattr(result, "done"):
+            return result, None
+        if not wait and not result.done():
+            return None, "training"
+        try:
+            return result.result(), None
+        except Exception as exc:
+            return None, f"{type(exc).__name__}: {exc}"
+
+    def _fit(self, path, version, build):
+        model = build()
+        save_model(path, version, model)
+        return model
+
+_trainer = None
+
+def get_trainer():
+    # one worker per process, shared by every session
+    global _trainer
+    if _trainer is None:
+        _trainer = Trainer()
+    return _trainer
@@ -0,0 +1,171 @@
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# OHLC bars behind the MAE/MFE charts: a provider fetches them, PriceCache keeps every (symbol,
+# interval) in one columnar .npz file together with the time ranges already fetched, so a range is
+# only ever requested from the provider once; later requests fetch just the gaps around it.
+# TRADE_JOURNAL_PRICES=yfinance (default) or local; local reads TRADE_JOURNAL_PRICE_DIR/<symbol>_<interval>.csv
+PROVIDER = os.environ.get("TRADE_JOURNAL_PRICES", "yfinance")
+PRICE_DIR = os.environ.get("TRADE_JOURNAL_PRICE_DIR", "prices")
+CACHE_DIR = os.environ.get("TRADE_JOURNAL_PRICE_CACHE", "price_cache")
+INTERVALS = {"1d": pd.Timedelta(days=1), "1h": pd.Timedelta(hours=1), "15m": pd.Timedelta(minutes=15)}
+BAR_COLUMNS = ["Time", "Open", "High", "Low", "Close"]
+
+class PriceProvider:
+    # fetch(symbol, interval, start, end) -> frame of BAR_COLUMNS with bars starting in [start, end)
+    name = None
+
+    def fetch(self, symbol, interval, start, end):
+        raise NotImplementedError
+
+# journal symbols that are not a plain 6-letter currency pair (those become EURUSD=X)
+TICKERS = {"xauusd": "GC=F", "xagusd": "SI=F", "btcusd": "BTC-USD", "ethusd": "ETH-USD",
+           "us30": "^DJI", "nas100": "^NDX", "spx500": "^GSPC", "usoil": "CL=F"}
+
+def ticker_for(symbol):
+    symbol = str(symbol).strip().lower()
+    if symbol in TICKERS:
+        return TICKERS[symbol]
+    if len(symbol) == 6 and symbol.isalpha():
+        return f"{symbol.upper()}=X"
+    return symbol.upper()
+
+class YFinanceProvider(PriceProvider):
+    name = "yfinance"
+
+    def __init__(self):
+        # imported here, not with the module: yfinance and its dependencies would otherwise load on
+        # every `python -m core` call, which imports prices for the excursions command
+        try:
+            import yfinance
+        except ImportError:  # optional: without it only the local provider works
+            raise RuntimeError("The yfinance price provider needs yfinance: pip install yfinance")
+        self.yf = yfinance
+
+    def fetch(self, symbol, interval, start, end):
+        history = self.yf.Ticker(ticker_for(symbol)).history(start=start, end=end, interval=interval, auto_adjust=False)
+        if history.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        times = history.index
+        if times.tz is not None:
+            times = times.tz_localize(None)  # exchange wall-clock time, like the journal's dates
+        return pd.DataFrame({"Time": times, **{col: history[col].to_numpy(dtype=float) for col in BAR_COLUMNS[1:]}})
+
+class LocalProvider(PriceProvider):
+    # offline bars: <directory>/<symbol>_<interval>.csv with a Time,Open,High,Low,Close header
+    name = "local"
+
+    def __init__(self, directory=PRICE_DIR):
+        self.directory = directory
+
+    def fetch(self, symbol, interval, start, end):
+        path = os.path.join(self.directory, f"{str(symbol).lower()}_{interval}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        bars = pd.read_csv(path, usecols=BAR_COLUMNS, parse_dates=["Time"])
+        return bars[(bars["Time"] >= start) & (bars["Time"] < end)]
+
+PROVIDERS = {cls.name: cls for cls in (YFinanceProvider, LocalProvider)}
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def missing_ranges(covered, start, end):
+    # the parts of [start, end) not inside any covered range (all int64 nanoseconds)
+    gaps, cursor = [], start
+    for lo, hi in _merge_ranges(covered):
+        if hi <= cursor or lo >= end:
+            continue
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+def _frame(bars):
+    frame = pd.DataFrame(bars, columns=BAR_COLUMNS)
+    frame["Time"] = frame["Time"].astype("int64").astype("datetime64[ns]")
+    return frame
+
+class PriceCache:
+
+    def __init__(self, provider=None, directory=CACHE_DIR):
+        self.provider = provider or PROVIDERS[PROVIDER]()
+        self.directory = directory
+        self._locks = {}
+
+    def path(self, symbol, interval):
+        return os.path.join(self.directory, self.provider.name, f"{str(symbol).lower()}_{interval}.npz")
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return {col: np.array([], dtype="int64" if col == "Time" else float) for col in BAR_COLUMNS}, []
+        with np.load(path) as data:
+            bars = {col: data[col] for col in BAR_COLUMNS}
+            covered = data["covered"].tolist()
+        return bars, covered
+
+    def _write(self, path, bars, covered):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, covered=np.array(covered, dtype="int64").reshape(-1, 2), **bars)
+        os.replace(tmp, path)
+
+    def bars(self, symbol, interval, start, end):
+        # bars starting in [start, end); only the uncovered parts of the range reach the provider
+        start, end = pd.Timestamp(start).value, pd.Timestamp(end).value
+        # the bar still forming (and anything after it) is fetched again next time
+        settled = pd.Timestamp(datetime.now()).floor(INTERVALS[interval]).value
+        path = self.path(symbol, interval)
+        with self._locks.setdefault(path, threading.Lock()):
+            bars, covered = self._read(path)
+            gaps = missing_ranges(covered, start, end)
+            if gaps:
+                fetched = [self.provider.fetch(symbol, interval, pd.Timestamp(lo), pd.Timestamp(hi)) for lo, hi in gaps]
+                new = pd.concat([_frame(bars), *fetched], ignore_index=True)
+                new["Time"] = pd.to_datetime(new["Time"]).astype("datetime64[ns]")
+                new = new.drop_duplicates("Time", keep="last").sort_values("Time", ignore_index=True)
+                bars = {"Time": new["Time"].to_numpy().astype("int64"),
+                        **{col: new[col].to_numpy(dtype=float) for col in BAR_COLUMNS[1:]}}
+                covered = _merge_ranges(covered + [[lo, min(hi, settled)] for lo, hi in gaps if lo < settled])
+                self._write(path, bars, covered)
+        lo, hi = np.searchsorted(bars["Time"], start), np.searchsorted(bars["Time"], end)
+        return _frame({col: values[lo:hi] for col, values in bars.items()})
+
+    def history(self, ranges, interval):
+        # ranges: {symbol: (start, end)} -> one frame of bars with a Symbol column, plus the symbols
+        # the provider could not serve (no data, unknown ticker, no network)
+        frames, failed = [], []
+        for symbol, (start, end) in ranges.items():
+            try:
+                bars = self.bars(symbol, interval, start, end)
+            except Exception:  # whatever the provider raises (network, unknown ticker): skip the symbol
+                failed.append(symbol)
+                continue
+            if bars.empty:
+                failed.append(symbol)
+            frames.append(bars.assign(Symbol=symbol))
+        if not frames:
+            return pd.DataFrame(columns=["Symbol", *BAR_COLUMNS]), failed
+        return pd.concat(frames, ignore_index=True), failed
+
+_cache = None
+
+def get_price_cache():
+    # one cache (and provider) per process, like the journal store
+    global _cache
+    if _cache is None:
+        _cache = PriceCache()
+    return _cache
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import cProfile
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# opt-in: TRADE_JOURNAL_PROFILE=1 times the instrumented sections of every rerun and shows them in
+# the sidebar; TRADE_JOURNAL_PROFILE_LOG=timings.jsonl also appends one JSON line per rerun and
+# TRADE_JOURNAL_PROFILE_DIR=profiles/ writes a cProfile dump per rerun (either one implies the first)
+LOG_PATH = os.environ.get("TRADE_JOURNAL_PROFILE_LOG")
+DUMP_DIR = os.environ.get("TRADE_JOURNAL_PROFILE_DIR")
+ENABLED = os.environ.get("TRADE_JOURNAL_PROFILE", "") not in ("", "0") or bool(LOG_PATH or DUMP_DIR)
+
+# one rerun per Streamlit script thread, so sessions running side by side keep separate records
+_local = threading.local()
+# when disabled, section() hands out this one shared no-op context; the dict absorbs "rows" writes
+_DISABLED = nullcontext({})
+
+def count_rows(result):
+    # rows behind a result: frame/series length, first countable item of a tuple, points of a figure
+    if result is None:
+        return None
+    if hasattr(result, "shape"):
+        return int(result.shape[0]) if result.shape else None
+    if isinstance(result, tuple):
+        for item in result:
+            rows = count_rows(item)
+            if rows is not None:
+                return rows
+        return None
+    if hasattr(result, "data") and hasattr(result, "layout"):
+        points = 0
+        for trace in result.data:
+            for attr in ("x", "r", "values"):
+                values = getattr(trace, attr, None)
+                if values is not None:
+                    points += len(values)
+                    break
+        return points
+    return None
+
+@contextmanager
+def _section(name, rows):
+    # the record is placed when the section opens, so nested sections list below their parent
+    entry = {"name": name, "ms": None, "rows": rows, "depth": getattr(_local, "depth", 0)}
+    records = getattr(_local, "records", None)
+    if records is not None:
+        records.append(entry)
+    _local.depth = entry["depth"] + 1
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["ms"] = (time.perf_counter() - start) * 1000
+        _local.depth = entry["depth"]
+
+def section(name, rows=None):
+    # with section("daily stats") as entry: ...; entry["rows"] = len(daily)
+    if not ENABLED:
+        return _DISABLED
+    return _section(name, rows)
+
+def timed(name, rows=None):
+    # decorator; rows is an optional callable of the call's arguments, otherwise rows are counted
+    # from the return value. Disabled, it returns the function itself: no wrapper, no cost
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _section(name, rows(*args, **kwargs) if rows else None) as entry:
+                result = fn(*args, **kwargs)
+                if entry["rows"] is None:
+                    entry["rows"] = count_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+def start_run():
+    # begin a rerun's record (the records of an unfinished previous rerun are dropped)
+    if not ENABLED:
+        return
+    _local.records = []
+    _local.depth = 0
+    _local.started = time.perf_counter()
+    _local.profiler = None
+    if DUMP_DIR:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _local.profiler = profiler
+        except ValueError:  # another session's rerun is being profiled right now
+            pass
+
+def finish_run():
+    # close the rerun's record, export it, and return it for the panel
+    if not ENABLED or getattr(_local, "records", None) is None:
+        return None
+    run = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "total_ms": (time.perf_counter() - _local.started) * 1000,
+        "sections": _local.records,
+    }
+    _local.records = None
+    profiler, _local.profiler = _local.profiler, None
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(DUMP_DIR, exist_ok=True)
+        run["profile"] = os.path.join(DUMP_DIR, f"rerun-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+        profiler.dump_stats(run["profile"])
+    if LOG_PATH:
+        with open(LOG_PATH, "a") as f:
+            f.write(json.dumps(run) + "\n")
+    return run
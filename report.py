@@ -0,0 +1,182 @@
+import os
+import sys
+import html
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+try:
+    import kaleido
+except ImportError:  # optional: without it reports are exported as HTML only
+    kaleido = None
+
+import analytics
+import charts
+import core
+
+# static performance packs: one self-contained report per month or week, built headless from the
+# dashboard's own chart builders (charts.py). The journal is loaded and aggregated once, handed to
+# every worker of a process pool once, and the periods are spread over the pool by their bounds
+FORMATS = ["html", "png", "pdf"]
+PERIODS = {"month": "M", "week": "W-SUN"}
+SUMMARY = [
+    ("Opening Balance", "${:,.2f}"), ("Deposits / Withdrawals", "${:,.2f}"), ("Closing Balance", "${:,.2f}"),
+    ("Total Trades", "{:,}"), ("Total P&L", "${:,.2f}"),
+    ("Win Rate", "{:.2f}%"), ("Avg Win", "${:,.2f}"), ("Avg Loss", "${:,.2f}"), ("Profit Factor", "{:.2f}"),
+    ("Day Win Rate", "{:.2f}%"), ("Max Drawdown", "${:,.2f}"), ("Max Drawdown %", "{:.2f}%"),
+    ("Recovery Factor", "{:.2f}"), ("Sharpe", "{:.2f}"), ("Sortino", "{:.2f}"), ("Zella Score", "{:.1f}"),
+]
+
+def journal_snapshot(symbols=None):
+    # what every report is cut from: the per-day frame and the trades' P&L in date order
+    trades, daily = core.load_trades(), core.daily_stats()
+    if symbols:
+        trades, daily = core.scope(trades, core.symbol_index(trades), symbols)
+    dates = trades["Date"].to_numpy(dtype="datetime64[ns]")
+    order = dates.argsort(kind="stable")
+    return {"daily": daily, "dates": dates[order], "pnl": trades["Net P&L"].to_numpy(dtype=float)[order]}
+
+def periods(daily, period="month", start=None, end=None):
+    # (label, first day, last day) of every month or Monday-Sunday week with trades in [start, end]
+    days = analytics.in_window(daily, start and pd.Timestamp(start), end and pd.Timestamp(end))
+    spans = days["Date"].dt.to_period(PERIODS[period]).unique()
+    label = "{:%Y-%m}" if period == "month" else "{:%G-W%V}"
+    return [(label.format(span.start_time), span.start_time, span.end_time.normalize()) for span in sorted(spans)]
+
+_journal = None
+
+def _init_worker(journal):
+    # runs once per pool process: the snapshot is pickled to each worker once, not once per period
+    global _journal
+    _journal = journal
+
+def period_report(first, last, balances):
+    # the numbers and figures of one period, from the shared snapshot; the equity curve starts from
+    # the opening balance plus the period's deposits and withdrawals
+    daily = analytics.in_window(_journal["daily"], first, last)
+    lo, hi = np.searchsorted(_journal["dates"], [np.datetime64(first), np.datetime64(last + pd.Timedelta(days=1))])
+    trades = pd.DataFrame({"Date": _journal["dates"][lo:hi], "Net P&L": _journal["pnl"][lo:hi]})
+    stats = analytics.kpis(daily)
+    capital = balances["Opening Balance"] + balances["Deposits / Withdrawals"]
+    curve, _, risk = core.risk_report(trades, daily, stats, capital)
+    stats.update(risk)
+    radar, score = core.calculate_zella_score(stats)
+    stats.update(balances, **{"Zella Score": score})
+    view, _ = analytics.aggregate(daily)
+    figures = [
+        ("daily_pnl", "Daily P&L", charts.daily_pnl_figure(view)),
+        ("equity_curve", "Equity & Drawdown", charts.equity_curve_figure(curve, (first, last))),
+        ("profit_factor_daywin", "Profit Factor & Day Win %", charts.profit_factor_daywin_figure(view)),
+        ("avg_win_loss", "Average Win / Loss", charts.avg_win_loss_figure(view)),
+        ("zella", "Zella Score", charts.zella_figure(radar)),
+        ("win_loss", "Win / Loss", charts.pie_figure(stats)),
+    ]
+    months = pd.period_range(first, last, freq="M")
+    calendars = []
+    for month in months:
+        days = daily[daily["Month"] == str(month)]
+        calendars.append(charts.month_calendar_html(month.year, month.month, {
+            int(day): (pnl, int(count)) for day, pnl, count in zip(days["Day"], days["Net P&L"], days["Trades"])
+        }))
+    return stats, [(name, title, fig) for name, title, fig in figures if fig is not None], calendars
+
+def summary_table(stats):
+    rows = "".join(f"<tr><th style='text-align:left'>{name}</th><td style='text-align:right'>{fmt.format(stats[name])}</td></tr>"
+                   for name, fmt in SUMMARY)
+    return f"<table style='border-collapse:collapse;min-width:320px'>{rows}</table>"
+
+def write_html(path, label, stats, figures, calendars):
+    # self-contained: plotly.js is inlined once, with the first chart
+    parts = [f"<h1>DD_ TRADING — {html.escape(label)}</h1>", summary_table(stats)]
+    for i, (_, title, fig) in enumerate(figures):
+        parts.append(f"<h2>{title}</h2>" + fig.to_html(full_html=False, include_plotlyjs=i == 0))
+    parts += calendars
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html><html><head><meta charset='utf-8'>"
+                f"<title>Trading report {html.escape(label)}</title></head>"
+                "<body style='font-family:sans-serif;max-width:1100px;margin:auto'>" + "".join(parts) + "</body></html>")
+
+def write_images(directory, stats, figures, fmt):
+    # one image per chart plus the summary numbers as CSV (static images need kaleido)
+    os.makedirs(directory, exist_ok=True)
+    for name, _, fig in figures:
+        fig.write_image(os.path.join(directory, f"{name}.{fmt}"), format=fmt, width=1100)
+    pd.DataFrame({"Metric": [name for name, _ in SUMMARY], "Value": [stats[name] for name, _ in SUMMARY]}).to_csv(
+        os.path.join(directory, "summary.csv"), index=False)
+
+def render_period(label, first, last, balances, out, fmt):
+    stats, figures, calendars = period_report(first, last, balances)
+    if fmt == "html":
+        path = os.path.join(out, f"report-{label}.html")
+        write_html(path, label, stats, figures, calendars)
+    else:
+        path = os.path.join(out, f"report-{label}")
+        write_images(path, stats, figures, fmt)
+    return path
+
+def period_balances(daily, first, last):
+    # the whole account's balances from the ledger (bisects): what was paid in or out during the
+    # period is the change in balance that its trades' P&L (daily: every symbol's) does not explain
+    opening, closing = core.balance_as_of(first - pd.Timedelta(days=1)), core.balance_as_of(last)
+    pnl = float(analytics.in_window(daily, first, last)["Net P&L"].sum())
+    flows = round(closing - opening - pnl, 2) or 0.0  # no -0.00 from float noise
+    return {"Opening Balance": opening, "Deposits / Withdrawals": flows, "Closing Balance": closing}
+
+def export_reports(period="month", start=None, end=None, out="reports", fmt="html", symbols=None, workers=None,
+                   progress=None):
+    # one report per period into `out`; workers: None is one process per CPU (up to one per period),
+    # 0 or 1 renders in this process. progress(done, total) is called after every period. Returns the
+    # paths written, in period order
+    if fmt != "html" and kaleido is None:
+        raise RuntimeError("PNG/PDF reports need kaleido: pip install kaleido")
+    journal = journal_snapshot(symbols)
+    account = core.daily_stats() if symbols else journal["daily"]
+    tasks = [(label, first, last, period_balances(account, first, last), out, fmt)
+             for label, first, last in periods(journal["daily"], period, start, end)]
+    os.makedirs(out, exist_ok=True)
+    if workers is None:
+        workers = min(os.cpu_count() or 1, len(tasks))
+    paths = [None] * len(tasks)
+    done = 0
+    if workers > 1:
+        # spawn, not fork: the Streamlit server is multi-threaded
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(journal,)) as pool:
+            futures = {pool.submit(render_period, *task): i for i, task in enumerate(tasks)}
+            for future in as_completed(futures):
+                paths[futures[future]] = future.result()
+                done += 1
+                if progress:
+                    progress(done, len(tasks))
+    else:
+        _init_worker(journal)
+        for i, task in enumerate(tasks):
+            paths[i] = render_period(*task)
+            done += 1
+            if progress:
+                progress(done, len(tasks))
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a static performance report per month or week.")
+    parser.add_argument("--period", choices=list(PERIODS), default="month")
+    parser.add_argument("--start", type=pd.Timestamp)
+    parser.add_argument("--end", type=pd.Timestamp)
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--symbols", nargs="+")
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    try:
+        paths = export_reports(args.period, args.start, args.end, args.out, args.format, args.symbols, args.workers)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    for path in paths:
+        print(path)
+    print(f"Wrote {len(paths)} {args.period}ly reports to {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
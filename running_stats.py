@@ -0,0 +1,302 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import analytics
+
+STATS_SUFFIX = ".stats.json"
+STATS_FORMAT = 1
+LOG_SUFFIX = ".log"
+LOG_MIN_BYTES = 64 * 1024  # the delta log is folded into the sidecar once it outgrows both this and the sidecar
+SCALARS = ("equity", "peak", "max_drawdown", "equity_dirty", "source")
+
+# per-day bucket layout, same order as analytics.SUMMARY_COLUMNS[1:]
+PNL, WINS, LOSSES, WIN_COUNT, LOSS_COUNT, TRADES, WORST, SUM_SQ = range(8)
+
+def _checksum(state):
+    body = {k: v for k, v in state.items() if k != "checksum"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+def _normal(source):
+    # sources are compared against what was read back from JSON, where tuples become lists
+    return json.loads(json.dumps(source))
+
+def _day(value):
+    # "2025-09-24", Timestamp("2025-09-24") and "2025-09-24 10:30" all land in the same bucket
+    return str(value)[:10]
+
+def _month(day):
+    return str(day)[:7]
+
+def _drawdown(pnl):
+    equity = np.cumsum(np.asarray(pnl, dtype=float))
+    if not len(equity):
+        return 0.0, 0.0, 0.0
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    return float(equity[-1]), float(peak[-1]), float((peak - equity).max())
+
+class RunningStats:
+    # persisted accumulators behind the dashboard numbers: O(1) per added/edited/deleted trade,
+    # rebuilt from the journal only when the sidecar file is missing, stale or fails its checksum.
+    # A write appends just the day/month buckets it touched to a delta log (path + ".log", one
+    # checksummed line each, tied to the sidecar it applies to); the log is folded into the
+    # sidecar once it outgrows it, so the persisted cost of a write does not grow with the journal
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+        self._calendar = None
+        self._base = None  # checksum of the sidecar the delta log applies to
+        self._sizes = [0, 0]  # bytes of the sidecar and of the delta log
+        self._dirty_days, self._dirty_months = set(), set()
+
+    def load(self, source):
+        source = _normal(source)
+        if self.state is not None and self.state["source"] == source:
+            return True
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("format") != STATS_FORMAT or state.get("checksum") != _checksum(state):
+            return False
+        base = state["checksum"]
+        log_bytes = self._replay(state, base)
+        if state.get("source") != source:
+            return False
+        self.state = state
+        self._base = base
+        self._sizes = [os.path.getsize(self.path), log_bytes]
+        self._dirty_days, self._dirty_months = set(), set()
+        self._calendar = None
+        return True
+
+    def _replay(self, state, base):
+        # applies the delta log in order -> its size, or infinity if a line belonged to an older sidecar
+        # or was torn by a crash (the next save then folds the log instead of appending after it)
+        try:
+            f = open(self.path + LOG_SUFFIX)
+        except FileNotFoundError:
+            return 0
+        size = 0
+        with f:
+            for line in f:
+                try:
+                    delta = json.loads(line)
+                except ValueError:
+                    return float("inf")
+                if delta.get("base") != base or delta.get("checksum") != _checksum(delta):
+                    return float("inf")
+                for key in ("days", "months"):
+                    for name, bucket in delta[key].items():
+                        if bucket is None:
+                            state[key].pop(name, None)
+                        else:
+                            state[key][name] = bucket
+                state.update({key: delta[key] for key in SCALARS})
+                size += len(line)
+        return size
+
+    def save(self, source):
+        self.state["source"] = _normal(source)
+        if self._base is None or self._sizes[1] > max(LOG_MIN_BYTES, self._sizes[0]):
+            return self._compact()
+        delta = {
+            "base": self._base,
+            "days": {day: self.state["days"].get(day) for day in sorted(self._dirty_days)},
+            "months": {month: self.state["months"].get(month) for month in sorted(self._dirty_months)},
+            **{key: self.state[key] for key in SCALARS},
+        }
+        delta["checksum"] = _checksum(delta)
+        line = json.dumps(delta) + "\n"
+        with open(self.path + LOG_SUFFIX, "a") as f:
+            f.write(line)
+        self._sizes[1] += len(line)
+        self._dirty_days, self._dirty_months = set(), set()
+
+    def _compact(self):
+        # the whole state into the sidecar (write-then-rename), then a fresh delta log on top of it
+        self.state["checksum"] = _checksum(self.state)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+        with open(self.path + LOG_SUFFIX, "w"):
+            pass
+        self._base = self.state["checksum"]
+        self._sizes = [os.path.getsize(self.path), 0]
+        self._dirty_days, self._dirty_months = set(), set()
+
+    def _touch(self, day):
+        self._dirty_days.add(day)
+        self._dirty_months.add(_month(day))
+
+    def rebuild(self, summary, pnl, source):
+        # summary: analytics.daily_summary() frame, pnl: Net P&L in journal order
+        days = {}
+        for rec in summary.itertuples(index=False):
+            days[_day(rec[0])] = [float(v) for v in rec[1:]]
+        months = {}
+        for day, bucket in days.items():
+            month = months.setdefault(_month(day), [0.0, 0.0, 0.0, 0.0])
+            month[0] += bucket[PNL]
+            month[1] += bucket[TRADES]
+            month[2] += bucket[WIN_COUNT]
+            month[3] += bucket[LOSS_COUNT]
+        equity, peak, max_dd = _drawdown(pnl)
+        self.state = {
+            "format": STATS_FORMAT,
+            "days": days,
+            "months": months,
+            "equity": equity,
+            "peak": peak,
+            "max_drawdown": max_dd,
+            "equity_dirty": False,
+        }
+        self._calendar = None
+        self._base = None  # a rebuilt state is written whole
+        self.save(source)
+
+    def _apply(self, row, sign):
+        pnl = float(row.get("Net P&L", 0) or 0)
+        day = _day(row["Date"])
+        self._touch(day)
+        bucket = self.state["days"].get(day)
+        if bucket is None:
+            bucket = self.state["days"][day] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, pnl, 0.0]
+            self._index_day(day, bucket)
+        bucket[PNL] += sign * pnl
+        bucket[WINS] += sign * pnl if pnl > 0 else 0.0
+        bucket[LOSSES] += sign * pnl if pnl < 0 else 0.0
+        bucket[WIN_COUNT] += sign * (pnl > 0)
+        bucket[LOSS_COUNT] += sign * (pnl < 0)
+        bucket[TRADES] += sign
+        bucket[SUM_SQ] += sign * pnl * pnl
+        if sign > 0 and bucket[WORST] is not None:
+            bucket[WORST] = min(bucket[WORST], pnl)
+        elif sign < 0 and bucket[WORST] is not None and pnl <= bucket[WORST]:
+            bucket[WORST] = None  # the day's minimum left; recomputed for that day on next read
+        month = self.state["months"].setdefault(_month(day), [0.0, 0.0, 0.0, 0.0])
+        month[0] += sign * pnl
+        month[1] += sign
+        month[2] += sign * (pnl > 0)
+        month[3] += sign * (pnl < 0)
+        if bucket[TRADES] <= 0:
+            del self.state["days"][day]
+            self._unindex_day(day)
+        if month[1] <= 0:
+            del self.state["months"][_month(day)]
+        return pnl
+
+    def add(self, row):
+        pnl = self._apply(row, 1)
+        # appends extend the equity curve at its end, so peak/drawdown stay O(1)
+        self.state["equity"] += pnl
+        self.state["peak"] = max(self.state["peak"], self.state["equity"])
+        self.state["max_drawdown"] = max(self.state["max_drawdown"], self.state["peak"] - self.state["equity"])
+
+    def extend(self, summary, pnl):
+        # a batch of appended trades: merge its per-day summary, then continue the equity curve
+        days = self.state["days"]
+        for rec in summary.itertuples(index=False):
+            day = _day(rec[0])
+            self._touch(day)
+            values = [float(v) for v in rec[1:]]
+            bucket = days.get(day)
+            if bucket is None:
+                days[day] = values
+                self._index_day(day, values)
+            else:
+                for i, value in enumerate(values):
+                    if i != WORST:
+                        bucket[i] += value
+                if bucket[WORST] is not None:
+                    bucket[WORST] = min(bucket[WORST], values[WORST])
+            month = self.state["months"].setdefault(_month(day), [0.0, 0.0, 0.0, 0.0])
+            month[0] += values[PNL]
+            month[1] += values[TRADES]
+            month[2] += values[WIN_COUNT]
+            month[3] += values[LOSS_COUNT]
+        equity = self.state["equity"] + np.cumsum(np.asarray(pnl, dtype=float))
+        if len(equity):
+            peak = np.maximum.accumulate(np.maximum(equity, self.state["peak"]))
+            self.state["equity"] = float(equity[-1])
+            self.state["peak"] = float(peak[-1])
+            self.state["max_drawdown"] = max(self.state["max_drawdown"], float((peak - equity).max()))
+
+    def remove(self, row):
+        self.state["equity"] -= self._apply(row, -1)
+        self.state["equity_dirty"] = True  # a trade left the middle of the curve
+
+    def replace(self, old, new):
+        self.remove(old)
+        self.add(new)
+        self.state["equity_dirty"] = True
+
+    def daily_summary(self, worst_loader):
+        days = self.state["days"]
+        stale = [day for day, bucket in days.items() if bucket[WORST] is None]
+        if stale:
+            for day, worst in worst_loader(stale).items():
+                days[_day(day)][WORST] = float(worst)
+                self._touch(_day(day))
+            self.save(self.state["source"])
+        if not days:
+            return pd.DataFrame(columns=analytics.SUMMARY_COLUMNS)
+        summary = pd.DataFrame(
+            [[day, *bucket] for day, bucket in days.items()], columns=analytics.SUMMARY_COLUMNS
+        )
+        return summary.sort_values("Date", ignore_index=True)
+
+    # calendar index: month -> day of month -> the day's bucket (the same list objects as in
+    # state["days"], so every add/remove/extend above is already reflected in it)
+
+    def _calendar_index(self):
+        if self._calendar is None:
+            self._calendar = {}
+            for day, bucket in self.state["days"].items():
+                self._calendar.setdefault(_month(day), {})[int(day[8:10])] = bucket
+        return self._calendar
+
+    def _index_day(self, day, bucket):
+        if self._calendar is not None:
+            self._calendar.setdefault(_month(day), {})[int(day[8:10])] = bucket
+
+    def _unindex_day(self, day):
+        if self._calendar is not None:
+            month = self._calendar.get(_month(day), {})
+            month.pop(int(day[8:10]), None)
+            if not month:
+                self._calendar.pop(_month(day), None)
+
+    def calendar_months(self):
+        return sorted(self._calendar_index())
+
+    def calendar_month(self, month):
+        # "YYYY-MM" -> {day of month: (pnl, trades, wins, losses)}, O(days in month)
+        days = self._calendar_index().get(month, {})
+        return {
+            day: (bucket[PNL], int(bucket[TRADES]), int(bucket[WIN_COUNT]), int(bucket[LOSS_COUNT]))
+            for day, bucket in sorted(days.items())
+        }
+
+    def monthly_summary(self):
+        return pd.DataFrame(
+            [[month, *bucket] for month, bucket in sorted(self.state["months"].items())],
+            columns=["Month", "Net P&L", "Trades", "Win Count", "Loss Count"],
+        )
+
+    def equity_stats(self, pnl_loader):
+        if self.state["equity_dirty"]:
+            equity, peak, max_dd = _drawdown(pnl_loader())
+            self.state.update(equity=equity, peak=peak, max_drawdown=max_dd, equity_dirty=False)
+            self.save(self.state["source"])
+        return {
+            "Equity": self.state["equity"],
+            "Peak Equity": self.state["peak"],
+            "Max Drawdown": self.state["max_drawdown"],
+        }
@@ -0,0 +1,154 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# forward-looking risk from the journal's own P&L: every simulated path replays n trades drawn from
+# the recorded Net P&L series, starting from the current balance. Paths are simulated as
+# (paths x trades) arrays in chunks of at most CHUNK_CELLS values, so memory stays bounded whatever
+# the path count; from POOL_PATHS paths on the chunks are spread over a process pool.
+CHUNK_CELLS = 2_000_000  # ~16 MB per float64 array; a chunk needs about four of them
+POOL_PATHS = 100_000
+METRICS = ["Final Equity", "Max Drawdown", "Max Drawdown %", "Longest Losing Streak", "Ruined"]
+
+class Resampler:
+    # how the trades of a path are drawn from the journal's P&L (in date order); subclasses return
+    # a (paths x horizon) array and are registered in RESAMPLERS
+    name = None
+
+    def horizon(self, trades, requested):
+        # trades per path for a journal of `trades` trades
+        return trades if requested is None else int(requested)
+
+    def sample(self, pnl, paths, horizon, rng):
+        raise NotImplementedError
+
+class Bootstrap(Resampler):
+    # independent draws with replacement: keeps the distribution, forgets any ordering
+    name = "Bootstrap"
+
+    def sample(self, pnl, paths, horizon, rng):
+        return pnl[rng.integers(0, len(pnl), (paths, horizon))]
+
+class BlockBootstrap(Resampler):
+    # runs of `block` consecutive trades from random (circular) starting points, so winning and
+    # losing streaks of the journal survive into the paths
+    name = "Block bootstrap"
+
+    def __init__(self, block=5):
+        self.block = max(1, int(block))
+
+    def sample(self, pnl, paths, horizon, rng):
+        block = min(self.block, len(pnl))
+        starts = rng.integers(0, len(pnl), (paths, -(-horizon // block)))
+        index = (starts[:, :, None] + np.arange(block)) % len(pnl)
+        return pnl[index.reshape(paths, -1)[:, :horizon]]
+
+class Shuffle(Resampler):
+    # the journal's own trades in a random order: same final equity on every path, so this isolates
+    # how much of the drawdown and streaks came down to sequence luck. Always the whole journal
+    name = "Shuffle"
+
+    def horizon(self, trades, requested):
+        return trades
+
+    def sample(self, pnl, paths, horizon, rng):
+        # Fisher-Yates per row, O(trades) rather than the O(trades log trades) of argsorting keys
+        return rng.permuted(np.broadcast_to(pnl, (paths, len(pnl))), axis=1)
+
+RESAMPLERS = {cls.name: cls for cls in (Bootstrap, BlockBootstrap, Shuffle)}
+
+def path_metrics(sample, start, ruin_level):
+    # final equity, deepest drawdown (absolute and % of the peak), longest run of losing trades and
+    # whether equity ever fell to ruin_level, per path; works in place on the sample's memory
+    losing = sample < 0
+    steps = np.arange(sample.shape[1], dtype=np.int32)
+    last_win = np.where(losing, np.int32(-1), steps)
+    np.maximum.accumulate(last_win, axis=1, out=last_win)
+    streak = (steps - last_win).max(axis=1) if sample.shape[1] else np.zeros(len(sample), dtype=int)
+    del losing, last_win
+
+    equity = np.cumsum(sample, axis=1, out=sample)
+    equity += start
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, start, out=peak)
+    ruined = equity.min(axis=1) <= ruin_level if equity.shape[1] else np.zeros(len(equity), dtype=bool)
+    final = equity[:, -1].copy() if equity.shape[1] else np.full(len(equity), float(start))
+    drawdown = np.subtract(peak, equity, out=equity)
+    depth = drawdown.max(axis=1) if drawdown.shape[1] else np.zeros(len(drawdown))
+    drawdown *= 100
+    positive = peak > 0
+    np.divide(drawdown, peak, out=peak, where=positive)
+    peak[~positive] = 0.0
+    depth_pct = peak.max(axis=1) if peak.shape[1] else np.zeros(len(peak))
+    return {
+        "Final Equity": final,
+        "Max Drawdown": depth,
+        "Max Drawdown %": depth_pct,
+        "Longest Losing Streak": streak,
+        "Ruined": ruined,
+    }
+
+def _run_chunk(resampler, pnl, paths, horizon, start, ruin_level, seed):
+    # one chunk, in this process or a pool worker: its own seed keeps results independent of the
+    # worker count and of which chunk finishes first
+    rng = np.random.default_rng(seed)
+    return path_metrics(resampler.sample(pnl, paths, horizon, rng).astype(float, copy=False), start, ruin_level)
+
+def chunk_sizes(paths, horizon, cells=CHUNK_CELLS):
+    per_chunk = max(1, cells // max(1, horizon))
+    return [min(per_chunk, paths - done) for done in range(0, paths, per_chunk)]
+
+def simulate(pnl, start, resampler=None, paths=10_000, horizon=None, ruin=1.0, seed=None, workers=None, progress=None):
+    # pnl: the journal's Net P&L in date order; start: the balance paths begin from; ruin: the share
+    # of that balance whose loss counts as ruin (1.0: equity at or below zero). workers: None picks a
+    # process pool from POOL_PATHS paths on, 0 or 1 stays in this process. progress(done, paths) is
+    # called after every chunk. Returns one array per METRICS name, one value per path
+    pnl = np.asarray(pnl, dtype=float)
+    resampler = resampler or Bootstrap()
+    horizon = resampler.horizon(len(pnl), horizon)
+    if not len(pnl) or paths <= 0:
+        return {name: np.array([]) for name in METRICS}
+    ruin_level = start * (1 - ruin)
+    sizes = chunk_sizes(paths, horizon)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers is None:
+        workers = min(os.cpu_count() or 1, len(sizes)) if paths >= POOL_PATHS else 1
+    jobs = [(resampler, pnl, size, horizon, start, ruin_level, child) for size, child in zip(sizes, seeds)]
+    results = [None] * len(jobs)
+    done = 0
+    if workers > 1:
+        # spawn, not fork: the Streamlit server is multi-threaded, and workers only import numpy
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_run_chunk, *job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                done += sizes[i]
+                if progress:
+                    progress(done, paths)
+    else:
+        for i, job in enumerate(jobs):
+            results[i] = _run_chunk(*job)
+            done += sizes[i]
+            if progress:
+                progress(done, paths)
+    return {name: np.concatenate([result[name] for result in results]) for name in METRICS}
+
+def summary(result, start, horizon, quantiles=(5, 50, 95)):
+    # the distributions as percentiles (rows) per metric (columns), plus the headline probabilities
+    table = {}
+    for name in METRICS[:-1]:
+        values = result[name]
+        table[name] = {f"P{q}": float(np.percentile(values, q)) if len(values) else 0.0 for q in quantiles}
+        table[name]["Mean"] = float(values.mean()) if len(values) else 0.0
+    final = result["Final Equity"]
+    headline = {
+        "Paths": len(final),
+        "Trades per Path": int(horizon),
+        "Start Balance": float(start),
+        "Risk of Ruin %": float(result["Ruined"].mean() * 100) if len(final) else 0.0,
+        "Probability of Loss %": float((final < start).mean() * 100) if len(final) else 0.0,
+    }
+    return headline, table
@@ -0,0 +1,370 @@
+import os
+import io
+import json
+import zlib
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# versioned journal snapshots: every version of the journal files (trades, investments and the
+# ledger sidecar) is a small manifest listing each file's chunks by SHA-256, and every chunk is
+# stored once, zlib-compressed, under chunks/<2 hex>/<digest>. Text files are cut at content-defined
+# line boundaries and binary ones (SQLite, Arrow, JSON) at content-defined byte offsets, so an
+# appended, edited or deleted row changes only the chunk or two around it and a version stores just
+# those. A file whose stat is unchanged is not read at all, and an append-only
+# file that grew in place is read from its last chunk on, so taking a snapshot costs what changed
+SNAPSHOT_DIR = os.environ.get("TRADE_JOURNAL_SNAPSHOTS")  # default: .snapshots next to the journal
+INDEX_FILE = "index.jsonl"
+CHUNK_MIN = 16 * 1024
+CHUNK_MAX = 256 * 1024
+CUT_MASK = (1 << 10) - 1  # cut after about one line in 1024: ~50 KB chunks of CSV
+BINARY_CUT_MASK = (1 << 16) - 1  # cut after about one byte in 65536: ~80 KB chunks of anything else
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+SALT = np.uint64(0x5BD1E9955BD1E995)  # keeps runs of 0x00 or 0xFF (free SQLite pages) from cutting everywhere
+KEEP_LAST = 50
+KEEP_DAILY = 30
+KEEP_WEEKLY = 12
+PRUNE_EVERY = 25  # versions between automatic prunes with the default retention
+COMPRESS_LEVEL = 3  # zlib: most of level 9's ratio at a fraction of its time
+TEXT_SUFFIXES = (".csv", ".tail")  # files whose rows are lines, diffed chunk by chunk
+
+def chunk_bounds(data, text=True):
+    # end offsets of the chunks of data: text is cut after a line whose last 8 bytes hash to 0 under
+    # CUT_MASK, anything else after any 8 bytes that hash to 0 under BINARY_CUT_MASK; at least
+    # CHUNK_MIN and at most CHUNK_MAX bytes after the previous cut
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if not text:
+        return _cuts(_binary_candidates(data), None, len(buf))
+    lines = np.flatnonzero(buf == 10) + 1
+    window = np.zeros(len(lines), dtype=np.uint64)
+    for k in range(8):
+        window = (window << np.uint64(8)) | buf[np.maximum(lines - 1 - k, 0)].astype(np.uint64)
+    hashed = (window * GOLDEN) >> np.uint64(40)
+    return _cuts(lines[(hashed & np.uint64(CUT_MASK)) == 0], lines, len(buf))
+
+def _binary_candidates(data):
+    # the offset after every 8 bytes whose word hashes to 0: the words at each of the 8 alignments
+    # are read straight from the buffer, so every offset is hashed without a Python loop over bytes
+    found = []
+    for k in range(min(8, len(data))):
+        words = np.frombuffer(data, dtype="<u8", count=(len(data) - k) // 8, offset=k)
+        hashed = ((words ^ SALT) * GOLDEN) >> np.uint64(40)
+        found.append(np.flatnonzero((hashed & np.uint64(BINARY_CUT_MASK)) == 0) * 8 + k + 8)
+    return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+def _cuts(candidates, lines, n):
+    # the first candidate at least CHUNK_MIN after each cut, with forced cuts in between when it is
+    # more than CHUNK_MAX away
+    ends, last = [], 0
+    while True:
+        i = int(np.searchsorted(candidates, last + CHUNK_MIN))
+        if i == len(candidates):
+            break
+        cut = int(candidates[i])
+        while cut - last > CHUNK_MAX:
+            last = _forced_cut(lines, last)
+            ends.append(last)
+        ends.append(cut)
+        last = cut
+    while n - last > CHUNK_MAX:
+        last = _forced_cut(lines, last)
+        ends.append(last)
+    if n > last:
+        ends.append(n)
+    return ends
+
+def _forced_cut(lines, last):
+    # no content-defined cut within CHUNK_MAX: the last line end before the limit, else the limit
+    if lines is None:
+        return last + CHUNK_MAX
+    i = int(np.searchsorted(lines, last + CHUNK_MAX, side="right")) - 1
+    return int(lines[i]) if i >= 0 and lines[i] > last else last + CHUNK_MAX
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _lines_diff(before, after):
+    # rows only in before (removed) and only in after (added), each in file order; a row that
+    # appears twice and was deleted once is removed once
+    pending = Counter(after)
+    removed = []
+    for line in before:
+        if pending[line]:
+            pending[line] -= 1
+        else:
+            removed.append(line)
+    pending = Counter(before)
+    added = []
+    for line in after:
+        if pending[line]:
+            pending[line] -= 1
+        else:
+            added.append(line)
+    return removed, added
+
+def _rows(header, lines, suffix):
+    if not lines:
+        return pd.DataFrame()
+    if suffix == ".tail":
+        return pd.DataFrame([json.loads(line) for line in lines])
+    return pd.read_csv(io.StringIO("\n".join([header, *lines])), dtype=str, keep_default_na=False)
+
+def frame_diff(before, after, name):
+    # the row-level diff of two frames, through their CSV lines
+    lines = [df.to_csv(index=False, lineterminator="\n").split("\n") for df in (before, after)]
+    removed, added = _lines_diff(lines[0][1:], lines[1][1:])
+    return _diff_table(name, lines[0][0], lines[1][0], removed, added, ".csv")
+
+def _diff_table(name, old_header, new_header, removed, added, suffix):
+    frames = [_rows(old_header, [line for line in removed if line], suffix).assign(Change="Removed"),
+              _rows(new_header, [line for line in added if line], suffix).assign(Change="Added")]
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=["File", "Change"])
+    table = pd.concat(frames, ignore_index=True)
+    table.insert(0, "File", name)
+    return table[["File", "Change", *[col for col in table.columns if col not in ("File", "Change")]]]
+
+class SnapshotStore:
+    # callers serialize save, prune and restore (storage.Store holds write_lock on the directory);
+    # reads (versions, manifest, read, diff) are lock-free: chunks and manifests are written
+    # before the index line that makes them visible
+
+    def __init__(self, base, directory=None):
+        self.base = base  # journal files are named relative to this directory
+        self.directory = directory or os.path.join(base, ".snapshots")
+        self._manifests = {}
+
+    def name(self, path):
+        return os.path.relpath(os.path.abspath(path), self.base)
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _chunk_path(self, digest):
+        return self._path("chunks", digest[:2], digest + ".zz")
+
+    def _put(self, digest, data):
+        # -> compressed bytes written, 0 if the chunk is already stored
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(packed)
+        os.replace(tmp, path)
+        return len(packed)
+
+    def _get(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def versions(self):
+        # one dict per version, oldest first: id, created, reason, files, size and stored bytes
+        try:
+            with open(self._path(INDEX_FILE)) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def manifest(self, version_id):
+        # parsed once per file stamp: another process may have refreshed or pruned it since
+        path = self._path("versions", f"{int(version_id):06d}.json")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise KeyError(f"no snapshot {version_id}")
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._manifests.get(path)
+        if cached is None or cached[0] != stamp:
+            with open(path) as f:
+                cached = self._manifests[path] = (stamp, json.load(f))
+        return cached[1]
+
+    def head(self):
+        versions = self.versions()
+        return self.manifest(versions[-1]["id"]) if versions else None
+
+    def _entry(self, path, old, append_only, verify):
+        # -> (manifest entry of the file as it is now, compressed bytes written), (None, 0) if missing
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None, 0
+        stamp = {"size": st.st_size, "inode": st.st_ino, "mtime_ns": st.st_mtime_ns}
+        if old and not verify and all(old[key] == value for key, value in stamp.items()):
+            return old, 0
+        chunks, start = [], 0
+        with open(path, "rb") as f:
+            if (old and append_only and not verify and old["chunks"] and old["inode"] == st.st_ino
+                    and st.st_size >= old["size"]):
+                # grown in place: the chunks before the old last one stand if that one still reads the same
+                digest, length = old["chunks"][-1]
+                offset = old["size"] - length
+                f.seek(offset)
+                if _digest(f.read(length)) == digest:
+                    chunks, start = old["chunks"][:-1], offset
+            f.seek(start)
+            data = f.read()
+        view = memoryview(data)
+        written, offset = 0, 0
+        for end in chunk_bounds(data, path.endswith(TEXT_SUFFIXES)):
+            piece = view[offset:end]
+            digest = _digest(piece)
+            written += self._put(digest, piece)
+            chunks.append([digest, end - offset])
+            offset = end
+        stamp["size"] = start + len(data)
+        return {**stamp, "chunks": chunks}, written
+
+    def save(self, groups, reason="", verify=False, prune=True):
+        # groups: {group: [(path, append_only), ...]} listing every file of each group as it should be
+        # now (a missing path is a removed file); groups not given keep their files from the latest
+        # version. verify re-reads every file instead of trusting unchanged stats; prune=False skips the
+        # automatic prune (a restore must not lose its target). -> the new version's index entry, or
+        # None when nothing changed
+        head = self.head()
+        previous = head["files"] if head else {}
+        files = {name: entry for name, entry in previous.items() if entry["group"] not in groups}
+        stored = 0
+        for group, paths in groups.items():
+            for path, append_only in paths:
+                name = self.name(path)
+                entry, written = self._entry(path, previous.get(name), append_only, verify)
+                if entry is not None:
+                    files[name] = {**entry, "group": group}
+                    stored += written
+        if head is not None and _content(files) == _content(previous):
+            if files != previous:
+                # same bytes under new stats (a touch, a rewrite with equal content): refresh the stamps
+                self._write_manifest({**head, "files": files})
+            return None
+        version_id = head["id"] + 1 if head else 1
+        manifest = {"id": version_id, "created": datetime.now().isoformat(timespec="seconds"),
+                    "reason": reason, "files": files}
+        self._write_manifest(manifest)
+        entry = {"id": version_id, "created": manifest["created"], "reason": reason, "files": len(files),
+                 "size": sum(file["size"] for file in files.values()), "stored": stored}
+        with open(self._path(INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        if prune and version_id % PRUNE_EVERY == 0:
+            self.prune()
+        return entry
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self._path("versions"), exist_ok=True)
+        path = self._path("versions", f"{manifest['id']:06d}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def read(self, version_id, name):
+        # the file's bytes as of the version
+        entry = self.manifest(version_id)["files"].get(name)
+        if entry is None:
+            raise KeyError(f"{name} is not in snapshot {version_id}")
+        return b"".join(self._get(digest) for digest, _ in entry["chunks"])
+
+    def restore_file(self, version_id, name, path):
+        # write-then-rename, like every other journal rewrite
+        data = self.read(version_id, name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def diff(self, a, b):
+        # -> (one row per file: status, sizes and chunks changed; the rows added and removed in the
+        # text files). Only the chunks between the common leading and trailing ones are read
+        old, new = self.manifest(a)["files"], self.manifest(b)["files"]
+        files, rows = [], []
+        for name in sorted(set(old) | set(new)):
+            before, after = old.get(name), new.get(name)
+            left = [digest for digest, _ in before["chunks"]] if before else []
+            right = [digest for digest, _ in after["chunks"]] if after else []
+            if before is None:
+                status = "added"
+            elif after is None:
+                status = "removed"
+            else:
+                status = "unchanged" if left == right else "changed"
+            files.append({"File": name, "Status": status, "Size Before": before["size"] if before else 0,
+                          "Size After": after["size"] if after else 0, "Chunks Changed": len(set(left) ^ set(right))})
+            if status != "unchanged" and name.endswith(TEXT_SUFFIXES):
+                rows.append(self._text_diff(name, left, right))
+        rows = [table for table in rows if len(table)]
+        table = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=["File", "Change"])
+        return pd.DataFrame(files), table
+
+    def _text_diff(self, name, left, right):
+        head = 0
+        while head < min(len(left), len(right)) and left[head] == right[head]:
+            head += 1
+        tail = 0
+        while tail < min(len(left), len(right)) - head and left[-1 - tail] == right[-1 - tail]:
+            tail += 1
+        # chunks end at line ends, so the differing middle holds whole lines on both sides
+        middles = [self._text(digests[head:len(digests) - tail]).split("\n") for digests in (left, right)]
+        headers = [self._text(digests[:1]).split("\n", 1)[0] for digests in (left, right)]
+        if head == 0:
+            middles = [lines[1:] for lines in middles]  # the header line is not a row
+        removed, added = _lines_diff(*middles)
+        return _diff_table(name, headers[0], headers[1], removed, added, os.path.splitext(name)[1])
+
+    def _text(self, digests):
+        return b"".join(self._get(digest) for digest in digests).decode("utf-8", errors="replace")
+
+    def prune(self, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+        # keep the latest keep_last versions plus the last version of each of the latest keep_daily
+        # days and keep_weekly ISO weeks, then delete the chunks no kept version refers to.
+        # -> (versions removed, compressed bytes freed)
+        versions = self.versions()
+        if not versions:
+            return 0, 0
+        keep = {version["id"] for version in versions[-max(keep_last, 1):]}
+        days, weeks = set(), set()
+        for version in reversed(versions):
+            created = datetime.fromisoformat(version["created"])
+            day, week = created.date(), created.isocalendar()[:2]
+            if day not in days and len(days) < keep_daily:
+                days.add(day)
+                keep.add(version["id"])
+            if week not in weeks and len(weeks) < keep_weekly:
+                weeks.add(week)
+                keep.add(version["id"])
+        kept = [version for version in versions if version["id"] in keep]
+        with open(self._path(INDEX_FILE + ".tmp"), "w") as f:
+            f.writelines(json.dumps(version) + "\n" for version in kept)
+        os.replace(self._path(INDEX_FILE + ".tmp"), self._path(INDEX_FILE))
+        for version in versions:
+            if version["id"] not in keep:
+                path = self._path("versions", f"{version['id']:06d}.json")
+                self._manifests.pop(path, None)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        referenced = set()
+        for version in kept:
+            for entry in self.manifest(version["id"])["files"].values():
+                referenced.update(digest for digest, _ in entry["chunks"])
+        freed = 0
+        chunks = self._path("chunks")
+        for prefix in os.listdir(chunks) if os.path.isdir(chunks) else []:
+            for name in os.listdir(os.path.join(chunks, prefix)):
+                if name.endswith(".zz") and name[:-3] not in referenced:
+                    path = os.path.join(chunks, prefix, name)
+                    freed += os.stat(path).st_size
+                    os.remove(path)
+        return len(versions) - len(kept), freed
+
+def _content(files):
+    return {name: entry["chunks"] for name, entry in files.items()}
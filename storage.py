@@ -0,0 +1,1441 @@
+import os
+import io
+import atexit
+import csv
+import json
+import queue
+import logging
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+import threading
+import warnings
+import zlib
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: writers are then only serialized within one process
+    fcntl = None
+
+import analytics
+import profiling
+from ledger import LEDGER_SUFFIX, LINK_SUFFIX, Ledger, mirrored_pnl, new_link, parse_link, read_link
+from running_stats import STATS_SUFFIX, RunningStats
+from snapshots import KEEP_DAILY, KEEP_LAST, KEEP_WEEKLY, SNAPSHOT_DIR, SnapshotStore, frame_diff
+
+CSV_FILE = "trades.csv"
+INVEST_CSV = "investment.csv"
+SQLITE_DB = "journal.db"
+TRADE_COLUMNS = ["Date", "Symbol", "Side", "Quantity", "Price", "Net P&L", "Pips"]
+INVEST_COLUMNS = ["Date", "Amount"]
+KINDS = ("trades", "investments")
+
+log = logging.getLogger(__name__)
+
+# "csv" (default), "sqlite", "arrow" or "partitioned"; their files live next to the CSVs
+BACKEND = os.environ.get("TRADE_JOURNAL_BACKEND", "csv")
+
+@profiling.timed("parse CSV")
+def _safe_read(path, columns, usecols=None):
+    if not os.path.exists(path) or os.stat(path).st_size == 0:
+        return pd.DataFrame(columns=usecols or columns)
+    try:
+        return pd.read_csv(path, usecols=usecols)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=usecols or columns)
+
+# --- schema: the in-memory (and Arrow on-disk) column types ---
+
+COLUMN_TYPES = {
+    "Symbol": "category",
+    "Side": "category",
+    "Quantity": "float32",
+    "Price": "float64",
+    "Net P&L": "float64",
+    "Pips": "float32",
+    "Amount": "float64",
+}
+
+def typed_frame(df, columns):
+    # real datetimes, dictionary-encoded text, float32 where precision allows
+    df = df.reindex(columns=columns)
+    for col in columns:
+        if col == "Date":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif COLUMN_TYPES.get(col) == "category":
+            df[col] = df[col].astype("category")
+        elif col in COLUMN_TYPES:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(COLUMN_TYPES[col])
+    return df
+
+def normalize_trades(df):
+    # what every load returns: typed columns plus the month / day-of-month keys the
+    # calendars and filters use, computed once per data version instead of per render
+    df = typed_frame(df, [col for col in TRADE_COLUMNS if col in df.columns])
+    if "Date" in df:
+        codes, months = pd.factorize(df["Date"].dt.to_period("M"), sort=True)
+        df["Month"] = pd.Categorical.from_codes(codes, months.strftime("%Y-%m"))
+        df["Day"] = df["Date"].dt.day.astype("Int8")
+    return df
+
+def normalize_investments(df):
+    return typed_frame(df, INVEST_COLUMNS)
+
+# parsed frames shared across Streamlit reruns, keyed on the (path, mtime, size) of the backing files
+_cache = {}
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()
+
+def _file_version(*paths):
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append((path, None, None))
+    return tuple(version)
+
+def cached(name, version, loader):
+    with _cache_lock:
+        entry = _cache.get(name)
+        if entry is not None and entry[0] == version:
+            _cache_stats["hits"] += 1
+            return entry[1].copy()
+        _cache_stats["misses"] += 1
+    df = loader()
+    with _cache_lock:
+        _cache[name] = (version, df)
+    return df.copy()
+
+def invalidate_cache(*prefixes):
+    # drop every entry whose name starts with one of the given prefixes (everything if none given)
+    with _cache_lock:
+        for name in list(_cache):
+            if not prefixes or any(name[:len(p)] == p for p in prefixes):
+                del _cache[name]
+
+def cache_info():
+    with _cache_lock:
+        return dict(_cache_stats, entries=len(_cache))
+
+# --- CSV backend: append-only writes, edits by write-then-rename ---
+
+def _fsync_write(path, text, mode="a"):
+    with open(path, mode, newline="") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _csv_header(path):
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+def append_row(file_path, row, columns):
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        pd.DataFrame(columns=columns).to_csv(file_path, index=False)
+    # keep the column order of the existing header, only the new row is written
+    header = _csv_header(file_path) or columns
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow([row.get(col, "") for col in header])
+    _fsync_write(file_path, _line_break(file_path) + buf.getvalue())
+
+def _line_break(file_path):
+    # the newline a hand-edited file may be missing before the next row can be appended
+    with open(file_path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return "" if f.read(1) == b"\n" else "\n"
+
+def extend_file(file_path, df, columns):
+    # bulk append: all rows in one write, and the store's snapshot right after it
+    if not os.path.exists(file_path) or os.stat(file_path).st_size == 0:
+        pd.DataFrame(columns=columns).to_csv(file_path, index=False)
+    header = _csv_header(file_path) or columns
+    text = df.reindex(columns=header).to_csv(index=False, header=False, lineterminator="\n")
+    _fsync_write(file_path, _line_break(file_path) + text)
+
+def rewrite_file(file_path, df):
+    # edits and deletes still rewrite the file: write-then-rename, so concurrent readers see either the old or the new file, never half of it
+    tmp = file_path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, file_path)
+
+# --- concurrency: serialized writers, optimistic edits ---
+
+class ConflictError(Exception):
+    # the row changed (or moved) since it was read; the edit/delete was not applied
+    pass
+
+class SnapshotBusyError(sqlite3.OperationalError):
+    # a SQLite reader keeps commits in the WAL, so the database cannot be snapshotted yet; try again
+    pass
+
+_thread_locks = {}
+
+@contextmanager
+def write_lock(path):
+    # advisory lock shared by every writer of path, across threads and processes; readers never take it
+    with _thread_locks.setdefault(path, threading.Lock()):
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _canonical(value):
+    if pd.isna(value):
+        return ""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, float):  # includes numpy floats; float32 values compare after widening
+        return repr(float(value))
+    return str(value)
+
+def row_etag(row, columns):
+    # version tag of one normalized row, compared before an edit/delete is applied
+    text = "\x1f".join(_canonical(row[col]) for col in columns)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+class Store:
+    # shared by the backends: writes are serialized per file and checked against the row's etag,
+    # and dashboard aggregates come from persisted running statistics that every trade write
+    # updates incrementally (see running_stats.py); the investment balance likewise (see ledger.py).
+    # Every write ends with a snapshot of the files it changed (see snapshots.py)
+
+    def __init__(self, stats_path, ledger_path):
+        self.stats = RunningStats(stats_path)
+        self.ledger = Ledger(ledger_path)
+        self._stats_lock = threading.RLock()
+        self._baselined = set()  # kinds whose files were snapshotted before this process first wrote them
+        # .snapshots next to the journal files, unless TRADE_JOURNAL_SNAPSHOTS names a directory
+        self.snapshots = SnapshotStore(os.path.dirname(os.path.abspath(ledger_path)), SNAPSHOT_DIR)
+
+    def running_stats(self):
+        with self._stats_lock:
+            source = self._stats_source()
+            if not self.stats.load(source):
+                summary, pnl = self._stats_inputs()
+                self.stats.rebuild(summary, pnl, source)
+            return self.stats
+
+    def daily_summary(self):
+        with self._stats_lock:
+            return self.running_stats().daily_summary(self._worst_for)
+
+    def monthly_summary(self):
+        with self._stats_lock:
+            return self.running_stats().monthly_summary()
+
+    def calendar_months(self):
+        with self._stats_lock:
+            return self.running_stats().calendar_months()
+
+    def calendar_month(self, month):
+        with self._stats_lock:
+            return self.running_stats().calendar_month(month)
+
+    def equity_stats(self):
+        with self._stats_lock:
+            return self.running_stats().equity_stats(self._pnl_series)
+
+    def running_ledger(self):
+        with self._stats_lock:
+            source = self._ledger_source()
+            if not self.ledger.load(source):
+                self.ledger.rebuild(self.load_investments(), source, self._link(self.ledger.link()))
+            return self.ledger
+
+    def _link(self, link):
+        # a full link for the ledger from what its files hold (see ledger.py). A lost link is taken from
+        # the newest snapshot that kept it; only a journal that never had one is linked anew silently
+        if link is not None and "dates" in link:
+            return link
+        held = link is not None or any(os.path.exists(path)
+                                       for path in (self.ledger.path, self.ledger.link_path))
+        for version_id, kept in self._snapshot_links():
+            held = True
+            if kept is None or (link is not None and (kept["linked"], kept["linked_date"])
+                                != (link["linked"], link["linked_date"])):
+                continue
+            if link is None:
+                warnings.warn(f"the ledger link of {self.ledger.path} was lost: recovered it from snapshot "
+                              f"#{version_id}", RuntimeWarning)
+            link = kept
+            if "dates" in link:
+                return link
+        days = self.running_stats().state["days"]
+        if link is None:
+            if held:
+                warnings.warn(f"the ledger link of {self.ledger.path} was lost and no snapshot kept it: "
+                              "linking anew at the trades' current P&L shifts every balance dated before "
+                              "today", RuntimeWarning)
+            return new_link(days)
+        # linked before link files kept the mirrored P&L by day: take it from the trades as they are now
+        return {**link, **mirrored_pnl(days)}
+
+    def _snapshot_links(self):
+        # -> (version id, its link or None if unreadable) of every version holding ledger files, newest first
+        names = [self.snapshots.name(path) for path in (self.ledger.link_path, self.ledger.path)]
+        for version in reversed(self.snapshots.versions()):
+            try:
+                files = self.snapshots.manifest(version["id"])["files"]
+            except KeyError:
+                continue
+            kept = [name for name in names if name in files]
+            if not kept:
+                continue
+            link = None
+            for name in kept:
+                try:
+                    link = parse_link(self.snapshots.read(version["id"], name))
+                except (KeyError, OSError, zlib.error):
+                    link = None
+                if link is not None:
+                    break
+            yield version["id"], link
+
+    def capital(self):
+        # deposits less withdrawals, O(1)
+        with self._stats_lock:
+            return self.running_ledger().capital()
+
+    def balance(self):
+        # capital plus the P&L of every trade in the journal, both O(1)
+        with self._stats_lock:
+            return self.capital() + self.running_stats().state["equity"]
+
+    def balance_as_of(self, day):
+        # the balance at the end of the given day
+        with self._stats_lock:
+            ledger = self.running_ledger()
+            summary = self.daily_summary()
+            day = str(pd.Timestamp(day).date())
+            end = int(summary["Date"].searchsorted(day, side="right"))
+            trade_pnl = float(summary["Net P&L"].iloc[:end].astype(float).sum())
+            held = ledger.ledger_as_of(day, self.load_investments)
+            # before the ledger was linked its entries already included the trades' P&L as it was then
+            return held - ledger.mirrored_as_of(day) + trade_pnl
+
+    def load_range(self, start=None, end=None, columns=None):
+        # trades dated within [start, end] (days, both inclusive, either may be open)
+        if columns is not None and "Date" not in columns:
+            columns = ["Date", *columns]
+        start, end = (None if day is None else pd.Timestamp(day) for day in (start, end))
+        return analytics.in_window(self.load_trades(columns), start, end)
+
+    def _columns(self, kind):
+        return TRADE_COLUMNS if kind == "trades" else INVEST_COLUMNS
+
+    def _current_row(self, kind, key):
+        df = self.load_trades() if kind == "trades" else self.load_investments()
+        return df.loc[key]
+
+    def _check_etag(self, kind, key, etag):
+        try:
+            current = self._current_row(kind, key)
+        except KeyError:
+            raise ConflictError(f"{kind} row {key} no longer exists")
+        if row_etag(current, self._columns(kind)) != etag:
+            raise ConflictError(f"{kind} row {key} was changed by someone else")
+
+    def _write(self, kind, op, key=None, row=None, etag=None):
+        with write_lock(self._lock_path(kind)), self._stats_lock:
+            if kind not in self._baselined:
+                # whatever changed since the latest version (hand edits, another install) gets its own
+                # version before this process first writes the kind; nothing is stored if it is unchanged
+                self._snapshot_write([kind], "open")
+                self._baselined.add(kind)
+            stats = self.running_stats() if kind == "trades" else None
+            # the ledger is linked before the first write of any kind, while the journal is still
+            # exactly what the mirroring app left behind (a fresh journal links at 0)
+            ledger = self.running_ledger()
+            if etag is not None:
+                self._check_etag(kind, key, etag)
+            if op == "append":
+                self._append_row(kind, row)
+            elif op == "extend":
+                self._extend_rows(kind, row)
+            elif op == "update":
+                old = self._update_row(kind, key, row)
+            else:
+                old = self._delete_row(kind, key)
+            if stats is not None:
+                if op == "append":
+                    stats.add(row)
+                elif op == "extend":
+                    stats.extend(analytics.daily_summary(row), row["Net P&L"])
+                elif op == "update":
+                    stats.replace(old, {**old, **row})
+                else:
+                    stats.remove(old)
+                stats.save(self._stats_source())
+            if kind == "investments":
+                if op == "append":
+                    ledger.add(row)
+                elif op == "extend":
+                    ledger.extend(row)
+                elif op == "update":
+                    ledger.replace(old, {**old, **row})
+                else:
+                    ledger.remove(old)
+                ledger.save(self._ledger_source())
+            self._snapshot_write([kind], f"{op} {kind}")
+        self._written(kind)
+
+    def append_trade(self, row):
+        self._write("trades", "append", row=row)
+
+    def append_investment(self, row):
+        self._write("investments", "append", row=row)
+
+    def append_batch(self, trades, investments=None):
+        # bulk import: each file gets one locked write and the running stats one merge,
+        # instead of a write (and stats update) per row
+        if len(trades):
+            self._write("trades", "extend", row=trades)
+        if investments is not None and len(investments):
+            self._write("investments", "extend", row=investments)
+
+    def update_trade(self, key, row, etag=None):
+        self._write("trades", "update", key, row, etag)
+
+    def delete_trade(self, key, etag=None):
+        self._write("trades", "delete", key, etag=etag)
+
+    def update_investment(self, key, row, etag=None):
+        self._write("investments", "update", key, row, etag)
+
+    def delete_investment(self, key, etag=None):
+        self._write("investments", "delete", key, etag=etag)
+
+    def _ledger_source(self):
+        return self.version("investments")
+
+    # --- snapshots ---
+
+    def _snapshot_files(self, kinds):
+        # -> {group: [(path, append_only), ...]}: every file holding the given kinds, and whether it
+        # only ever grows in place (rewrites replace it)
+        return {kind: [(self._lock_path(kind), True)] for kind in kinds}
+
+    def _journal_files(self, kinds):
+        groups = self._snapshot_files(kinds)
+        groups["ledger"] = [(self.ledger.path, False), (self.ledger.link_path, False)]
+        return groups
+
+    @contextmanager
+    def _locked(self):
+        # every writer's lock, always in the same order, so no write is in flight
+        with ExitStack() as stack:
+            for path in sorted({self._lock_path(kind) for kind in KINDS}):
+                stack.enter_context(write_lock(path))
+            yield
+
+    def _snapshot_write(self, kinds, reason, prune=True, defer=True):
+        # the snapshot around a write, under its lock; defer: it may be taken later (see SqliteStore)
+        self._save_snapshot(kinds, reason, prune=prune)
+
+    def _save_snapshot(self, kinds, reason, verify=False, prune=True):
+        # under the writers' locks of the kinds, so no write is half done in the files it reads
+        groups = self._journal_files(kinds)
+        with write_lock(self.snapshots.directory):
+            return self.snapshots.save(groups, reason, verify, prune)
+
+    def snapshot(self, reason="manual", verify=False):
+        # a version of the whole journal; None if it matches the latest one
+        with self._locked():
+            return self._save_snapshot(KINDS, reason, verify)
+
+    def flush_snapshot(self):
+        # take the snapshot of any write still waiting for one (see SqliteStore); the others never wait
+        return None
+
+    def snapshot_diff(self, a, b=None):
+        # -> (per-file changes, rows added and removed) between two versions, or between a version and
+        # the journal as it is now (snapshotted first)
+        if b is None:
+            self.snapshot("diff")
+            b = self.snapshots.versions()[-1]["id"]
+        files, rows = self.snapshots.diff(a, b)
+        tables = [rows]
+        for name in files.loc[files["Status"] != "unchanged", "File"]:
+            before, after = self._snapshot_tables(a, name), self._snapshot_tables(b, name)
+            for label in sorted(before.keys() | after.keys()):
+                old, new = before.get(label), after.get(label)
+                old = new.iloc[:0] if old is None else old
+                new = old.iloc[:0] if new is None else new
+                tables.append(frame_diff(old, new, label))
+        tables = [table for table in tables if len(table)]
+        return files, pd.concat(tables, ignore_index=True) if tables else rows
+
+    def prune_snapshots(self, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+        # -> (versions removed, bytes freed); never while a restore is reading its version
+        with self._locked(), write_lock(self.snapshots.directory):
+            return self.snapshots.prune(keep_last, keep_daily, keep_weekly)
+
+    def _snapshot_tables(self, version_id, name):
+        # {label: frame} of a binary journal file as of a version, for its row-level diff
+        return {}
+
+    def restore_snapshot(self, version_id):
+        # the journal as of the version: its files written back, files it did not have removed, and
+        # the running stats and ledger rebuilt for them. The journal as it was is snapshotted first,
+        # so a restore can be undone like any other change. -> the index entry of the restored state
+        with self._locked(), self._stats_lock:
+            target = self.snapshots.manifest(version_id)["files"]
+            # a version from before the ledger was linked keeps the link the journal has now
+            link = self._link(self.ledger.link())
+            self._save_snapshot(KINDS, f"before restore of {version_id}", prune=False)
+            head = self.snapshots.head()["files"]
+            current = {self.snapshots.name(path): path
+                       for paths in self._journal_files(KINDS).values() for path, _ in paths}
+            for name, path in current.items():
+                if name not in target and os.path.exists(path):
+                    os.remove(path)
+            for name, entry in target.items():
+                if name not in head or head[name]["chunks"] != entry["chunks"]:
+                    self._restore_file(version_id, name, os.path.join(self.snapshots.base, name))
+            for kind in KINDS:
+                self._written(kind)
+            summary, pnl = self._stats_inputs()
+            self.stats.rebuild(summary, pnl, self._stats_source())
+            self.ledger.state = None
+            link = self._link(self.ledger.link() or link)
+            self.ledger.rebuild(self.load_investments(), self._ledger_source(), link)
+            self._snapshot_write(KINDS, f"restore {version_id}", prune=False, defer=False)
+            return self.snapshots.versions()[-1]
+
+    def _restore_file(self, version_id, name, path):
+        self.snapshots.restore_file(version_id, name, path)
+
+    def _adopt_link(self, invest_path):
+        # moving a journal between backends keeps its ledger link (see ledger.py)
+        link = read_link(invest_path + LEDGER_SUFFIX)
+        if link is not None:
+            link = self._link(link)
+            self.ledger.state = None
+            self.ledger.rebuild(self.load_investments(), self._ledger_source(), link)
+
+    def _stats_inputs(self):
+        trades = self.load_trades(["Date", "Net P&L"])
+        return analytics.daily_summary(trades), trades["Net P&L"]
+
+    def _worst_for(self, days):
+        trades = self.load_trades(["Date", "Net P&L"])
+        trades = trades[trades["Date"].dt.normalize().isin(pd.to_datetime(days))]
+        return trades.groupby(trades["Date"].dt.strftime("%Y-%m-%d"))["Net P&L"].min().to_dict()
+
+class CsvStore(Store):
+    # row keys are positions in the file, i.e. the RangeIndex of the loaded frame
+
+    name = "csv"
+
+    def __init__(self, trades_path=CSV_FILE, invest_path=INVEST_CSV):
+        super().__init__(trades_path + STATS_SUFFIX, invest_path + LEDGER_SUFFIX)
+        self.trades_path = trades_path
+        self.invest_path = invest_path
+
+    def init(self):
+        for path, columns in ((self.trades_path, TRADE_COLUMNS), (self.invest_path, INVEST_COLUMNS)):
+            if not os.path.exists(path) or os.stat(path).st_size == 0:
+                pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    def version(self, kind):
+        return _file_version(self.trades_path if kind == "trades" else self.invest_path)
+
+    def load_trades(self, columns=None):
+        return cached(("csv", "trades", columns and tuple(columns)), self.version("trades"),
+                      lambda: normalize_trades(_safe_read(self.trades_path, TRADE_COLUMNS, columns)))
+
+    def load_investments(self):
+        return cached(("csv", "investments"), self.version("investments"),
+                      lambda: normalize_investments(_safe_read(self.invest_path, INVEST_COLUMNS)))
+
+    def _written(self, kind):
+        invalidate_cache(("csv", kind))
+
+    def _stats_source(self):
+        return self.version("trades")
+
+    def _pnl_series(self):
+        return self.load_trades(["Net P&L"])["Net P&L"]
+
+    def _lock_path(self, kind):
+        return self.trades_path if kind == "trades" else self.invest_path
+
+    def _append_row(self, kind, row):
+        append_row(self._lock_path(kind), row, self._columns(kind))
+
+    def _extend_rows(self, kind, df):
+        extend_file(self._lock_path(kind), df, self._columns(kind))
+
+    def _update_row(self, kind, key, row):
+        path = self._lock_path(kind)
+        df = _safe_read(path, self._columns(kind))
+        old = df.loc[key].to_dict()
+        for col, value in row.items():
+            df.at[key, col] = value
+        rewrite_file(path, df)
+        return old
+
+    def _delete_row(self, kind, key):
+        path = self._lock_path(kind)
+        df = _safe_read(path, self._columns(kind))
+        old = df.loc[key].to_dict()
+        rewrite_file(path, df.drop(key).reset_index(drop=True))
+        return old
+
+    def compact(self):
+        # a snapshot that re-reads every file instead of trusting unchanged stats
+        self.snapshot("compact", verify=True)
+
+# --- SQLite backend: WAL mode, stable integer primary keys, pooled connections ---
+
+_INSERT_TRIGGER = """CREATE TRIGGER IF NOT EXISTS trades_version_insert AFTER INSERT ON trades
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'trades_version'; END;"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Date" TEXT NOT NULL,
+    "Symbol" TEXT,
+    "Side" TEXT,
+    "Quantity" REAL,
+    "Price" REAL,
+    "Net P&L" REAL,
+    "Pips" REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades("Date");
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades("Symbol");
+CREATE TABLE IF NOT EXISTS investments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    "Date" TEXT NOT NULL,
+    "Amount" REAL
+);
+CREATE INDEX IF NOT EXISTS idx_investments_date ON investments("Date");
+-- bumped on every trades (investments) change, so the running statistics (ledger) can tell they are current in O(1)
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('trades_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('investments_version', 0);
+""" + _INSERT_TRIGGER + """
+CREATE TRIGGER IF NOT EXISTS trades_version_update AFTER UPDATE ON trades
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'trades_version'; END;
+CREATE TRIGGER IF NOT EXISTS trades_version_delete AFTER DELETE ON trades
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'trades_version'; END;
+CREATE TRIGGER IF NOT EXISTS investments_version_insert AFTER INSERT ON investments
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'investments_version'; END;
+CREATE TRIGGER IF NOT EXISTS investments_version_update AFTER UPDATE ON investments
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'investments_version'; END;
+CREATE TRIGGER IF NOT EXISTS investments_version_delete AFTER DELETE ON investments
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'investments_version'; END;
+"""
+
+POOL_SIZE = 4
+SNAPSHOT_DELAY = 30.0  # seconds from a write to the snapshot that it and every later write share
+
+def _quote(col):
+    return '"' + col.replace('"', '""') + '"'
+
+class SqliteStore(Store):
+    # row keys are the integer primary keys, so edits/deletes never depend on row order
+
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_DB, pool_size=POOL_SIZE):
+        super().__init__(path + STATS_SUFFIX, path + LEDGER_SUFFIX)
+        self.path = path
+        self._pool = queue.LifoQueue()
+        self._pool_size = pool_size
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._pending = []  # reasons of the writes since the latest snapshot
+        self._timer = None
+        self._timer_lock = threading.Lock()
+        atexit.register(self.flush_snapshot)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writer and vice versa
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self._pool_size
+                if grow:
+                    self._opened += 1
+            conn = self._connect() if grow else self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def init(self):
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def version(self, kind=None):
+        # in WAL mode commits land in the -wal file first, checkpoints then move them into the db
+        return _file_version(self.path, self.path + "-wal")
+
+    def _load(self, table, columns):
+        cols = ", ".join(_quote(c) for c in columns)
+        with self.connection() as conn:
+            df = pd.read_sql_query(f"SELECT id, {cols} FROM {table} ORDER BY id", conn, index_col="id")
+        df.index.name = None
+        return df
+
+    def load_trades(self, columns=None):
+        return cached((self.path, "trades", columns and tuple(columns)), self.version(),
+                      lambda: normalize_trades(self._load("trades", columns or TRADE_COLUMNS)))
+
+    def load_range(self, start=None, end=None, columns=None):
+        # the Date index answers the range; ISO dates compare correctly as text
+        columns = list(dict.fromkeys(["Date", *(columns or TRADE_COLUMNS)]))
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('"Date" >= ?')
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            clauses.append('"Date" < ?')
+            params.append((pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+        cols = ", ".join(_quote(c) for c in columns)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.connection() as conn:
+            df = pd.read_sql_query(f"SELECT id, {cols} FROM trades {where} ORDER BY id", conn,
+                                   params=params, index_col="id")
+        df.index.name = None
+        return normalize_trades(df)
+
+    def load_investments(self):
+        return cached((self.path, "investments"), self.version(),
+                      lambda: normalize_investments(self._load("investments", INVEST_COLUMNS)))
+
+    def _written(self, table):
+        invalidate_cache((self.path, table))
+
+    def _stats_source(self):
+        with self.connection() as conn:
+            (version,) = conn.execute("SELECT value FROM meta WHERE key = 'trades_version'").fetchone()
+        return [self.path, version]
+
+    def _ledger_source(self):
+        with self.connection() as conn:
+            (version,) = conn.execute("SELECT value FROM meta WHERE key = 'investments_version'").fetchone()
+        return [self.path, version]
+
+    def _stats_inputs(self):
+        return self._daily_summary(), self._pnl_series()
+
+    def _pnl_series(self):
+        with self.connection() as conn:
+            return pd.read_sql_query('SELECT "Net P&L" FROM trades ORDER BY id', conn)["Net P&L"]
+
+    def _worst_for(self, days):
+        marks = ", ".join("?" for _ in days)
+        query = (f'SELECT substr("Date", 1, 10), MIN("Net P&L") FROM trades '
+                 f'WHERE substr("Date", 1, 10) IN ({marks}) GROUP BY 1')
+        with self.connection() as conn:
+            return dict(conn.execute(query, list(days)).fetchall())
+
+    def _fetch(self, table, columns, key):
+        cols = ", ".join(_quote(c) for c in columns)
+        with self.connection() as conn:
+            values = conn.execute(f"SELECT {cols} FROM {table} WHERE id = ?", (int(key),)).fetchone()
+        if values is None:
+            raise KeyError(key)
+        return dict(zip(columns, values))
+
+    def _current_row(self, kind, key):
+        row = pd.DataFrame([self._fetch(kind, self._columns(kind), key)])
+        normalize = normalize_trades if kind == "trades" else normalize_investments
+        return normalize(row).iloc[0]
+
+    def _insert_many(self, table, columns, df, bulk=False):
+        cols = ", ".join(_quote(c) for c in columns)
+        marks = ", ".join("?" for _ in columns)
+        values = df.reindex(columns=columns)
+        values = values.astype(object).where(values.notna(), None)
+        bulk = bulk and table == "trades"
+        with self.connection() as conn, conn:
+            if bulk:
+                # the per-row version trigger would dominate a bulk insert: drop it and bump the version
+                # once, all in one transaction, so no reader ever sees the table without it
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DROP TRIGGER IF EXISTS trades_version_insert")
+            conn.executemany(f"INSERT INTO {table} ({cols}) VALUES ({marks})",
+                             values.itertuples(index=False, name=None))
+            if bulk:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'trades_version'")
+                conn.execute(_INSERT_TRIGGER)
+
+    def _lock_path(self, kind):
+        return self.path
+
+    def _append_row(self, kind, row):
+        self._insert_many(kind, self._columns(kind), pd.DataFrame([row]))
+
+    def _extend_rows(self, kind, df):
+        self._insert_many(kind, self._columns(kind), df, bulk=True)
+
+    def _update_row(self, kind, key, row):
+        old = self._fetch(kind, self._columns(kind), key)
+        assignments = ", ".join(f"{_quote(c)} = ?" for c in row)
+        with self.connection() as conn, conn:
+            conn.execute(f"UPDATE {kind} SET {assignments} WHERE id = ?", [*row.values(), int(key)])
+        return old
+
+    def _delete_row(self, kind, key):
+        old = self._fetch(kind, self._columns(kind), key)
+        with self.connection() as conn, conn:
+            conn.execute(f"DELETE FROM {kind} WHERE id = ?", (int(key),))
+        return old
+
+    def _daily_summary(self):
+        query = """
+            SELECT substr("Date", 1, 10) AS "Date",
+                   SUM("Net P&L") AS "Net P&L",
+                   SUM(CASE WHEN "Net P&L" > 0 THEN "Net P&L" ELSE 0 END) AS "Wins",
+                   SUM(CASE WHEN "Net P&L" < 0 THEN "Net P&L" ELSE 0 END) AS "Losses",
+                   SUM("Net P&L" > 0) AS "Win Count",
+                   SUM("Net P&L" < 0) AS "Loss Count",
+                   COUNT(*) AS "Trades",
+                   MIN("Net P&L") AS "Worst Trade",
+                   SUM("Net P&L" * "Net P&L") AS "Sum Sq"
+            FROM trades GROUP BY substr("Date", 1, 10) ORDER BY 1
+        """
+        with self.connection() as conn:
+            return pd.read_sql_query(query, conn)
+
+    def compact(self):
+        self.snapshot("compact", verify=True)
+
+    def _snapshot_files(self, kinds):
+        # both tables live in the one db file
+        return {"database": [(self.path, False)]}
+
+    def _save_snapshot(self, kinds, reason, verify=False, prune=True):
+        # the db file only holds every commit after a checkpoint. PASSIVE never waits: a reader still on
+        # an older read transaction keeps the newer commits in the -wal file, and the snapshot is refused
+        # rather than stored without them
+        with self.connection() as conn:
+            busy, frames, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if busy or frames != done:
+            raise SnapshotBusyError("a reader holds commits in the WAL: the database cannot be snapshotted yet")
+        version = super()._save_snapshot(kinds, reason, verify, prune)
+        # the one file holds every write: none is left waiting for the timer
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._pending, self._timer = [], None
+        return version
+
+    def _snapshot_write(self, kinds, reason, prune=True, defer=True):
+        # a snapshot re-reads the changed db file, and a reader can hold it back: writes never take one
+        # themselves. The first write since the latest snapshot starts a timer, and its thread snapshots
+        # everything written in the SNAPSHOT_DELAY seconds since. A snapshot that cannot be taken now is
+        # retried by the timer; nothing raises once the write has committed
+        if not defer:
+            try:
+                self._save_snapshot(kinds, reason, prune=prune)
+                return
+            except (sqlite3.Error, OSError) as exc:
+                log.warning("snapshot of %s failed, retrying in %ss: %s", self.path, SNAPSHOT_DELAY, exc)
+        with self._timer_lock:
+            self._pending.append(reason)
+            if self._timer is None:
+                self._schedule_snapshot()
+
+    def _schedule_snapshot(self):
+        self._timer = threading.Timer(SNAPSHOT_DELAY, self.flush_snapshot)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush_snapshot(self):
+        # the snapshot of the writes still waiting for one, now; also run at exit
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            reasons, self._pending, self._timer = self._pending, [], None
+        if not reasons:
+            return None
+        try:
+            return self.snapshot(", ".join(dict.fromkeys(reasons)))
+        except (sqlite3.Error, OSError) as exc:
+            log.warning("snapshot of %s failed, retrying in %ss: %s", self.path, SNAPSHOT_DELAY, exc)
+            with self._timer_lock:
+                self._pending = reasons + self._pending
+                if self._timer is None:
+                    self._schedule_snapshot()
+            return None
+
+    def _snapshot_tables(self, version_id, name):
+        if self.snapshots.name(self.path) != name:
+            return {}
+        try:
+            data = self.snapshots.read(version_id, name)
+        except KeyError:
+            return {}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, os.path.basename(self.path))
+            with open(path, "wb") as f:
+                f.write(data)
+            conn = sqlite3.connect(path)
+            try:
+                return {f"{name}:{kind}": pd.read_sql_query(f"SELECT * FROM {kind} ORDER BY id", conn) for kind in KINDS}
+            finally:
+                conn.close()
+
+    def _restore_file(self, version_id, name, path):
+        if self.snapshots.name(self.path) != name:
+            return super()._restore_file(version_id, name, path)
+        # copied into the live database through the backup API, so the pooled connections stay valid
+        tmp = self.path + ".restore"
+        self.snapshots.restore_file(version_id, name, tmp)
+        source = sqlite3.connect(tmp)
+        try:
+            with self.connection() as conn:
+                source.backup(conn)
+        finally:
+            source.close()
+            os.remove(tmp)
+
+    def import_csv(self, trades_path=CSV_FILE, invest_path=INVEST_CSV):
+        # one-shot import of the legacy CSV files; returns (trades, investments) rows inserted
+        trades = _safe_read(trades_path, TRADE_COLUMNS)
+        investments = _safe_read(invest_path, INVEST_COLUMNS)
+        with write_lock(self.path):
+            self._insert_many("trades", TRADE_COLUMNS, trades, bulk=True)
+            self._insert_many("investments", INVEST_COLUMNS, investments)
+        self._written("trades")
+        self._written("investments")
+        self._adopt_link(invest_path)
+        return len(trades), len(investments)
+
+# --- Arrow backend: columnar, memory-mapped base file plus a small append-only tail ---
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for TRADE_JOURNAL_BACKEND=arrow
+    pa = None
+
+ARROW_TRADES = "trades.arrow"
+ARROW_INVEST = "investment.arrow"
+TAIL_SUFFIX = ".tail"
+TAIL_MAX_ROWS = 1000  # fold the tail into the base file once it holds this many rows
+
+def write_arrow(path, df, columns):
+    table = pa.Table.from_pandas(typed_frame(df, columns), preserve_index=False)
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+def read_arrow(path, columns, usecols=None):
+    if not os.path.exists(path):
+        return typed_frame(pd.DataFrame(columns=columns), columns)[usecols or columns]
+    # memory-mapped: only the pages of the selected columns are ever touched
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        if usecols:
+            table = table.select(usecols)
+        return table.to_pandas()
+
+class ArrowStore(Store):
+    # row keys are positions in base file + tail, like the CSV backend
+
+    name = "arrow"
+
+    def __init__(self, trades_path=ARROW_TRADES, invest_path=ARROW_INVEST):
+        if pa is None:
+            raise RuntimeError("The arrow backend needs pyarrow: pip install pyarrow")
+        super().__init__(trades_path + STATS_SUFFIX, invest_path + LEDGER_SUFFIX)
+        self.trades_path = trades_path
+        self.invest_path = invest_path
+
+    def _paths(self, kind):
+        if kind == "trades":
+            return self.trades_path, TRADE_COLUMNS
+        return self.invest_path, INVEST_COLUMNS
+
+    def init(self):
+        for kind in ("trades", "investments"):
+            path, columns = self._paths(kind)
+            if not os.path.exists(path):
+                write_arrow(path, pd.DataFrame(columns=columns), columns)
+
+    def version(self, kind):
+        path, _ = self._paths(kind)
+        return _file_version(path, path + TAIL_SUFFIX)
+
+    def _read_tail(self, path):
+        if not os.path.exists(path + TAIL_SUFFIX):
+            return []
+        with open(path + TAIL_SUFFIX) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _load(self, kind, usecols=None):
+        path, columns = self._paths(kind)
+        base = read_arrow(path, columns, usecols)
+        tail = self._read_tail(path)
+        if tail:
+            tail = typed_frame(pd.DataFrame(tail), columns)[usecols or columns]
+            base = pd.concat([base, tail], ignore_index=True)
+            for col in ("Symbol", "Side"):
+                if col in base:
+                    base[col] = base[col].astype("category")
+        return base
+
+    def load_trades(self, columns=None):
+        return cached(("arrow", "trades", columns and tuple(columns)), self.version("trades"),
+                      lambda: normalize_trades(self._load("trades", columns)))
+
+    def load_investments(self):
+        return cached(("arrow", "investments"), self.version("investments"),
+                      lambda: normalize_investments(self._load("investments")))
+
+    def _written(self, kind):
+        invalidate_cache(("arrow", kind))
+
+    def _lock_path(self, kind):
+        return self._paths(kind)[0]
+
+    def _append_row(self, kind, row):
+        path, columns = self._paths(kind)
+        _fsync_write(path + TAIL_SUFFIX, json.dumps(row, default=str) + "\n")
+        if len(self._read_tail(path)) >= TAIL_MAX_ROWS:
+            self._rewrite(kind, self._load(kind))
+
+    def _extend_rows(self, kind, df):
+        path, columns = self._paths(kind)
+        self._rewrite(kind, pd.concat([self._load(kind), typed_frame(df, columns)], ignore_index=True))
+
+    def _rewrite(self, kind, df):
+        path, columns = self._paths(kind)
+        write_arrow(path, df, columns)
+        _fsync_write(path + TAIL_SUFFIX, "", mode="w")
+
+    def _update_row(self, kind, key, row):
+        df = self._load(kind)
+        old = df.loc[key].to_dict()
+        new = typed_frame(pd.DataFrame([{**old, **row}]), self._paths(kind)[1])
+        for col in row:
+            df[col] = df[col].astype(object)
+            df.at[key, col] = new.at[0, col]
+        self._rewrite(kind, df)
+        return old
+
+    def _delete_row(self, kind, key):
+        df = self._load(kind)
+        old = df.loc[key].to_dict()
+        self._rewrite(kind, df.drop(key).reset_index(drop=True))
+        return old
+
+    def _stats_source(self):
+        return self.version("trades")
+
+    def _pnl_series(self):
+        return self.load_trades(["Net P&L"])["Net P&L"]
+
+    def compact(self):
+        for kind in KINDS:
+            with write_lock(self._lock_path(kind)):
+                self._rewrite(kind, self._load(kind))
+            self._written(kind)
+        self.snapshot("compact", verify=True)
+
+    def _snapshot_files(self, kinds):
+        # the base file is always replaced whole, the tail grows in place
+        return {kind: [(self._paths(kind)[0], False), (self._paths(kind)[0] + TAIL_SUFFIX, True)] for kind in kinds}
+
+    def _snapshot_tables(self, version_id, name):
+        if not name.endswith(".arrow"):
+            return {}
+        try:
+            data = self.snapshots.read(version_id, name)
+        except KeyError:
+            return {}
+        return {name: pa.ipc.open_file(pa.BufferReader(data)).read_all().to_pandas()}
+
+    def import_csv(self, trades_path=CSV_FILE, invest_path=INVEST_CSV):
+        trades = _safe_read(trades_path, TRADE_COLUMNS)
+        investments = _safe_read(invest_path, INVEST_COLUMNS)
+        with write_lock(self.trades_path):
+            self._rewrite("trades", trades)
+        with write_lock(self.invest_path):
+            self._rewrite("investments", investments)
+        self._written("trades")
+        self._written("investments")
+        self._adopt_link(invest_path)
+        return len(trades), len(investments)
+
+# --- Partitioned backend: one CSV shard per month plus a manifest of per-shard totals ---
+
+PARTITION_DIR = "trades"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+UNDATED = "undated"  # shard of the rows whose Date does not parse
+KEY_SHIFT = 32  # row key = month ordinal << KEY_SHIFT | position in the month's shard
+TOTAL_FIELDS = ["rows", "pnl", "wins", "losses", "win_count", "loss_count"]
+
+def _ordinal(month):
+    if month == UNDATED:
+        return 0
+    year, mon = month.split("-")
+    return int(year) * 12 + int(mon) - 1
+
+def _month_of(ordinal):
+    return UNDATED if ordinal == 0 else f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+def _row_months(dates):
+    return pd.to_datetime(dates, errors="coerce").dt.strftime("%Y-%m").fillna(UNDATED)
+
+def _row_month(row):
+    day = pd.to_datetime(row.get("Date"), errors="coerce")
+    return UNDATED if pd.isna(day) else day.strftime("%Y-%m")
+
+def partition_totals(pnl):
+    # the manifest entry of a shard holding these Net P&L values
+    pnl = pd.to_numeric(pd.Series(pnl, dtype=object), errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    return {
+        "rows": len(pnl),
+        "pnl": float(pnl.sum()),
+        "wins": float(pnl[pnl > 0].sum()),
+        "losses": float(pnl[pnl < 0].sum()),
+        "win_count": int((pnl > 0).sum()),
+        "loss_count": int((pnl < 0).sum()),
+    }
+
+class PartitionedStore(CsvStore):
+    # trades in one CSV shard per month (trades/2025-09.csv)
+    # and a manifest with every shard's row count, P&L totals and file stamp. A write rewrites or
+    # appends to one shard and updates its manifest entry; month and date-range reads open only
+    # the shards they cover; monthly totals come from the manifest alone. Investments stay in
+    # investment.csv, exactly as with the CSV backend
+
+    name = "partitioned"
+
+    def __init__(self, directory=PARTITION_DIR, invest_path=INVEST_CSV):
+        Store.__init__(self, os.path.join(directory, "trades" + STATS_SUFFIX), invest_path + LEDGER_SUFFIX)
+        self.directory = directory
+        # every trade writer locks the manifest, CsvStore's version("trades") stamps it
+        self.trades_path = os.path.join(directory, MANIFEST_FILE)
+        self.invest_path = invest_path
+        self._manifest = None
+        self._checked = False
+
+    def init(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self.invest_path) or os.stat(self.invest_path).st_size == 0:
+            pd.DataFrame(columns=INVEST_COLUMNS).to_csv(self.invest_path, index=False)
+        if self._checked and os.path.exists(self.trades_path):
+            return
+        # the shards are checked against the manifest once per process (and on "Compact journals")
+        with write_lock(self.trades_path):
+            if not os.path.exists(self.trades_path):
+                self._save_manifest({"format": MANIFEST_FORMAT, "generation": 0, "partitions": {}})
+            self.refresh_manifest()
+        self._checked = True
+
+    def shard_path(self, month):
+        return os.path.join(self.directory, f"{month}.csv")
+
+    def manifest(self):
+        version = _file_version(self.trades_path)
+        if self._manifest is None or self._manifest[0] != version:
+            with open(self.trades_path) as f:
+                self._manifest = (version, json.load(f))
+        return self._manifest[1]
+
+    def _save_manifest(self, manifest):
+        manifest["generation"] = manifest.get("generation", 0) + 1
+        tmp = self.trades_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.trades_path)
+        self._manifest = None
+
+    def _stamp(self, month):
+        return list(_file_version(self.shard_path(month))[0][1:])
+
+    def _set_entry(self, manifest, month, totals):
+        if totals["rows"]:
+            manifest["partitions"][month] = {**totals, "file": self._stamp(month)}
+        else:
+            manifest["partitions"].pop(month, None)
+
+    def _add_entry(self, manifest, month, pnl):
+        entry = manifest["partitions"].get(month, dict.fromkeys(TOTAL_FIELDS, 0))
+        added = partition_totals(pnl)
+        self._set_entry(manifest, month, {field: entry[field] + added[field] for field in TOTAL_FIELDS})
+
+    def refresh_manifest(self):
+        # shards edited by hand, or written by a process that died before its manifest update, get
+        # their entry recomputed from that shard alone; called under the manifest lock
+        manifest = self.manifest()
+        months = {name[:-4] for name in os.listdir(self.directory) if name.endswith(".csv")}
+        changed = False
+        for month in sorted(months | set(manifest["partitions"])):
+            entry = manifest["partitions"].get(month)
+            if month in months and (entry is None or entry["file"] != self._stamp(month)):
+                self._set_entry(manifest, month, partition_totals(
+                    _safe_read(self.shard_path(month), TRADE_COLUMNS, ["Net P&L"])["Net P&L"]))
+                changed = True
+            elif month not in months:
+                del manifest["partitions"][month]
+                changed = True
+        if changed:
+            self._save_manifest(manifest)
+        return changed
+
+    def months(self):
+        return sorted(self.manifest()["partitions"])
+
+    def partition_summary(self):
+        # one row per shard, straight from the manifest
+        partitions = self.manifest()["partitions"]
+        return pd.DataFrame(
+            [[month, *(partitions[month][field] for field in TOTAL_FIELDS)] for month in sorted(partitions)],
+            columns=["Month", "Trades", "Net P&L", "Gross Wins", "Gross Losses", "Win Count", "Loss Count"],
+        )
+
+    def monthly_summary(self):
+        summary = self.partition_summary()
+        summary = summary[summary["Month"] != UNDATED].reset_index(drop=True)
+        return summary[["Month", "Net P&L", "Trades", "Win Count", "Loss Count"]]
+
+    def _shard(self, month, columns=None):
+        path = self.shard_path(month)
+        # parsed but not typed: typing runs once over the concatenated months, not once per shard
+        return cached(("partitioned", "shard", month, columns and tuple(columns)), _file_version(path),
+                      lambda: _safe_read(path, TRADE_COLUMNS, columns))
+
+    def _load_months(self, months, columns=None):
+        frames = [self._shard(month, columns) for month in months]
+        if not frames:
+            return normalize_trades(pd.DataFrame(columns=columns or TRADE_COLUMNS))
+        keys = np.concatenate([(_ordinal(month) << KEY_SHIFT) + np.arange(len(frame), dtype=np.int64)
+                               for month, frame in zip(months, frames)])
+        df = pd.concat(frames, ignore_index=True)
+        df.index = keys
+        return normalize_trades(df)
+
+    def load_trades(self, columns=None):
+        return cached(("partitioned", "trades", columns and tuple(columns)), self.version("trades"),
+                      lambda: self._load_months(self.months(), columns))
+
+    def load_range(self, start=None, end=None, columns=None):
+        # partition pruning: only the shards of the months the range touches are read
+        if columns is not None and "Date" not in columns:
+            columns = ["Date", *columns]
+        start, end = (None if day is None else pd.Timestamp(day) for day in (start, end))
+        first = None if start is None else start.strftime("%Y-%m")
+        last = None if end is None else end.strftime("%Y-%m")
+        months = [month for month in self.months() if month != UNDATED
+                  and (first is None or month >= first) and (last is None or month <= last)]
+        return analytics.in_window(self._load_months(months, columns), start, end)
+
+    def load_month(self, month):
+        return self._load_months([month] if month in self.manifest()["partitions"] else [])
+
+    def _written(self, kind):
+        invalidate_cache(("partitioned", "trades") if kind == "trades" else ("csv", kind))
+
+    def _stats_source(self):
+        return [self.trades_path, self.manifest()["generation"]]
+
+    def _pnl_series(self):
+        return self.load_trades(["Net P&L"])["Net P&L"]
+
+    def _worst_for(self, days):
+        trades = self._load_months(sorted({day[:7] for day in days} & set(self.months())), ["Date", "Net P&L"])
+        trades = trades[trades["Date"].dt.normalize().isin(pd.to_datetime(days))]
+        return trades.groupby(trades["Date"].dt.strftime("%Y-%m-%d"))["Net P&L"].min().to_dict()
+
+    def _locate(self, key):
+        return _month_of(int(key) >> KEY_SHIFT), int(key) & ((1 << KEY_SHIFT) - 1)
+
+    def _current_row(self, kind, key):
+        if kind != "trades":
+            return super()._current_row(kind, key)
+        month, _ = self._locate(key)
+        return self.load_month(month).loc[key]
+
+    def _append_row(self, kind, row):
+        if kind != "trades":
+            return super()._append_row(kind, row)
+        month = _row_month(row)
+        append_row(self.shard_path(month), row, TRADE_COLUMNS)
+        manifest = self.manifest()
+        self._add_entry(manifest, month, [row.get("Net P&L")])
+        self._save_manifest(manifest)
+
+    def _extend_rows(self, kind, df):
+        if kind != "trades":
+            return super()._extend_rows(kind, df)
+        manifest = self.manifest()
+        for month, rows in df.groupby(_row_months(df["Date"]).to_numpy(), sort=True):
+            extend_file(self.shard_path(month), rows, TRADE_COLUMNS)
+            self._add_entry(manifest, month, rows["Net P&L"])
+        self._save_manifest(manifest)
+
+    def _read_shard(self, key):
+        month, pos = self._locate(key)
+        df = _safe_read(self.shard_path(month), TRADE_COLUMNS)
+        if pos not in df.index:
+            raise KeyError(key)
+        return month, pos, df
+
+    def _update_row(self, kind, key, row):
+        if kind != "trades":
+            return super()._update_row(kind, key, row)
+        month, pos, df = self._read_shard(key)
+        old = df.loc[pos].to_dict()
+        target = _row_month({**old, **row})
+        manifest = self.manifest()
+        if target == month:
+            for col, value in row.items():
+                df.at[pos, col] = value
+            rewrite_file(self.shard_path(month), df)
+        else:
+            # a new date in another month moves the trade to that month's shard
+            df = df.drop(pos).reset_index(drop=True)
+            rewrite_file(self.shard_path(month), df)
+            append_row(self.shard_path(target), {**old, **row}, TRADE_COLUMNS)
+            self._add_entry(manifest, target, [{**old, **row}.get("Net P&L")])
+        self._set_entry(manifest, month, partition_totals(df["Net P&L"]))
+        self._save_manifest(manifest)
+        return old
+
+    def _delete_row(self, kind, key):
+        if kind != "trades":
+            return super()._delete_row(kind, key)
+        month, pos, df = self._read_shard(key)
+        old = df.loc[pos].to_dict()
+        df = df.drop(pos).reset_index(drop=True)
+        rewrite_file(self.shard_path(month), df)
+        manifest = self.manifest()
+        self._set_entry(manifest, month, partition_totals(df["Net P&L"]))
+        self._save_manifest(manifest)
+        return old
+
+    def compact(self):
+        with write_lock(self.trades_path):
+            self.refresh_manifest()
+        self._written("trades")
+        self.snapshot("compact", verify=True)
+
+    def _snapshot_files(self, kinds):
+        # the manifest and every shard there is now: a shard missing from the directory leaves the version
+        groups = super()._snapshot_files([kind for kind in kinds if kind != "trades"])
+        if "trades" in kinds:
+            shards = sorted(name for name in os.listdir(self.directory) if name.endswith(".csv"))
+            groups["trades"] = [(self.trades_path, False)] + [(os.path.join(self.directory, name), True)
+                                                               for name in shards]
+        return groups
+
+    def import_csv(self, trades_path=CSV_FILE, invest_path=INVEST_CSV):
+        # the migration: split a single trades.csv into month shards (added to any already there)
+        trades = _safe_read(trades_path, TRADE_COLUMNS)
+        with write_lock(self.trades_path):
+            if len(trades):
+                self._extend_rows("trades", trades)
+        imported = 0
+        if os.path.abspath(invest_path) != os.path.abspath(self.invest_path):
+            investments = _safe_read(invest_path, INVEST_COLUMNS)
+            with write_lock(self.invest_path):
+                if len(investments):
+                    extend_file(self.invest_path, investments, INVEST_COLUMNS)
+            imported = len(investments)
+            self._adopt_link(invest_path)
+        self._written("trades")
+        self._written("investments")
+        return len(trades), imported
+
+def export_csv(store, trades_path=CSV_FILE, invest_path=INVEST_CSV):
+    # CSV stays the interchange format whatever backend holds the journal
+    trades = store.load_trades()[TRADE_COLUMNS]
+    investments = store.load_investments()
+    for df in (trades, investments):
+        if pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
+    trades.to_csv(trades_path, index=False)
+    # the partitioned journal keeps its investments in investment.csv already
+    same = os.path.abspath(invest_path) == os.path.abspath(getattr(store, "invest_path", ""))
+    if not same:
+        investments.to_csv(invest_path, index=False)
+    store.running_ledger()
+    if not same and os.path.exists(store.ledger.path):
+        # the CSV copy keeps the ledger link: its next open rebuilds the rest of the sidecar
+        shutil.copy(store.ledger.path, invest_path + LEDGER_SUFFIX)
+        shutil.copy(store.ledger.link_path, invest_path + LINK_SUFFIX)
+    return len(trades), len(investments)
+
+_store = None
+
+def get_store():
+    # one store (and so one sqlite connection pool) per Streamlit server process
+    global _store
+    if _store is None:
+        fresh = False
+        if BACKEND == "sqlite":
+            fresh = not os.path.exists(SQLITE_DB)
+            _store = SqliteStore(SQLITE_DB)
+            _store.init()
+            if fresh:
+                _store.import_csv()
+        elif BACKEND == "partitioned":
+            fresh = not os.path.exists(os.path.join(PARTITION_DIR, MANIFEST_FILE))
+            _store = PartitionedStore()
+            _store.init()
+            if fresh:
+                _store.import_csv()
+        elif BACKEND == "arrow":
+            fresh = not os.path.exists(ARROW_TRADES)
+            _store = ArrowStore()
+            if fresh:
+                _store.import_csv()
+            _store.init()
+        else:
+            _store = CsvStore()
+            _store.init()
+        if fresh:
+            # the migrated journal is the first version; otherwise opening the store writes nothing
+            with _store._locked():
+                _store._snapshot_write(KINDS, "import", defer=False)
+    return _store
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move the journal between storage backends.")
+    parser.add_argument("command", choices=["import", "export"],
+                        help="import: trades.csv/investment.csv -> backend, export: backend -> CSV")
+    parser.add_argument("--backend", choices=["sqlite", "arrow", "partitioned"], default="sqlite")
+    parser.add_argument("--trades", default=CSV_FILE)
+    parser.add_argument("--investments", default=INVEST_CSV)
+    args = parser.parse_args()
+
+    store = {"sqlite": SqliteStore, "arrow": ArrowStore, "partitioned": PartitionedStore}[args.backend]()
+    store.init()
+    if args.command == "import":
+        n_trades, n_invest = store.import_csv(args.trades, args.investments)
+        with store._locked():
+            store._snapshot_write(KINDS, "import", defer=False)
+        print(f"Imported {n_trades} trades and {n_invest} investment entries into the {store.name} journal")
+    else:
+        n_trades, n_invest = export_csv(store, args.trades, args.investments)
+        print(f"Exported {n_trades} trades and {n_invest} investment entries to {args.trades}, {args.investments}")